@@ -0,0 +1,68 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import logging
+from batch.compatibility_audit import MATRIX_HEADER, audit_tables, log_summary
+from common import metadata_cache, rate_limiter
+from common.file_writer import write_csv
+from common.monitoring_consts import USER_AGENT
+from common.output_names import COMPATIBILITY_AUDIT_FILEPATH
+from google.api_core.gapic_v1.client_info import ClientInfo
+from google.cloud import bigquery
+from migration_config import get_audit_config
+
+logger = logging.getLogger(__name__)
+
+
+# Writes a compatibility matrix of the columns of the existing tables and the
+# new tables: which columns need casts, which have no cast, and which names
+# don't match.
+def main():
+  config: argparse.Namespace = get_audit_config()
+  logger.debug(f"Using config {vars(config)}")
+
+  logger.info(f"Auditing {len(config.tables)} tables..")
+
+  audits = audit_tables(
+      config.tables,
+      bigquery_client=bigquery.Client(
+          client_info=ClientInfo(user_agent=USER_AGENT)
+      ),
+      max_workers=config.max_concurrent_tables,
+  )
+  write_csv(
+      COMPATIBILITY_AUDIT_FILEPATH,
+      header=MATRIX_HEADER,
+      rows=(
+          [
+              audit.table,
+              audit.target_table,
+              audit.column,
+              audit.source_type,
+              audit.destination_type,
+              str(audit.status),
+              audit.detail,
+          ]
+          for audit in audits
+      ),
+  )
+  log_summary(audits)
+
+  rate_limiter.log_stats()
+  metadata_cache.log_stats()
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,144 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import os
+from typing import List, NamedTuple, Optional
+from common.artifact_manifest import configure_artifact_manifest
+from common.copy_method import CopyMethod
+from common.logging_config import configure_logging
+from common.partitioning import Partitioning
+from common.plan_cache import configure_plan_cache
+from common.source_type import SourceType
+from common.stream_object_filter import ColumnFilter
+from sql_generators.copy_rows.copy_rows import CopyDataSQLGenerator
+from sql_generators.create_table.table_creator import get_table_creator
+
+logger = logging.getLogger(__name__)
+
+
+# Everything a worker process needs to generate the SQL of one table. Kept
+# small and picklable, so that submitting tens of thousands of tables is cheap.
+class SqlGenerationTask(NamedTuple):
+  name: str
+  single_target_stream: bool
+  source_type: SourceType
+  source_schema_name: str
+  source_table_name: str
+  project_id: str
+  bigquery_max_staleness_seconds: int
+  bigquery_target_dataset_name: str
+  bigquery_region: Optional[str]
+  bigquery_kms_key_name: Optional[str]
+  discover_result_filepath: str
+  create_target_table_ddl_filepath: str
+  create_source_table_ddl_filepath: str
+  copy_rows_filepath: str
+  copy_method: CopyMethod
+  merge_bucket_count: int
+  column_filter: Optional[ColumnFilter]
+  partitioning: Optional[Partitioning]
+
+  @classmethod
+  def from_config(cls, name: str, config: argparse.Namespace):
+    return cls(name=name, **{f: getattr(config, f) for f in cls._fields[1:]})
+
+
+class SqlGenerationResult(NamedTuple):
+  name: str
+  error: Optional[str]
+
+
+# Generates the `CREATE TABLE` DDL and the copy rows SQL of many tables from
+# discover results and source table DDLs that are already on disk. Parsing and
+# SQL generation are CPU bound, so the tables are spread across processes, and
+# only the outcome of each table is sent back to the parent process.
+class BulkSqlGenerator:
+
+  def __init__(
+      self,
+      max_workers: Optional[int] = None,
+      chunksize: Optional[int] = None,
+      verbose: bool = False,
+      rebuild: bool = False,
+  ):
+    self.max_workers: int = max_workers or os.cpu_count() or 1
+    self.chunksize: Optional[int] = chunksize
+    self.verbose: bool = verbose
+    self.rebuild: bool = rebuild
+
+  def generate(
+      self, tasks: List[SqlGenerationTask]
+  ) -> List[SqlGenerationResult]:
+    chunksize = self.chunksize or max(1, len(tasks) // (self.max_workers * 4))
+    logger.info(
+        f"Generating SQL for {len(tasks)} tables using {self.max_workers}"
+        f" processes, {chunksize} tables per task.."
+    )
+
+    with ProcessPoolExecutor(
+        max_workers=self.max_workers,
+        initializer=_init_worker,
+        initargs=(self.verbose, self.rebuild),
+    ) as executor:
+      return list(executor.map(_generate_table_sql, tasks, chunksize=chunksize))
+
+
+def _init_worker(verbose: bool, rebuild: bool):
+  configure_logging(verbose)
+  # Worker processes don't share the parent's module state on every platform.
+  configure_artifact_manifest(rebuild=rebuild)
+  configure_plan_cache(rebuild=rebuild)
+  # Per table logs of tens of thousands of tables would drown the summary.
+  if not verbose:
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+def _generate_table_sql(task: SqlGenerationTask) -> SqlGenerationResult:
+  try:
+    get_table_creator(
+        single_target_stream=task.single_target_stream,
+        source_type=task.source_type,
+        discover_result_path=task.discover_result_filepath,
+        create_target_table_ddl_filepath=task.create_target_table_ddl_filepath,
+        source_schema_name=task.source_schema_name,
+        source_table_name=task.source_table_name,
+        project_id=task.project_id,
+        bigquery_max_staleness_seconds=task.bigquery_max_staleness_seconds,
+        bigquery_dataset_name=task.bigquery_target_dataset_name,
+        bigquery_region=task.bigquery_region,
+        bigquery_kms_key_name=task.bigquery_kms_key_name,
+        column_filter=task.column_filter,
+        partitioning=task.partitioning,
+    ).generate_ddl()
+
+    # Backfilled tables only get the target DDL.
+    if task.copy_method == CopyMethod.BACKFILL:
+      return SqlGenerationResult(name=task.name, error=None)
+
+    CopyDataSQLGenerator(
+        source_bigquery_table_ddl=task.create_source_table_ddl_filepath,
+        destination_bigquery_table_ddl=task.create_target_table_ddl_filepath,
+        filepath=task.copy_rows_filepath,
+        copy_method=task.copy_method,
+        merge_bucket_count=task.merge_bucket_count,
+        column_filter=task.column_filter,
+    ).generate_sql()
+  except Exception as ex:
+    logger.error(f"Failed to generate SQL for table '{task.name}': {ex!r}")
+    return SqlGenerationResult(name=task.name, error=repr(ex))
+
+  return SqlGenerationResult(name=task.name, error=None)
@@ -0,0 +1,408 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import enum
+import logging
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from batch.source_tables import source_table_id
+from common.stream_object_filter import ColumnFilter
+from common.table_schema import ColumnType, TableSchema
+from executors.discover import execute_discover
+from executors.list_columns import ColumnInfo, execute_list_columns
+from google.cloud import bigquery
+from sql_generators.copy_rows.copy_rows import COLUMN_SCHEMAS_TO_CAST_EXPRESSION, DATAFLOW_ROW_ID_METADATA_COLUMN, ORACLE_ROW_ID_COLUMN, ColumnSchema
+from sql_generators.copy_rows.ddl_parser import DDLParser
+from sql_generators.create_table.discover_result_parser import SourceTableNotFoundError
+from sql_generators.create_table.table_creator import get_table_creator
+
+logger = logging.getLogger(__name__)
+
+
+class ColumnStatus(enum.Enum):
+  # Same type in the existing and the new table.
+  MATCH = "match"
+  # Converted by a cast of the copy SQL.
+  CAST = "cast"
+  # The types differ, and there is no cast between them.
+  NO_CAST = "no_cast"
+  # The column of the existing table isn't in the new table.
+  SOURCE_ONLY = "source_only"
+  # The column of the new table isn't in the existing table, it isn't copied.
+  DESTINATION_ONLY = "destination_only"
+  UNSUPPORTED_TYPE = "unsupported_type"
+  # The existing table, or the source table, wasn't found.
+  MISSING_TABLE = "missing_table"
+
+  def __str__(self):
+    return self.value
+
+
+# Statuses that fail the copy, or leave columns of the new table empty.
+ISSUE_STATUSES = (
+    ColumnStatus.NO_CAST,
+    ColumnStatus.SOURCE_ONLY,
+    ColumnStatus.DESTINATION_ONLY,
+    ColumnStatus.UNSUPPORTED_TYPE,
+    ColumnStatus.MISSING_TABLE,
+)
+
+
+# A row of the compatibility matrix. The detail is the cast expression of
+# casted columns, or explains the issue.
+class ColumnAudit(NamedTuple):
+  table: str
+  target_table: str
+  column: str
+  source_type: str
+  destination_type: str
+  status: ColumnStatus
+  detail: str
+
+
+MATRIX_HEADER = list(ColumnAudit._fields)
+
+
+# Audits all the tables with one discover call per source schema and one
+# INFORMATION_SCHEMA.COLUMNS query per dataset, instead of fetching every
+# table's discover result and DDL.
+def audit_tables(
+    table_configs: List[argparse.Namespace],
+    bigquery_client: bigquery.Client,
+    max_workers: int,
+) -> List[ColumnAudit]:
+  table_configs_by_schema: Dict[Tuple[str, str], List[argparse.Namespace]] = (
+      defaultdict(list)
+  )
+  table_configs_by_dataset: Dict[Tuple[str, str], List[argparse.Namespace]] = (
+      defaultdict(list)
+  )
+  for table_config in table_configs:
+    table_configs_by_schema[
+        (
+            table_config.connection_profile_name,
+            table_config.source_schema_name,
+        )
+    ].append(table_config)
+    table_configs_by_dataset[
+        (
+            table_config.project_id,
+            table_config.bigquery_source_dataset_name,
+        )
+    ].append(table_config)
+
+  logger.info(
+      f"Discovering {len(table_configs_by_schema)} source schemas and listing"
+      f" the columns of {len(table_configs_by_dataset)} datasets.."
+  )
+  with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    discover_results = executor.map(
+        lambda schema_table_configs: _discover_schema(schema_table_configs[0]),
+        table_configs_by_schema.values(),
+    )
+    dataset_columns = executor.map(
+        lambda dataset: execute_list_columns(
+            project_id=dataset[0],
+            dataset=dataset[1],
+            table_names=[
+                c.bigquery_source_table_name
+                for c in table_configs_by_dataset[dataset]
+            ],
+            bigquery_client=bigquery_client,
+        ),
+        table_configs_by_dataset,
+    )
+    discover_results = dict(zip(table_configs_by_schema, discover_results))
+    dataset_columns = dict(zip(table_configs_by_dataset, dataset_columns))
+
+  audits = []
+  for table_config in table_configs:
+    audits.extend(
+        _audit_table_config(
+            table_config,
+            discover_result=discover_results[
+                (
+                    table_config.connection_profile_name,
+                    table_config.source_schema_name,
+                )
+            ],
+            source_columns=dataset_columns[
+                (
+                    table_config.project_id,
+                    table_config.bigquery_source_dataset_name,
+                )
+            ].get(table_config.bigquery_source_table_name),
+        )
+    )
+  return audits
+
+
+# Compares the columns of the existing table with the columns of the new table.
+def audit_table(
+    table: str,
+    target_table: str,
+    source_columns: List[ColumnInfo],
+    destination_table_schema: TableSchema,
+    column_filter: Optional[ColumnFilter] = None,
+    unmapped_source_types: Optional[Dict[str, str]] = None,
+) -> List[ColumnAudit]:
+  destination_columns: Dict[str, ColumnType] = {
+      column.name: column.column_type
+      for column in destination_table_schema.get_columns()
+  }
+  source_column_names = {column.name for column in source_columns}
+  audits = []
+
+  def audit(
+      column: str,
+      source_type: str,
+      destination_type: str,
+      status: ColumnStatus,
+      detail: str = "",
+  ):
+    audits.append(
+        ColumnAudit(
+            table=table,
+            target_table=target_table,
+            column=column,
+            source_type=source_type,
+            destination_type=destination_type,
+            status=status,
+            detail=detail,
+        )
+    )
+
+  for column in source_columns:
+    if DDLParser.is_metadata_column(column.name):
+      continue
+    if column_filter and not column_filter.includes(column.name):
+      continue
+
+    if column.name not in destination_columns:
+      audit(
+          column.name,
+          source_type=column.data_type,
+          destination_type="",
+          status=ColumnStatus.SOURCE_ONLY,
+          detail=_get_similar_column(column.name, destination_columns),
+      )
+      continue
+    destination_type = destination_columns[column.name]
+
+    # The new column is a STRING, since its type in the source table has no
+    # BigQuery mapping.
+    if unmapped_source_types and column.name in unmapped_source_types:
+      audit(
+          column.name,
+          source_type=column.data_type,
+          destination_type=str(destination_type),
+          status=ColumnStatus.UNSUPPORTED_TYPE,
+          detail=(
+              f"Unsupported source type '{unmapped_source_types[column.name]}'"
+          ),
+      )
+      continue
+
+    try:
+      source_type = DDLParser.to_bigquery_type(column.data_type)
+    except ValueError:
+      audit(
+          column.name,
+          source_type=column.data_type,
+          destination_type=str(destination_type),
+          status=ColumnStatus.UNSUPPORTED_TYPE,
+          detail=f"Unsupported type '{column.data_type}'",
+      )
+      continue
+
+    if source_type == destination_type.bigquery_type:
+      audit(
+          column.name,
+          source_type=column.data_type,
+          destination_type=str(destination_type),
+          status=ColumnStatus.MATCH,
+      )
+      continue
+
+    cast_expression = COLUMN_SCHEMAS_TO_CAST_EXPRESSION.get(
+        ColumnSchema(source_type, destination_type.bigquery_type)
+    )
+    audit(
+        column.name,
+        source_type=column.data_type,
+        destination_type=str(destination_type),
+        status=ColumnStatus.CAST if cast_expression else ColumnStatus.NO_CAST,
+        detail=(
+            cast_expression.format(column_name=f"`{column.name}`")
+            if cast_expression
+            else f"No cast from {source_type} to {destination_type.bigquery_type}"
+        ),
+    )
+
+  for name, destination_type in destination_columns.items():
+    if name in source_column_names:
+      continue
+    # The ROWID of Oracle tables is copied from Dataflow's row ID.
+    if (
+        name == ORACLE_ROW_ID_COLUMN
+        and DATAFLOW_ROW_ID_METADATA_COLUMN in source_column_names
+    ):
+      continue
+    audit(
+        name,
+        source_type="",
+        destination_type=str(destination_type),
+        status=ColumnStatus.DESTINATION_ONLY,
+        detail=_get_similar_column(name, source_column_names),
+    )
+
+  return audits
+
+
+# Logs how many tables are compatible, and the type pairs without casts.
+def log_summary(audits: List[ColumnAudit]):
+  statuses_by_table: Dict[str, Set[ColumnStatus]] = defaultdict(set)
+  for audit in audits:
+    statuses_by_table[audit.table].add(audit.status)
+
+  tables_with_issues = [
+      table
+      for table, statuses in statuses_by_table.items()
+      if any(status in ISSUE_STATUSES for status in statuses)
+  ]
+  tables_with_casts = [
+      table
+      for table, statuses in statuses_by_table.items()
+      if ColumnStatus.CAST in statuses and table not in tables_with_issues
+  ]
+  logger.info(
+      f"Audited {len(statuses_by_table)} tables:"
+      f" {len(statuses_by_table) - len(tables_with_issues) - len(tables_with_casts)}"
+      f" copy without casts, {len(tables_with_casts)} copy with casts, and"
+      f" {len(tables_with_issues)} have incompatible columns."
+  )
+
+  status_counts = Counter(audit.status for audit in audits)
+  for status in ISSUE_STATUSES:
+    if status == ColumnStatus.MISSING_TABLE:
+      continue
+    if status_counts[status]:
+      logger.warning(f"{status_counts[status]} columns are '{status}'.")
+  if status_counts[ColumnStatus.MISSING_TABLE]:
+    logger.warning(
+        f"{status_counts[ColumnStatus.MISSING_TABLE]} tables weren't found."
+    )
+
+  missing_casts = Counter(
+      (audit.source_type, audit.destination_type)
+      for audit in audits
+      if audit.status == ColumnStatus.NO_CAST
+  )
+  for (source_type, destination_type), count in missing_casts.most_common():
+    logger.warning(
+        f"No cast from {source_type} to {destination_type}, for {count}"
+        " columns."
+    )
+
+
+def _discover_schema(table_config: argparse.Namespace) -> Dict[str, Any]:
+  return execute_discover(
+      connection_profile_name=table_config.connection_profile_name,
+      source_type=table_config.source_type,
+      source_table_name=None,
+      source_schema_name=table_config.source_schema_name,
+      datastream_api_endpoint_override=table_config.datastream_api_endpoint_override,
+      filepath=None,
+  )
+
+
+def _audit_table_config(
+    table_config: argparse.Namespace,
+    discover_result: Dict[str, Any],
+    source_columns: Optional[List[ColumnInfo]],
+) -> List[ColumnAudit]:
+  table = source_table_id(table_config)
+  target_table = (
+      f"{table_config.project_id}.{table_config.bigquery_target_dataset_name}."
+      f"{table_config.bigquery_target_table_name}"
+  )
+  if source_columns is None:
+    return [
+        _missing_table_audit(
+            table, target_table, f"Table {table} doesn't exist."
+        )
+    ]
+
+  # The new table's columns are converted from the discover result, like when
+  # its DDL is generated.
+  try:
+    table_creator = get_table_creator(
+        single_target_stream=table_config.single_target_stream,
+        source_type=table_config.source_type,
+        discover_result_path=None,
+        create_target_table_ddl_filepath=None,
+        source_schema_name=table_config.source_schema_name,
+        source_table_name=table_config.source_table_name,
+        project_id=table_config.project_id,
+        bigquery_max_staleness_seconds=table_config.bigquery_max_staleness_seconds,
+        bigquery_dataset_name=table_config.bigquery_target_dataset_name,
+        bigquery_region=table_config.bigquery_region,
+        bigquery_kms_key_name=table_config.bigquery_kms_key_name,
+        discover_result=discover_result,
+        column_filter=table_config.column_filter,
+    )
+    destination_table_schema = table_creator.get_table_schema()
+    unmapped_source_types = {
+        column.cleaned_name: column.data_type
+        for column in table_creator.get_unmapped_source_columns()
+    }
+  except SourceTableNotFoundError as ex:
+    return [_missing_table_audit(table, target_table, ex.args[0])]
+
+  return audit_table(
+      table=table,
+      target_table=target_table,
+      source_columns=source_columns,
+      destination_table_schema=destination_table_schema,
+      column_filter=table_config.column_filter,
+      unmapped_source_types=unmapped_source_types,
+  )
+
+
+def _missing_table_audit(
+    table: str, target_table: str, detail: str
+) -> ColumnAudit:
+  return ColumnAudit(
+      table=table,
+      target_table=target_table,
+      column="",
+      source_type="",
+      destination_type="",
+      status=ColumnStatus.MISSING_TABLE,
+      detail=detail,
+  )
+
+
+# Names of the other table differing only by case are likely the same column.
+def _get_similar_column(column: str, other_columns: Iterable[str]) -> str:
+  similar_columns = [
+      other_column
+      for other_column in other_columns
+      if other_column.lower() == column.lower()
+  ]
+  if not similar_columns:
+    return ""
+  return f"Column names differ by case: {similar_columns[0]}"
@@ -0,0 +1,184 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import logging
+from typing import Dict, List, NamedTuple, Optional
+from batch.source_tables import source_table_id
+from common.copy_method import CopyMethod
+from common.defaults import DEFAULT_BACKFILL_ROWS_PER_SECOND, DEFAULT_COPY_BYTES_PER_SECOND
+from executors.discover import execute_discover
+from google.cloud.bigquery.table import Table
+from sql_generators.copy_rows.copy_rows import CopyDataSQLGenerator
+from sql_generators.copy_rows.table_schema_parser import TableSchemaParser
+from sql_generators.create_table.table_creator import get_table_creator
+
+logger = logging.getLogger(__name__)
+
+# Creating and waiting for a copy job takes a while, even for an empty table.
+COPY_JOB_OVERHEAD_SECONDS = 30
+# Each casted column slows the copy down by this fraction.
+CAST_SLOWDOWN = 0.1
+
+
+class CopyEstimate(NamedTuple):
+  copy_seconds: float
+  backfill_seconds: float
+  # Whether the existing BigQuery table wasn't modified for too long to be
+  # copied.
+  stale: bool
+
+
+# Estimates, for each table, whether copying the rows of the existing BigQuery
+# table is cheaper than letting Datastream backfill them from the source. Small
+# tables are dominated by the overhead of the copy job, and heavily casted
+# tables by the casts, while the backfill only depends on the number of rows.
+class CopyPlanner:
+
+  def __init__(
+      self,
+      copy_bytes_per_second: int = DEFAULT_COPY_BYTES_PER_SECOND,
+      backfill_rows_per_second: int = DEFAULT_BACKFILL_ROWS_PER_SECOND,
+      max_copy_staleness_seconds: Optional[int] = None,
+  ):
+    if copy_bytes_per_second < 1 or backfill_rows_per_second < 1:
+      raise ValueError(
+          "copy_bytes_per_second and backfill_rows_per_second must be at least"
+          f" 1, but got {copy_bytes_per_second} and {backfill_rows_per_second}"
+      )
+    self.copy_bytes_per_second: int = copy_bytes_per_second
+    self.backfill_rows_per_second: int = backfill_rows_per_second
+    self.max_copy_staleness_seconds: Optional[int] = max_copy_staleness_seconds
+
+  def estimate(
+      self, table: Table, cast_count: int, now: datetime.datetime
+  ) -> CopyEstimate:
+    num_bytes = table.num_bytes or 0
+    num_rows = table.num_rows or 0
+    return CopyEstimate(
+        copy_seconds=COPY_JOB_OVERHEAD_SECONDS
+        + num_bytes
+        / self.copy_bytes_per_second
+        * (1 + CAST_SLOWDOWN * cast_count),
+        backfill_seconds=num_rows / self.backfill_rows_per_second,
+        stale=(
+            self.max_copy_staleness_seconds is not None
+            and table.modified is not None
+            and (now - table.modified).total_seconds()
+            > self.max_copy_staleness_seconds
+        ),
+    )
+
+  def prefers_backfill(self, estimate: CopyEstimate) -> bool:
+    return estimate.stale or estimate.backfill_seconds < estimate.copy_seconds
+
+
+# Switches the tables that are cheaper to backfill to the backfill copy method.
+# Their discover results are fetched while counting the casts, and aren't
+# fetched again by the migration.
+def plan_copy_methods(
+    table_configs: List[argparse.Namespace],
+    source_tables: Dict[str, Optional[Table]],
+    planner: CopyPlanner,
+    max_workers: int,
+):
+  logger.info(
+      f"Estimating the cost of copying and backfilling {len(table_configs)}"
+      " tables.."
+  )
+  now = datetime.datetime.now(datetime.timezone.utc)
+  with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    estimates = list(
+        executor.map(
+            lambda c: _estimate(c, source_tables, planner=planner, now=now),
+            table_configs,
+        )
+    )
+
+  backfilled_tables = []
+  for table_config, estimate in zip(table_configs, estimates):
+    if estimate and planner.prefers_backfill(estimate):
+      table_config.copy_method = CopyMethod.BACKFILL
+      backfilled_tables.append(source_table_id(table_config))
+
+  logger.info(
+      f"Backfilling {len(backfilled_tables)} out of {len(table_configs)} tables"
+      f" instead of copying them: {backfilled_tables}"
+  )
+
+
+def _estimate(
+    table_config: argparse.Namespace,
+    source_tables: Dict[str, Optional[Table]],
+    planner: CopyPlanner,
+    now: datetime.datetime,
+) -> Optional[CopyEstimate]:
+  table_id = source_table_id(table_config)
+  table = source_tables.get(table_id)
+  # The migration reports the missing table.
+  if not table:
+    return None
+
+  try:
+    cast_count = _get_cast_count(table_config, table=table, table_id=table_id)
+  except ValueError as ex:
+    logger.warning(f"Couldn't count the casts of table {table_id}: {ex}")
+    return None
+
+  estimate = planner.estimate(table, cast_count=cast_count, now=now)
+  logger.debug(f"Estimated copying table {table_id}: {estimate}")
+  return estimate
+
+
+def _get_cast_count(
+    table_config: argparse.Namespace, table: Table, table_id: str
+) -> int:
+  discover_result = execute_discover(
+      connection_profile_name=table_config.connection_profile_name,
+      source_type=table_config.source_type,
+      source_table_name=table_config.source_table_name,
+      source_schema_name=table_config.source_schema_name,
+      datastream_api_endpoint_override=table_config.datastream_api_endpoint_override,
+      filepath=table_config.discover_result_filepath,
+  )
+  table_config.discover_result_prefetched = True
+
+  target_table_schema = get_table_creator(
+      single_target_stream=table_config.single_target_stream,
+      source_type=table_config.source_type,
+      discover_result_path=table_config.discover_result_filepath,
+      create_target_table_ddl_filepath=None,
+      source_schema_name=table_config.source_schema_name,
+      source_table_name=table_config.source_table_name,
+      project_id=table_config.project_id,
+      bigquery_max_staleness_seconds=table_config.bigquery_max_staleness_seconds,
+      bigquery_dataset_name=table_config.bigquery_target_dataset_name,
+      bigquery_region=table_config.bigquery_region,
+      bigquery_kms_key_name=table_config.bigquery_kms_key_name,
+      discover_result=discover_result,
+      column_filter=table_config.column_filter,
+  ).get_table_schema()
+
+  return CopyDataSQLGenerator(
+      source_bigquery_table_ddl=None,
+      destination_bigquery_table_ddl=None,
+      filepath=None,
+      source_table_schema_parser=TableSchemaParser(
+          fully_qualified_table_name=table_id, schema=table.schema
+      ),
+      destination_table_schema=target_table_schema,
+      column_filter=table_config.column_filter,
+  ).get_cast_count()
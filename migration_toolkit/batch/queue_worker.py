@@ -0,0 +1,147 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from batch.table_scheduler import TableResult
+from batch.work_queue import BaseWorkQueue, Lease, LeaseHeartbeat
+from common.defaults import DEFAULT_LEASE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL_SECONDS = 30
+
+
+# Migrates tables claimed from a work queue shared with other workers, possibly
+# running on other hosts, until no table is left pending or leased.
+class QueueWorker:
+
+  def __init__(
+      self,
+      work_queue: BaseWorkQueue,
+      worker_id: str,
+      max_concurrent_tables: int,
+      max_concurrent_large_tables: Optional[int],
+      large_table_threshold_bytes: int,
+      lease_seconds: float = DEFAULT_LEASE_SECONDS,
+      poll_interval_seconds: float = DEFAULT_POLL_INTERVAL_SECONDS,
+  ):
+    self.work_queue: BaseWorkQueue = work_queue
+    self.worker_id: str = worker_id
+    self.max_concurrent_tables: int = max_concurrent_tables
+    self.max_concurrent_large_tables: Optional[int] = (
+        max_concurrent_large_tables
+    )
+    self.large_table_threshold_bytes: int = large_table_threshold_bytes
+    self.lease_seconds: float = lease_seconds
+    self.poll_interval_seconds: float = poll_interval_seconds
+    self._results: List[TableResult] = []
+    self._results_lock = threading.Lock()
+
+  # `fn` is called with the payload of each claimed table, its lease, and an
+  # event that is set once the lease is lost. It should check the event before
+  # each step that another worker must not repeat, and stop if it is set.
+  def run(
+      self,
+      payloads: Dict[str, Any],
+      fn: Callable[[Any, Lease, threading.Event], Any],
+  ) -> List[TableResult]:
+    logger.info(
+        f"Worker '{self.worker_id}' is migrating tables from the work queue,"
+        f" at most {self.max_concurrent_tables} at a time."
+    )
+    with ThreadPoolExecutor(max_workers=self.max_concurrent_tables) as executor:
+      futures = [
+          executor.submit(self._work, f"{self.worker_id}/{i}", payloads, fn)
+          for i in range(self.max_concurrent_tables)
+      ]
+      for future in futures:
+        future.result()
+
+    return self._results
+
+  def _work(
+      self,
+      worker_id: str,
+      payloads: Dict[str, Any],
+      fn: Callable[[Any, Lease, threading.Event], Any],
+  ):
+    while True:
+      lease: Lease = self.work_queue.claim(
+          worker_id=worker_id,
+          lease_seconds=self.lease_seconds,
+          max_leased_large_items=self.max_concurrent_large_tables,
+          large_item_threshold_bytes=self.large_table_threshold_bytes,
+      )
+      if lease:
+        self._process(lease, payloads, fn)
+      elif self.work_queue.is_drained():
+        return
+      else:
+        # Other workers hold the remaining leases, wait in case they expire.
+        time.sleep(self.poll_interval_seconds)
+
+  def _process(
+      self,
+      lease: Lease,
+      payloads: Dict[str, Any],
+      fn: Callable[[Any, Lease, threading.Event], Any],
+  ):
+    logger.info(f"Worker '{lease.worker_id}' claimed table '{lease.name}'.")
+    error: Optional[BaseException] = None
+    with LeaseHeartbeat(
+        self.work_queue, lease, self.lease_seconds
+    ) as heartbeat:
+      try:
+        if lease.name not in payloads:
+          raise KeyError(
+              f"Table '{lease.name}' is in the work queue, but not in the"
+              " tables manifest of this worker."
+          )
+        fn(payloads[lease.name], lease, heartbeat.lost)
+      except BaseException as ex:
+        error = ex
+
+    # Another worker may have claimed the table once the lease was lost, so the
+    # table doesn't count as migrated by this worker.
+    if not error and heartbeat.lost.is_set():
+      error = _lease_lost_error(lease)
+
+    if error:
+      logger.error(f"Table '{lease.name}' failed: {error!r}")
+      owned = self.work_queue.fail(lease, repr(error))
+    else:
+      logger.info(f"Table '{lease.name}' finished.")
+      owned = self.work_queue.complete(lease)
+      if not owned:
+        error = _lease_lost_error(lease)
+
+    if not owned:
+      logger.error(
+          f"ERROR: Worker '{lease.worker_id}' no longer owned the lease on"
+          f" '{lease.name}' when it finished."
+      )
+
+    with self._results_lock:
+      self._results.append(TableResult(name=lease.name, error=error))
+
+
+def _lease_lost_error(lease: Lease) -> RuntimeError:
+  return RuntimeError(
+      f"Worker '{lease.worker_id}' lost the lease on '{lease.name}', another"
+      " worker may have migrated it."
+  )
@@ -0,0 +1,265 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+from datetime import datetime
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from batch.source_tables import source_table_id
+from batch.table_scheduler import ScheduledTable, TableScheduler, TableSize
+from common.copy_method import CopyMethod
+from common.defaults import DEFAULT_SAMPLE_PERCENT
+from executors.count_rows import execute_count_rows
+from executors.delete_bigquery_table import execute_delete_bigquery_table
+from executors.get_bigquery_table import execute_get_bigquery_table
+from executors.query import Job
+from google.cloud import bigquery
+from google.cloud.bigquery.table import Table
+
+logger = logging.getLogger(__name__)
+
+# Copy methods that read the whole existing table instead of running the copy
+# SQL, so they can't copy a sample of it.
+UNSAMPLED_COPY_METHODS = (CopyMethod.STORAGE_API, CopyMethod.EXTRACT_LOAD)
+MILLIS_PER_HOUR = 3600 * 1000
+
+REPORT_HEADER = [
+    "table",
+    "copy_method",
+    "num_rows",
+    "num_bytes",
+    "sampled_rows",
+    "seconds",
+    "copy_seconds",
+    "slot_millis",
+    "bytes_processed",
+    "estimated_seconds",
+    "estimated_slot_hours",
+    "estimated_bytes_processed",
+]
+
+
+class JobStats(NamedTuple):
+  started: Optional[datetime]
+  ended: Optional[datetime]
+  slot_millis: int
+  bytes_processed: int
+
+
+class TableEstimate(NamedTuple):
+  seconds: float
+  slot_millis: float
+  bytes_processed: float
+
+
+class TableRehearsal(NamedTuple):
+  name: str
+  copy_method: CopyMethod
+  num_rows: int
+  num_bytes: int
+  sampled_rows: int
+  # Wall time of the table's migration, and the part of it spent running the
+  # copy jobs.
+  seconds: float
+  copy_seconds: float
+  slot_millis: int
+  bytes_processed: int
+
+  # How many times more rows the migration copies than the rehearsal.
+  # `TABLESAMPLE SYSTEM` samples storage blocks, so the sampled rows are counted
+  # instead of trusting the percent, except for samples without any rows.
+  def get_scale(self, sample_percent: float) -> float:
+    if self.sampled_rows:
+      return max(self.num_rows / self.sampled_rows, 1.0)
+    return 100 / sample_percent if self.num_rows else 1.0
+
+  # Only the copy jobs grow with the number of rows, the rest of the migration
+  # takes as long as in the rehearsal.
+  def estimate(self, sample_percent: float) -> TableEstimate:
+    scale = self.get_scale(sample_percent)
+    return TableEstimate(
+        seconds=self.seconds + (scale - 1) * self.copy_seconds,
+        slot_millis=self.slot_millis * scale,
+        bytes_processed=self.bytes_processed * scale,
+    )
+
+
+# Migrates each table on a sample of its rows to a scratch dataset, and records
+# the wall time and job statistics of the copy, to extrapolate the migration of
+# the whole tables.
+class Rehearsal:
+
+  def __init__(
+      self,
+      migrate: Callable[[argparse.Namespace], Any],
+      sample_percent: float,
+      bigquery_client: bigquery.Client,
+  ):
+    self.migrate: Callable[[argparse.Namespace], Any] = migrate
+    self.sample_percent: float = sample_percent
+    self.bigquery_client: bigquery.Client = bigquery_client
+    # Statistics of the finished jobs by the tables they read.
+    self._jobs: Dict[str, List[JobStats]] = {}
+    self._tables: List[TableRehearsal] = []
+    self._lock = threading.Lock()
+
+  # Called with every finished job, see `executors.query.set_job_listener`.
+  def record_job(self, job: Job):
+    stats = JobStats(
+        started=job.started,
+        ended=job.ended,
+        slot_millis=getattr(job, "slot_millis", None) or 0,
+        bytes_processed=getattr(job, "total_bytes_processed", None) or 0,
+    )
+    with self._lock:
+      for table in getattr(job, "referenced_tables", None) or []:
+        self._jobs.setdefault(
+            f"{table.project}.{table.dataset_id}.{table.table_id}", []
+        ).append(stats)
+
+  def rehearse_table(self, table_config: argparse.Namespace):
+    name = source_table_id(table_config)
+    if table_config.copy_method == CopyMethod.BACKFILL:
+      logger.info(
+          f"Table {name} is backfilled by Datastream, it isn't rehearsed."
+      )
+      return
+    if table_config.copy_method in UNSAMPLED_COPY_METHODS:
+      logger.warning(
+          f"The '{table_config.copy_method}' copy method can't copy a sample,"
+          f" rehearsing table {name} with the '{CopyMethod.INSERT}' copy"
+          " method."
+      )
+      table_config.copy_method = CopyMethod.INSERT
+
+    target_table_id = (
+        f"{table_config.project_id}.{table_config.bigquery_target_dataset_name}."
+        f"{table_config.bigquery_target_table_name}"
+    )
+    try:
+      start = time.monotonic()
+      self.migrate(table_config)
+      seconds = time.monotonic() - start
+      sampled_rows = execute_count_rows(target_table_id, self.bigquery_client)
+    finally:
+      execute_delete_bigquery_table(
+          target_table_id, bigquery_client=self.bigquery_client
+      )
+
+    source_table: Optional[Table] = execute_get_bigquery_table(
+        name, bigquery_client=self.bigquery_client
+    )
+    with self._lock:
+      copy_jobs = self._jobs.pop(name, [])
+    table = TableRehearsal(
+        name=name,
+        copy_method=table_config.copy_method,
+        num_rows=(source_table.num_rows or 0) if source_table else 0,
+        num_bytes=(source_table.num_bytes or 0) if source_table else 0,
+        sampled_rows=sampled_rows,
+        seconds=seconds,
+        copy_seconds=_get_running_seconds(copy_jobs),
+        slot_millis=sum(j.slot_millis for j in copy_jobs),
+        bytes_processed=sum(j.bytes_processed for j in copy_jobs),
+    )
+    logger.info(
+        f"Rehearsed table {name} in {seconds:.1f} seconds, copied"
+        f" {sampled_rows} out of {table.num_rows} rows."
+    )
+    with self._lock:
+      self._tables.append(table)
+
+  def get_tables(self) -> List[TableRehearsal]:
+    with self._lock:
+      return sorted(self._tables, key=lambda t: t.name)
+
+  def get_report_rows(self) -> List[List[Any]]:
+    rows = []
+    for table in self.get_tables():
+      estimate = table.estimate(self.sample_percent)
+      rows.append(
+          [
+              table.name,
+              str(table.copy_method),
+              table.num_rows,
+              table.num_bytes,
+              table.sampled_rows,
+              round(table.seconds, 1),
+              round(table.copy_seconds, 1),
+              table.slot_millis,
+              table.bytes_processed,
+              round(estimate.seconds, 1),
+              round(estimate.slot_millis / MILLIS_PER_HOUR, 3),
+              round(estimate.bytes_processed),
+          ]
+      )
+    return rows
+
+  # Returns the estimated wall time of migrating the whole tables, when they
+  # are scheduled like the migration schedules them.
+  def estimate_seconds(self, scheduler: TableScheduler) -> float:
+    tables = self.get_tables()
+    return scheduler.simulate(
+        tables=[
+            ScheduledTable(
+                name=table.name,
+                size=TableSize(
+                    num_bytes=table.num_bytes, num_rows=table.num_rows
+                ),
+                payload=None,
+            )
+            for table in tables
+        ],
+        durations={
+            table.name: table.estimate(self.sample_percent).seconds
+            for table in tables
+        },
+    )
+
+  def estimate_slot_hours(self) -> float:
+    return (
+        sum(
+            table.estimate(self.sample_percent).slot_millis
+            for table in self.get_tables()
+        )
+        / MILLIS_PER_HOUR
+    )
+
+  def estimate_bytes_processed(self) -> float:
+    return sum(
+        table.estimate(self.sample_percent).bytes_processed
+        for table in self.get_tables()
+    )
+
+
+# Jobs of a table may run concurrently, for example partition ranges, so the
+# time during which any of them was running is counted once.
+def _get_running_seconds(jobs: List[JobStats]) -> float:
+  intervals: List[Tuple[datetime, datetime]] = sorted(
+      (job.started, job.ended) for job in jobs if job.started and job.ended
+  )
+  seconds = 0.0
+  current: Optional[Tuple[datetime, datetime]] = None
+  for started, ended in intervals:
+    if current and started <= current[1]:
+      current = (current[0], max(current[1], ended))
+      continue
+    if current:
+      seconds += (current[1] - current[0]).total_seconds()
+    current = (started, ended)
+  if current:
+    seconds += (current[1] - current[0]).total_seconds()
+  return seconds
@@ -0,0 +1,166 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+from typing import Dict, List, Optional
+from common.file_writer import write
+from common.metadata_cache import get_metadata_cache, source_table_ddl_key, table_fingerprint
+from common.output_names import BATCH_FETCH_BIGQUERY_TABLE_DDL_FILENAME_TEMPLATE, FETCH_BIGQUERY_TABLE_DDL_DIRECTORY
+from common.partitioning import get_source_partitioning
+from executors.fetch_bigquery_table_ddl import execute_batch_fetch_bigquery_table_ddl
+from executors.get_bigquery_table import execute_get_bigquery_table
+from google.cloud import bigquery
+from google.cloud.bigquery.table import Table
+from sql_generators.fetch_bigquery_table_ddl.fetch_bigquery_table_ddl import BatchBigQueryTableDDLFetcher
+
+logger = logging.getLogger(__name__)
+
+
+def source_table_id(config: argparse.Namespace) -> str:
+  return (
+      f"{config.project_id}.{config.bigquery_source_dataset_name}."
+      f"{config.bigquery_source_table_name}"
+  )
+
+
+def get_source_tables(
+    table_configs: List[argparse.Namespace],
+    bigquery_client: bigquery.Client,
+    max_workers: int,
+) -> Dict[str, Optional[Table]]:
+  logger.info(
+      f"Fetching the metadata of {len(table_configs)} existing BigQuery"
+      " tables.."
+  )
+  table_ids = [source_table_id(c) for c in table_configs]
+  with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    tables = executor.map(
+        lambda table_id: execute_get_bigquery_table(
+            table_id, bigquery_client=bigquery_client
+        ),
+        table_ids,
+    )
+    return dict(zip(table_ids, tables))
+
+
+# The partitioning of each existing table is taken from its metadata, instead
+# of getting the table again while migrating it.
+def set_source_partitionings(
+    table_configs: List[argparse.Namespace],
+    source_tables: Dict[str, Optional[Table]],
+):
+  for table_config in table_configs:
+    table_config.source_partitioning = get_source_partitioning(
+        source_tables.get(source_table_id(table_config))
+    )
+    table_config.source_partitioning_prefetched = True
+
+
+def prefetch_source_table_ddls(
+    table_configs: List[argparse.Namespace],
+    source_tables: Dict[str, Optional[Table]],
+    bigquery_client: bigquery.Client,
+):
+  table_configs_by_dataset: Dict[str, List[argparse.Namespace]] = defaultdict(
+      list
+  )
+  for table_config in table_configs:
+    # The migration of the table reports that it doesn't exist.
+    if not source_tables.get(source_table_id(table_config)):
+      continue
+    if _load_cached_source_table_ddl(table_config, source_tables):
+      table_config.source_table_ddl_prefetched = True
+    else:
+      table_configs_by_dataset[
+          table_config.bigquery_source_dataset_name
+      ].append(table_config)
+
+  for dataset, dataset_table_configs in table_configs_by_dataset.items():
+    _prefetch_dataset_source_table_ddls(
+        dataset=dataset,
+        table_configs=dataset_table_configs,
+        source_tables=source_tables,
+        bigquery_client=bigquery_client,
+    )
+
+
+def _prefetch_dataset_source_table_ddls(
+    dataset: str,
+    table_configs: List[argparse.Namespace],
+    source_tables: Dict[str, Optional[Table]],
+    bigquery_client: bigquery.Client,
+):
+  project_id = table_configs[0].project_id
+  sql_filepath = os.path.join(
+      FETCH_BIGQUERY_TABLE_DDL_DIRECTORY,
+      BATCH_FETCH_BIGQUERY_TABLE_DDL_FILENAME_TEMPLATE.format(
+          dataset_name=f"{project_id}.{dataset}"
+      ),
+  )
+  # Generate SQL statement for fetching the DDL of all the dataset's tables
+  BatchBigQueryTableDDLFetcher(
+      project_id=project_id,
+      dataset=dataset,
+      filepath=sql_filepath,
+  ).fetch_table_schemas()
+
+  # Run SQL statement and save each table's DDL to its own file
+  ddls = execute_batch_fetch_bigquery_table_ddl(
+      sql_filepath=sql_filepath,
+      output_paths={
+          c.bigquery_source_table_name: c.create_source_table_ddl_filepath
+          for c in table_configs
+      },
+      bigquery_client=bigquery_client,
+  )
+
+  metadata_cache = get_metadata_cache()
+  for table_config in table_configs:
+    ddl = ddls.get(table_config.bigquery_source_table_name)
+    # Tables that weren't found are fetched again by their migration.
+    if ddl is None:
+      continue
+    table_config.source_table_ddl_prefetched = True
+    table_id = source_table_id(table_config)
+    if metadata_cache:
+      metadata_cache.put(
+          source_table_ddl_key(table_id),
+          ddl,
+          fingerprint=table_fingerprint(source_tables[table_id]),
+      )
+
+
+def _load_cached_source_table_ddl(
+    table_config: argparse.Namespace,
+    source_tables: Dict[str, Optional[Table]],
+) -> bool:
+  metadata_cache = get_metadata_cache()
+  table_id = source_table_id(table_config)
+  if not metadata_cache or not source_tables.get(table_id):
+    return False
+
+  ddl = metadata_cache.get(
+      source_table_ddl_key(table_id),
+      fingerprint=table_fingerprint(source_tables[table_id]),
+  )
+  if ddl is None:
+    return False
+
+  logger.debug(f"Using cached DDL of table {table_id}")
+  write(filepath=table_config.create_source_table_ddl_filepath, data=ddl)
+  return True
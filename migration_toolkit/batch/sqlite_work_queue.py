@@ -0,0 +1,209 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import sqlite3
+import time
+from typing import Iterable, List, Optional
+import uuid
+from batch.work_queue import BaseWorkQueue, Lease, WorkItem, WorkItemState
+from common.sqlite_transaction import SqliteTransaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 3
+
+CREATE_WORK_ITEMS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS work_items (
+  name TEXT PRIMARY KEY,
+  num_bytes INTEGER NOT NULL,
+  num_rows INTEGER NOT NULL,
+  state TEXT NOT NULL,
+  worker_id TEXT,
+  lease_token TEXT,
+  lease_expires_at REAL,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  first_claimed_at REAL,
+  error TEXT
+)
+"""
+
+
+# Reference work queue backend, backed by a SQLite file that all workers can
+# reach, for example on a shared volume. Every state change runs in an
+# immediate transaction, so claiming a table is atomic across processes.
+# Lease expiry relies on the workers' clocks being roughly in sync.
+class SqliteWorkQueue(BaseWorkQueue):
+
+  def __init__(self, filepath: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+    self.filepath: str = filepath
+    self.max_attempts: int = max_attempts
+    with self._transaction() as connection:
+      connection.execute(CREATE_WORK_ITEMS_TABLE_SQL)
+
+  def list_names(self) -> List[str]:
+    with self._transaction(read_only=True) as connection:
+      return [
+          row[0] for row in connection.execute("SELECT name FROM work_items")
+      ]
+
+  def enqueue(self, items: Iterable[WorkItem]):
+    with self._transaction() as connection:
+      connection.executemany(
+          "INSERT OR IGNORE INTO work_items (name, num_bytes, num_rows, state)"
+          " VALUES (?, ?, ?, ?)",
+          [
+              (
+                  item.name,
+                  item.num_bytes,
+                  item.num_rows,
+                  str(WorkItemState.PENDING),
+              )
+              for item in items
+          ],
+      )
+
+  def claim(
+      self,
+      worker_id: str,
+      lease_seconds: float,
+      max_leased_large_items: Optional[int] = None,
+      large_item_threshold_bytes: Optional[int] = None,
+  ) -> Optional[Lease]:
+    with self._transaction() as connection:
+      now = time.time()
+      self._reclaim_expired_leases(connection, now)
+
+      if max_leased_large_items is not None and (
+          self._count_leased_large_items(connection, large_item_threshold_bytes)
+          >= max_leased_large_items
+      ):
+        row = connection.execute(
+            "SELECT name FROM work_items WHERE state = ? AND num_bytes < ?"
+            " ORDER BY num_bytes DESC, num_rows DESC LIMIT 1",
+            (str(WorkItemState.PENDING), large_item_threshold_bytes),
+        ).fetchone()
+      else:
+        row = connection.execute(
+            "SELECT name FROM work_items WHERE state = ?"
+            " ORDER BY num_bytes DESC, num_rows DESC LIMIT 1",
+            (str(WorkItemState.PENDING),),
+        ).fetchone()
+
+      if not row:
+        return None
+
+      name, token = row[0], uuid.uuid4().hex
+      connection.execute(
+          "UPDATE work_items SET state = ?, worker_id = ?, lease_token = ?,"
+          " lease_expires_at = ?, attempts = attempts + 1, first_claimed_at ="
+          " COALESCE(first_claimed_at, ?) WHERE name = ?",
+          (
+              str(WorkItemState.LEASED),
+              worker_id,
+              token,
+              now + lease_seconds,
+              now,
+              name,
+          ),
+      )
+      attempt, first_claimed_at = connection.execute(
+          "SELECT attempts, first_claimed_at FROM work_items WHERE name = ?",
+          (name,),
+      ).fetchone()
+      lease = Lease(
+          name=name,
+          worker_id=worker_id,
+          token=token,
+          attempt=attempt,
+          first_claimed_at=first_claimed_at,
+      )
+
+    logger.debug(f"Worker '{worker_id}' claimed '{lease.name}'")
+    return lease
+
+  def renew(self, lease: Lease, lease_seconds: float) -> bool:
+    return self._update_leased_item(
+        lease,
+        "lease_expires_at = ?",
+        (time.time() + lease_seconds,),
+    )
+
+  def complete(self, lease: Lease) -> bool:
+    return self._update_leased_item(
+        lease, "state = ?", (str(WorkItemState.DONE),)
+    )
+
+  def fail(self, lease: Lease, error: str) -> bool:
+    return self._update_leased_item(
+        lease, "state = ?, error = ?", (str(WorkItemState.FAILED), error)
+    )
+
+  def is_drained(self) -> bool:
+    with self._transaction() as connection:
+      self._reclaim_expired_leases(connection, time.time())
+      (unfinished,) = connection.execute(
+          "SELECT COUNT(*) FROM work_items WHERE state IN (?, ?)",
+          (str(WorkItemState.PENDING), str(WorkItemState.LEASED)),
+      ).fetchone()
+    return unfinished == 0
+
+  def _update_leased_item(self, lease: Lease, assignments: str, values) -> bool:
+    with self._transaction() as connection:
+      cursor = connection.execute(
+          f"UPDATE work_items SET {assignments} WHERE name = ? AND"
+          " lease_token = ? AND state = ?",
+          (*values, lease.name, lease.token, str(WorkItemState.LEASED)),
+      )
+      return cursor.rowcount == 1
+
+  def _reclaim_expired_leases(self, connection: sqlite3.Connection, now):
+    expired = connection.execute(
+        "SELECT name, worker_id, attempts FROM work_items WHERE state = ? AND"
+        " lease_expires_at < ?",
+        (str(WorkItemState.LEASED), now),
+    ).fetchall()
+
+    for name, worker_id, attempts in expired:
+      if attempts >= self.max_attempts:
+        logger.warning(
+            f"Lease of worker '{worker_id}' on '{name}' expired after"
+            f" {attempts} attempts, marking it as failed."
+        )
+        state, error = WorkItemState.FAILED, "Lease expired too many times."
+      else:
+        logger.warning(
+            f"Lease of worker '{worker_id}' on '{name}' expired, reclaiming it."
+        )
+        state, error = WorkItemState.PENDING, None
+
+      connection.execute(
+          "UPDATE work_items SET state = ?, error = ?, worker_id = NULL,"
+          " lease_token = NULL, lease_expires_at = NULL WHERE name = ?",
+          (str(state), error, name),
+      )
+
+  @staticmethod
+  def _count_leased_large_items(
+      connection: sqlite3.Connection, large_item_threshold_bytes: int
+  ) -> int:
+    (count,) = connection.execute(
+        "SELECT COUNT(*) FROM work_items WHERE state = ? AND num_bytes >= ?",
+        (str(WorkItemState.LEASED), large_item_threshold_bytes),
+    ).fetchone()
+    return count
+
+  # Workers on other hosts share the file, so it keeps the rollback journal.
+  def _transaction(self, read_only: bool = False):
+    return SqliteTransaction(self.filepath, read_only=read_only, wal=False)
@@ -0,0 +1,196 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import sys
+import time
+from typing import Optional
+from common.defaults import DEFAULT_LATENCY_WAIT_SECONDS, DEFAULT_STREAM_STATE_TIMEOUT_SECONDS
+from executors.get_stream import execute_get_stream
+from executors.get_stream_latency import execute_get_stream_total_latency
+from executors.update_stream import start_update_stream
+from google.cloud.datastream_v1.types import Stream
+
+logger = logging.getLogger(__name__)
+
+INITIAL_POLL_SECONDS = 5.0
+MAX_POLL_SECONDS = 60.0
+
+_FAILED_STATES = (Stream.State.FAILED, Stream.State.FAILED_PERMANENTLY)
+
+
+def pause_stream(
+    project_id: str,
+    datastream_region: str,
+    stream_id: str,
+    datastream_api_endpoint_override: Optional[str],
+    timeout_seconds: float,
+) -> Stream:
+  return _set_stream_state(
+      project_id=project_id,
+      datastream_region=datastream_region,
+      stream_id=stream_id,
+      datastream_api_endpoint_override=datastream_api_endpoint_override,
+      state=Stream.State.PAUSED,
+      timeout_seconds=timeout_seconds,
+  )
+
+
+def resume_stream(
+    project_id: str,
+    datastream_region: str,
+    stream_id: str,
+    datastream_api_endpoint_override: Optional[str],
+    timeout_seconds: float,
+) -> Stream:
+  return _set_stream_state(
+      project_id=project_id,
+      datastream_region=datastream_region,
+      stream_id=stream_id,
+      datastream_api_endpoint_override=datastream_api_endpoint_override,
+      state=Stream.State.RUNNING,
+      timeout_seconds=timeout_seconds,
+  )
+
+
+# Waits until the events the stream read before it was paused are written to
+# the destination, which takes at most the stream's total latency. The latency
+# is read again on every poll, as it changes while the stream drains. If it
+# can't be read at all, waits `fallback_seconds` instead.
+def wait_for_in_flight_events(
+    project_id: str,
+    datastream_region: str,
+    stream_id: str,
+    paused_at: float,
+    fallback_seconds: float,
+):
+  latency: Optional[float] = None
+  poll_seconds = INITIAL_POLL_SECONDS
+
+  while True:
+    latency = (
+        execute_get_stream_total_latency(
+            project_id=project_id,
+            datastream_region=datastream_region,
+            stream_id=stream_id,
+        )
+        or latency
+    )
+    if latency is None:
+      remaining_seconds = paused_at + fallback_seconds - time.time()
+      logger.info(
+          f"Total latency of stream '{stream_id}' is unknown, waiting"
+          f" {max(remaining_seconds, 0):.0f} seconds for in-flight events.."
+      )
+      time.sleep(max(remaining_seconds, 0))
+      return
+
+    remaining_seconds = paused_at + latency - time.time()
+    if remaining_seconds <= 0:
+      logger.info(
+          f"Total latency of stream '{stream_id}' ({latency:.0f} seconds)"
+          " elapsed since it was paused."
+      )
+      return
+
+    logger.info(
+        f"Total latency of stream '{stream_id}' is {latency:.0f} seconds,"
+        f" waiting up to {remaining_seconds:.0f} seconds for in-flight"
+        " events.."
+    )
+    time.sleep(min(remaining_seconds, poll_seconds))
+    poll_seconds = min(poll_seconds * 2, MAX_POLL_SECONDS)
+
+
+def _set_stream_state(
+    project_id: str,
+    datastream_region: str,
+    stream_id: str,
+    datastream_api_endpoint_override: Optional[str],
+    state: Stream.State,
+    timeout_seconds: float,
+) -> Stream:
+  stream = execute_get_stream(
+      project_id=project_id,
+      datastream_region=datastream_region,
+      stream_id=stream_id,
+      datastream_api_endpoint_override=datastream_api_endpoint_override,
+  )
+  if stream.state == state:
+    logger.info(f"Stream '{stream_id}' is already in state {state.name}.")
+    return stream
+
+  # Only the state is updated, other fields of the stream are left as they are.
+  start_update_stream(
+      stream=Stream(
+          name=stream.name, display_name=stream.display_name, state=state
+      ),
+      datastream_api_endpoint_override=datastream_api_endpoint_override,
+      update_mask=["state"],
+  ).wait()
+
+  return _wait_for_stream_state(
+      project_id=project_id,
+      datastream_region=datastream_region,
+      stream_id=stream_id,
+      datastream_api_endpoint_override=datastream_api_endpoint_override,
+      state=state,
+      timeout_seconds=timeout_seconds,
+  )
+
+
+# Polls the stream with exponential backoff until it reaches the state, for
+# example until a paused stream finished draining.
+def _wait_for_stream_state(
+    project_id: str,
+    datastream_region: str,
+    stream_id: str,
+    datastream_api_endpoint_override: Optional[str],
+    state: Stream.State,
+    timeout_seconds: float,
+) -> Stream:
+  deadline = time.monotonic() + timeout_seconds
+  poll_seconds = INITIAL_POLL_SECONDS
+
+  while True:
+    stream = execute_get_stream(
+        project_id=project_id,
+        datastream_region=datastream_region,
+        stream_id=stream_id,
+        datastream_api_endpoint_override=datastream_api_endpoint_override,
+    )
+    if stream.state == state:
+      logger.info(f"Stream '{stream_id}' is in state {state.name}.")
+      return stream
+
+    if stream.state in _FAILED_STATES:
+      logger.error(
+          f"ERROR: Stream '{stream_id}' is in state {stream.state.name},"
+          f" expected it to be in state {state.name}."
+      )
+      sys.exit(1)
+
+    if time.monotonic() + poll_seconds >= deadline:
+      logger.error(
+          f"ERROR: Stream '{stream_id}' didn't reach state {state.name} within"
+          f" {timeout_seconds} seconds, it is in state {stream.state.name}."
+      )
+      sys.exit(1)
+
+    logger.info(
+        f"Stream '{stream_id}' is in state {stream.state.name}, waiting for"
+        f" state {state.name}.."
+    )
+    time.sleep(poll_seconds)
+    poll_seconds = min(poll_seconds * 2, MAX_POLL_SECONDS)
@@ -0,0 +1,58 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import csv
+import logging
+from typing import List, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+
+class TableManifestEntry(NamedTuple):
+  source_schema_name: str
+  source_table_name: str
+  bigquery_source_dataset_name: str
+  bigquery_source_table_name: str
+
+
+def read_table_manifest(filepath: str) -> List[TableManifestEntry]:
+  logger.info(f"Reading tables manifest from file {filepath}")
+  with open(filepath, "r", newline="") as f:
+    reader = csv.DictReader(f)
+    missing_columns = set(TableManifestEntry._fields) - set(
+        reader.fieldnames or []
+    )
+    if missing_columns:
+      raise ValueError(
+          f"Tables manifest '{filepath}' is missing the columns"
+          f" {sorted(missing_columns)}. Expected a CSV file with the header"
+          f" '{','.join(TableManifestEntry._fields)}'."
+      )
+
+    entries = [
+        TableManifestEntry(
+            **{
+                field: row[field].strip()
+                for field in TableManifestEntry._fields
+            }
+        )
+        for row in reader
+        if any(value and value.strip() for value in row.values())
+    ]
+
+  if not entries:
+    raise ValueError(f"Tables manifest '{filepath}' doesn't list any tables.")
+
+  logger.debug(f"Tables manifest entries: {entries}")
+  return entries
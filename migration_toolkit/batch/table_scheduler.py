@@ -0,0 +1,166 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import heapq
+import itertools
+import logging
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from common.defaults import DEFAULT_LARGE_TABLE_THRESHOLD_BYTES
+
+logger = logging.getLogger(__name__)
+
+
+class TableSize(NamedTuple):
+  num_bytes: int
+  num_rows: int
+
+
+class ScheduledTable(NamedTuple):
+  name: str
+  size: TableSize
+  payload: Any
+
+
+class TableResult(NamedTuple):
+  name: str
+  error: Optional[BaseException]
+
+
+# Runs a function on many tables concurrently, starting the largest tables first
+# (longest-processing-time-first) so that a huge table doesn't start last and
+# run alone at the end of the batch. When `max_concurrent_large_tables` is set,
+# smaller tables fill the free slots while the large tables wait for their turn.
+class TableScheduler:
+
+  def __init__(
+      self,
+      max_concurrent_tables: int,
+      max_concurrent_large_tables: Optional[int] = None,
+      large_table_threshold_bytes: int = DEFAULT_LARGE_TABLE_THRESHOLD_BYTES,
+  ):
+    if max_concurrent_tables < 1:
+      raise ValueError(
+          "max_concurrent_tables must be at least 1, but got"
+          f" {max_concurrent_tables}"
+      )
+    if (
+        max_concurrent_large_tables is not None
+        and max_concurrent_large_tables < 1
+    ):
+      raise ValueError(
+          "max_concurrent_large_tables must be at least 1, but got"
+          f" {max_concurrent_large_tables}"
+      )
+    self.max_concurrent_tables: int = max_concurrent_tables
+    self.max_concurrent_large_tables: Optional[int] = (
+        max_concurrent_large_tables
+    )
+    self.large_table_threshold_bytes: int = large_table_threshold_bytes
+
+  def order(self, tables: List[ScheduledTable]) -> List[ScheduledTable]:
+    return sorted(
+        tables,
+        key=lambda t: (t.size.num_bytes, t.size.num_rows),
+        reverse=True,
+    )
+
+  def is_large(self, table: ScheduledTable) -> bool:
+    return table.size.num_bytes >= self.large_table_threshold_bytes
+
+  def run(
+      self,
+      tables: List[ScheduledTable],
+      fn: Callable[[Any], Any],
+  ) -> List[TableResult]:
+    pending: List[ScheduledTable] = self.order(tables)
+    running: Dict[Future, ScheduledTable] = {}
+    results: List[TableResult] = []
+    running_large_tables = 0
+
+    logger.info(
+        f"Scheduling {len(pending)} tables, at most"
+        f" {self.max_concurrent_tables} at a time, largest first."
+    )
+
+    with ThreadPoolExecutor(max_workers=self.max_concurrent_tables) as executor:
+      while pending or running:
+        while len(running) < self.max_concurrent_tables:
+          table = self._next_table(pending, running_large_tables)
+          if table is None:
+            break
+          pending.remove(table)
+          if self.is_large(table):
+            running_large_tables += 1
+          logger.info(
+              f"Starting table '{table.name}' ({table.size.num_bytes} bytes,"
+              f" {table.size.num_rows} rows). {len(pending)} tables pending."
+          )
+          running[executor.submit(fn, table.payload)] = table
+
+        done, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+        for future in done:
+          table = running.pop(future)
+          if self.is_large(table):
+            running_large_tables -= 1
+          error = future.exception()
+          if error:
+            logger.error(f"Table '{table.name}' failed: {error!r}")
+          else:
+            logger.info(f"Table '{table.name}' finished.")
+          results.append(TableResult(name=table.name, error=error))
+
+    return results
+
+  # Returns how long running the tables would take, given how long each table
+  # takes by its name, when they are scheduled like `run` schedules them.
+  def simulate(
+      self, tables: List[ScheduledTable], durations: Dict[str, float]
+  ) -> float:
+    pending: List[ScheduledTable] = self.order(tables)
+    # The finish time of each running table, ties are broken by start order.
+    running: List[Tuple[float, int, ScheduledTable]] = []
+    start_order = itertools.count()
+    running_large_tables = 0
+    now = 0.0
+
+    while pending or running:
+      while len(running) < self.max_concurrent_tables:
+        table = self._next_table(pending, running_large_tables)
+        if table is None:
+          break
+        pending.remove(table)
+        if self.is_large(table):
+          running_large_tables += 1
+        heapq.heappush(
+            running, (now + durations[table.name], next(start_order), table)
+        )
+
+      now, _, table = heapq.heappop(running)
+      if self.is_large(table):
+        running_large_tables -= 1
+
+    return now
+
+  def _next_table(
+      self, pending: List[ScheduledTable], running_large_tables: int
+  ) -> Optional[ScheduledTable]:
+    large_tables_allowed = (
+        self.max_concurrent_large_tables is None
+        or running_large_tables < self.max_concurrent_large_tables
+    )
+    return next(
+        (t for t in pending if large_tables_allowed or not self.is_large(t)),
+        None,
+    )
@@ -0,0 +1,96 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import logging
+from typing import Dict, List, Optional, Set
+from executors.create_dataset import execute_create_dataset
+from executors.list_bigquery_tables import execute_list_bigquery_tables
+from google.cloud import bigquery
+from sql_generators.create_dataset.create_dataset import CreateDatasetDDLGenerator
+
+logger = logging.getLogger(__name__)
+
+
+def target_dataset_id(config: argparse.Namespace) -> str:
+  return f"{config.project_id}.{config.bigquery_target_dataset_name}"
+
+
+# Lists the tables of each target dataset once, instead of getting every target
+# table, and records on each table config whether its target table exists.
+# Returns the table names of each dataset, or None for datasets that don't
+# exist.
+def index_target_tables(
+    table_configs: List[argparse.Namespace],
+    bigquery_client: bigquery.Client,
+    max_workers: int,
+) -> Dict[str, Optional[Set[str]]]:
+  dataset_ids = sorted({target_dataset_id(c) for c in table_configs})
+  logger.info(f"Listing the tables of {len(dataset_ids)} target datasets..")
+  with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    target_tables = dict(
+        zip(
+            dataset_ids,
+            executor.map(
+                lambda dataset_id: execute_list_bigquery_tables(
+                    dataset_id, bigquery_client=bigquery_client
+                ),
+                dataset_ids,
+            ),
+        )
+    )
+
+  for table_config in table_configs:
+    table_config.target_table_exists = (
+        table_config.bigquery_target_table_name
+        in (target_tables[target_dataset_id(table_config)] or set())
+    )
+  return target_tables
+
+
+# Generates the DDL of each dataset of a dynamic datasets stream once, and runs
+# it for the datasets that don't exist yet, so that the tables' DDLs only
+# create the tables.
+def prepare_target_datasets(
+    table_configs: List[argparse.Namespace],
+    target_tables: Dict[str, Optional[Set[str]]],
+    bigquery_client: bigquery.Client,
+    create_datasets: bool,
+):
+  table_configs_by_dataset: Dict[str, List[argparse.Namespace]] = {}
+  for table_config in table_configs:
+    if not table_config.single_target_stream:
+      table_configs_by_dataset.setdefault(
+          target_dataset_id(table_config), []
+      ).append(table_config)
+
+  for dataset_id, dataset_table_configs in table_configs_by_dataset.items():
+    table_config = dataset_table_configs[0]
+    CreateDatasetDDLGenerator(
+        project_id=table_config.project_id,
+        dataset_name=table_config.bigquery_target_dataset_name,
+        bigquery_region=table_config.bigquery_region,
+        bigquery_kms_key_name=table_config.bigquery_kms_key_name,
+        filepath=table_config.create_target_dataset_ddl_filepath,
+    ).generate_ddl()
+
+    if create_datasets and target_tables.get(dataset_id) is None:
+      execute_create_dataset(
+          table_config.create_target_dataset_ddl_filepath,
+          bigquery_client=bigquery_client,
+      )
+
+    for dataset_table_config in dataset_table_configs:
+      dataset_table_config.create_target_dataset = False
@@ -0,0 +1,130 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from abc import ABC, abstractmethod
+import enum
+import logging
+import threading
+from typing import Iterable, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WorkItemState(enum.Enum):
+  PENDING = "PENDING"
+  LEASED = "LEASED"
+  DONE = "DONE"
+  FAILED = "FAILED"
+
+  def __str__(self):
+    return self.value
+
+
+class WorkItem(NamedTuple):
+  name: str
+  num_bytes: int
+  num_rows: int
+
+
+# `attempt` counts the leases on the item so far, including this one.
+# `first_claimed_at` is when a worker first claimed the item, in seconds since
+# the epoch.
+class Lease(NamedTuple):
+  name: str
+  worker_id: str
+  token: str
+  attempt: int = 1
+  first_claimed_at: Optional[float] = None
+
+
+# A queue of tables shared by all the workers of a batch migration. A worker
+# owns a table only while it holds an unexpired lease on it, and has to renew
+# the lease periodically. Leases of workers that stopped renewing them are
+# reclaimed and handed to other workers.
+class BaseWorkQueue(ABC):
+
+  @abstractmethod
+  def list_names(self) -> List[str]:
+    raise NotImplementedError
+
+  @abstractmethod
+  def enqueue(self, items: Iterable[WorkItem]):
+    raise NotImplementedError
+
+  @abstractmethod
+  def claim(
+      self,
+      worker_id: str,
+      lease_seconds: float,
+      max_leased_large_items: Optional[int] = None,
+      large_item_threshold_bytes: Optional[int] = None,
+  ) -> Optional[Lease]:
+    raise NotImplementedError
+
+  @abstractmethod
+  def renew(self, lease: Lease, lease_seconds: float) -> bool:
+    raise NotImplementedError
+
+  @abstractmethod
+  def complete(self, lease: Lease) -> bool:
+    raise NotImplementedError
+
+  @abstractmethod
+  def fail(self, lease: Lease, error: str) -> bool:
+    raise NotImplementedError
+
+  @abstractmethod
+  def is_drained(self) -> bool:
+    raise NotImplementedError
+
+
+class LeaseHeartbeat:
+
+  def __init__(
+      self, work_queue: BaseWorkQueue, lease: Lease, lease_seconds: float
+  ):
+    self.work_queue: BaseWorkQueue = work_queue
+    self.lease: Lease = lease
+    self.lease_seconds: float = lease_seconds
+    self.lost: threading.Event = threading.Event()
+    self._stopped = threading.Event()
+    self._thread = threading.Thread(
+        target=self._run, name=f"heartbeat-{lease.name}", daemon=True
+    )
+
+  def __enter__(self):
+    self._thread.start()
+    return self
+
+  def __exit__(self, *args):
+    self._stopped.set()
+    self._thread.join()
+
+  def _run(self):
+    # Renew well before the lease expires, so a single slow renewal doesn't
+    # hand the table to another worker.
+    while not self._stopped.wait(self.lease_seconds / 3):
+      try:
+        renewed = self.work_queue.renew(self.lease, self.lease_seconds)
+      except Exception as ex:
+        logger.warning(f"Failed to renew lease on '{self.lease.name}': {ex!r}")
+        continue
+
+      if not renewed:
+        logger.error(
+            f"ERROR: Lost the lease on '{self.lease.name}', another worker may"
+            " be migrating it."
+        )
+        self.lost.set()
+        return
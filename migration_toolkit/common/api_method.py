@@ -0,0 +1,35 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import enum
+
+
+class ApiMethod(enum.Enum):
+  DISCOVER = "discover"
+  GET_STREAM = "get_stream"
+  UPDATE_STREAM = "update_stream"
+  GET_TABLE = "get_table"
+  LIST_TABLES = "list_tables"
+  DELETE_TABLE = "delete_table"
+  LOOKUP_STREAM_OBJECT = "lookup_stream_object"
+  START_BACKFILL_JOB = "start_backfill_job"
+  INSERT_JOB = "insert_job"
+  GET_JOB = "get_job"
+  CREATE_READ_SESSION = "create_read_session"
+  CREATE_WRITE_STREAM = "create_write_stream"
+  FINALIZE_WRITE_STREAM = "finalize_write_stream"
+  COMMIT_WRITE_STREAMS = "commit_write_streams"
+
+  def __str__(self):
+    return self.value
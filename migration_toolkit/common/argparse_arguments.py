@@ -13,7 +13,16 @@
 # limitations under the License.
 
 import argparse
+import os
+import socket
+from typing import Optional
+from common.api_method import ApiMethod
+from common.copy_method import CopyMethod
+from common.defaults import DEFAULT_BACKFILL_ROWS_PER_SECOND, DEFAULT_COPY_BYTES_PER_SECOND, DEFAULT_LARGE_TABLE_THRESHOLD_BYTES, DEFAULT_LATENCY_WAIT_SECONDS, DEFAULT_LEASE_SECONDS, DEFAULT_LOAD_JOB_COUNT, DEFAULT_READ_STREAM_COUNT, DEFAULT_SAMPLE_PERCENT, DEFAULT_STREAM_STATE_TIMEOUT_SECONDS, DEFAULT_WRITE_STREAM_COUNT
+from common.extract_format import ExtractFormat
+from common.metadata_cache import DEFAULT_DISCOVER_TTL_SECONDS, DEFAULT_MAX_SIZE_BYTES
 from common.migration_mode import MigrationMode
+from common.partitioning import PartitionGranularity
 
 
 def migration_mode(parser):
@@ -32,6 +41,234 @@ def migration_mode(parser):
   )
 
 
+def copy_method(parser):
+  parser.add_argument(
+      "--copy-method",
+      required=False,
+      type=CopyMethod,
+      choices=list(CopyMethod),
+      default=CopyMethod.INSERT,
+      help=(
+          f"How rows are copied.\n'{CopyMethod.INSERT.value}': run an `INSERT`"
+          " DML statement. BigQuery queues concurrent DML statements on the"
+          f" same table.\n'{CopyMethod.APPEND.value}': run a `SELECT` query"
+          " job that appends its results to the new table. Append jobs aren't"
+          " limited like DML statements, so several of them can write to the"
+          f" same table at the same time.\n'{CopyMethod.MERGE.value}': run a"
+          " `MERGE` statement on the primary key of the new table. Running"
+          " the migration again after a failed copy merges the remaining rows"
+          " without duplicating the copied ones.\n"
+          f"'{CopyMethod.BACKFILL.value}': only create the new table, and start"
+          " a Datastream backfill of the source table instead of copying the"
+          f" rows.\n'{CopyMethod.STORAGE_API.value}': read the rows with the"
+          " BigQuery Storage Read API and write them with the Storage Write"
+          " API, converting them on the way. The new table can be in another"
+          " region than the existing table. The schema of the existing table"
+          " is always read from the tables API (see"
+          " `--source-schema-from-api`). Requires `pyarrow`.\n"
+          f"'{CopyMethod.EXTRACT_LOAD.value}': extract the existing table to"
+          " `--staging-uri` and load the files to the new table, which isn't"
+          " billed like a query. Only tables without casts are copied this"
+          " way, the others are copied by an `INSERT` statement. Defaults to"
+          " '%(default)s'."
+      ),
+  )
+
+
+def merge_bucket_count(parser):
+  parser.add_argument(
+      "--merge-bucket-count",
+      required=False,
+      type=int,
+      default=1,
+      help=(
+          f"Number of buckets the '{CopyMethod.MERGE.value}' copy method splits"
+          " the rows into, by the hash of their primary key. Each bucket is"
+          " merged by a separate statement, and buckets that were merged are"
+          " skipped when the migration is run again after a failure. Defaults"
+          " to %(default)s."
+      ),
+  )
+
+
+def storage_read_stream_count(parser):
+  parser.add_argument(
+      "--storage-read-stream-count",
+      required=False,
+      type=int,
+      default=DEFAULT_READ_STREAM_COUNT,
+      help=(
+          "Maximum number of streams the"
+          f" '{CopyMethod.STORAGE_API.value}' copy method reads each existing"
+          " table with concurrently. Defaults to %(default)s."
+      ),
+  )
+
+
+def storage_write_stream_count(parser):
+  parser.add_argument(
+      "--storage-write-stream-count",
+      required=False,
+      type=int,
+      default=DEFAULT_WRITE_STREAM_COUNT,
+      help=(
+          f"Number of streams the '{CopyMethod.STORAGE_API.value}' copy method"
+          " writes each new table with concurrently. Defaults to %(default)s."
+      ),
+  )
+
+
+def staging_uri(parser):
+  parser.add_argument(
+      "--staging-uri",
+      required=False,
+      help=(
+          f"Where the '{CopyMethod.EXTRACT_LOAD.value}' copy method stages the"
+          " extracted files, for example `gs://my-bucket/migration`. The"
+          " bucket must be in the region of the existing tables. Files are"
+          " deleted once they were loaded."
+      ),
+  )
+
+
+def extract_format(parser):
+  parser.add_argument(
+      "--extract-format",
+      required=False,
+      type=ExtractFormat,
+      choices=list(ExtractFormat),
+      default=ExtractFormat.AVRO,
+      help=(
+          f"File format of the '{CopyMethod.EXTRACT_LOAD.value}' copy method."
+          " Defaults to '%(default)s'."
+      ),
+  )
+
+
+def load_job_count(parser):
+  parser.add_argument(
+      "--load-job-count",
+      required=False,
+      type=int,
+      default=DEFAULT_LOAD_JOB_COUNT,
+      help=(
+          f"Number of load jobs the '{CopyMethod.EXTRACT_LOAD.value}' copy"
+          " method splits the extracted files of each table between. The"
+          " jobs run concurrently, but a table loaded by several jobs isn't"
+          " loaded atomically: if a job fails, the rows appended by the other"
+          " jobs stay in the table. Defaults to %(default)s."
+      ),
+  )
+
+
+def plan_copy_methods(parser):
+  parser.add_argument(
+      "--plan-copy-methods",
+      help=(
+          "Estimate for each table whether copying the rows of the existing"
+          " BigQuery table or letting Datastream backfill them from the source"
+          " is cheaper, based on the table's size, number of rows, number of"
+          " casts and staleness. Tables that are cheaper to backfill use the"
+          f" '{CopyMethod.BACKFILL.value}' copy method."
+      ),
+      default=False,
+      action="store_true",
+  )
+
+
+def copy_bytes_per_second(parser):
+  parser.add_argument(
+      "--copy-bytes-per-second",
+      required=False,
+      type=int,
+      default=DEFAULT_COPY_BYTES_PER_SECOND,
+      help=(
+          "Estimated rate at which rows are copied from the existing BigQuery"
+          " tables, before casts, used by `--plan-copy-methods`. Defaults to"
+          " %(default)s."
+      ),
+  )
+
+
+def backfill_rows_per_second(parser):
+  parser.add_argument(
+      "--backfill-rows-per-second",
+      required=False,
+      type=int,
+      default=DEFAULT_BACKFILL_ROWS_PER_SECOND,
+      help=(
+          "Estimated rate at which Datastream backfills rows from the source,"
+          " used by `--plan-copy-methods`. Defaults to %(default)s."
+      ),
+  )
+
+
+def max_copy_staleness_seconds(parser):
+  parser.add_argument(
+      "--max-copy-staleness-seconds",
+      required=False,
+      type=int,
+      help=(
+          "With `--plan-copy-methods`, existing BigQuery tables that weren't"
+          " modified for longer than this are backfilled instead of copied."
+      ),
+  )
+
+
+def partition_column(parser):
+  parser.add_argument(
+      "--partition-column",
+      required=False,
+      help=(
+          "Partition the new BigQuery table by this TIMESTAMP, DATETIME or DATE"
+          " column."
+      ),
+  )
+
+
+def partition_granularity(parser):
+  parser.add_argument(
+      "--partition-granularity",
+      required=False,
+      type=PartitionGranularity,
+      choices=list(PartitionGranularity),
+      default=PartitionGranularity.DAY,
+      help=(
+          "Time unit of the partitions of `--partition-column`. Defaults to"
+          " '%(default)s'."
+      ),
+  )
+
+
+def partition_like_source_table(parser):
+  parser.add_argument(
+      "--partition-like-source-table",
+      help=(
+          "Partition the new BigQuery table like the existing BigQuery table,"
+          " unless `--partition-column` is given. Ingestion time partitioning"
+          " isn't kept."
+      ),
+      default=False,
+      action="store_true",
+  )
+
+
+def partition_range_count(parser):
+  parser.add_argument(
+      "--partition-range-count",
+      required=False,
+      type=int,
+      default=1,
+      help=(
+          "Number of ranges the partitions of the existing BigQuery table are"
+          " split into, with about the same number of rows in each range,"
+          " according to INFORMATION_SCHEMA.PARTITIONS. The ranges are copied"
+          f" concurrently. Not supported by the '{CopyMethod.MERGE.value}' copy"
+          " method. Defaults to %(default)s."
+      ),
+  )
+
+
 def force(parser):
   parser.add_argument(
       "--force",
@@ -123,3 +360,342 @@ def bigquery_source_table_name(parser):
           " `dataflow_table`."
       ),
   )
+
+
+def old_stream_id(parser):
+  parser.add_argument(
+      "--old-stream-id",
+      required=True,
+      help=(
+          "ID of the Datastream stream of the pipeline being migrated from, in"
+          " the same project and location as `--stream-id`."
+      ),
+  )
+
+
+def tables_file(parser):
+  parser.add_argument(
+      "--tables-file",
+      required=True,
+      help=(
+          "Path to a CSV file listing the tables to migrate, with the header"
+          " 'source_schema_name,source_table_name,bigquery_source_dataset_name,"
+          "bigquery_source_table_name'."
+      ),
+  )
+
+
+def max_concurrent_tables(parser):
+  parser.add_argument(
+      "--max-concurrent-tables",
+      required=False,
+      type=int,
+      default=4,
+      help="Maximal number of tables migrated at the same time.",
+  )
+
+
+def max_concurrent_large_tables(parser):
+  parser.add_argument(
+      "--max-concurrent-large-tables",
+      required=False,
+      type=int,
+      default=None,
+      help=(
+          "Maximal number of large tables (see `--large-table-threshold-bytes`)"
+          " migrated at the same time. Unlimited by default."
+      ),
+  )
+
+
+def large_table_threshold_bytes(parser):
+  parser.add_argument(
+      "--large-table-threshold-bytes",
+      required=False,
+      type=int,
+      default=DEFAULT_LARGE_TABLE_THRESHOLD_BYTES,
+      help=(
+          "Existing BigQuery tables of at least this size are considered large."
+          f" Defaults to {DEFAULT_LARGE_TABLE_THRESHOLD_BYTES} bytes."
+      ),
+  )
+
+
+def work_queue_path(parser):
+  parser.add_argument(
+      "--work-queue-path",
+      required=False,
+      default=None,
+      help=(
+          "Path to a SQLite work queue file shared by several workers, for"
+          " example on a shared volume. When set, the tables are claimed from"
+          " the work queue, so that each table is migrated by exactly one"
+          " worker. Services embedding the toolkit can open another work"
+          " queue backend from the path with"
+          " `migrate_tables.set_work_queue_factory`."
+      ),
+  )
+
+
+def worker_id(parser):
+  parser.add_argument(
+      "--worker-id",
+      required=False,
+      default=f"{socket.gethostname()}-{os.getpid()}",
+      help="Unique ID of this worker. Defaults to the host name and process ID.",
+  )
+
+
+def lease_seconds(parser):
+  parser.add_argument(
+      "--lease-seconds",
+      required=False,
+      type=float,
+      default=DEFAULT_LEASE_SECONDS,
+      help=(
+          "Duration of a worker's lease on a table. Leases are renewed while"
+          " the table is being migrated, and reclaimed by other workers once"
+          f" expired. Defaults to {DEFAULT_LEASE_SECONDS} seconds."
+      ),
+  )
+
+
+def max_workers(parser):
+  parser.add_argument(
+      "--max-workers",
+      required=False,
+      type=int,
+      default=None,
+      help="Number of worker processes. Defaults to the number of CPUs.",
+  )
+
+
+def chunksize(parser):
+  parser.add_argument(
+      "--chunksize",
+      required=False,
+      type=int,
+      default=None,
+      help=(
+          "Number of tables sent to a worker process at once. Chosen"
+          " automatically by default."
+      ),
+  )
+
+
+def api_rate_limits(parser):
+  parser.add_argument(
+      "--api-rate-limits",
+      required=False,
+      type=_api_rate_limits,
+      default={},
+      help=(
+          "Maximal number of requests per minute for each API method, for"
+          " example `discover=30,get_table=600`. API methods are"
+          f" {[str(m) for m in ApiMethod]}. Unlimited by default."
+      ),
+  )
+
+
+def api_deadlines(parser):
+  parser.add_argument(
+      "--api-deadlines",
+      required=False,
+      type=_api_deadlines,
+      default={},
+      help=(
+          "Time in seconds allowed for each API method, including retries of"
+          " transient errors, for example `get_table=60,insert_job=900`."
+      ),
+  )
+
+
+def hedge_after_seconds(parser):
+  parser.add_argument(
+      "--hedge-after-seconds",
+      required=False,
+      type=float,
+      default=None,
+      help=(
+          "Send a duplicate request for stream and table metadata reads that"
+          " didn't respond within this many seconds, and use the first"
+          " response. Disabled by default."
+      ),
+  )
+
+
+def api_rate_limits_state_path(parser):
+  parser.add_argument(
+      "--api-rate-limits-state-path",
+      required=False,
+      default=None,
+      help=(
+          "Path to a SQLite file used to share `--api-rate-limits` between"
+          " several processes, for example on a shared volume."
+      ),
+  )
+
+
+def metadata_cache_path(parser, default: Optional[str] = None):
+  parser.add_argument(
+      "--metadata-cache-path",
+      required=False,
+      default=default,
+      help=(
+          "Path to a SQLite file caching discover results and existing"
+          " BigQuery table DDLs between runs. Cached table DDLs are only used"
+          " while the table is unchanged. Defaults to %(default)s."
+      ),
+  )
+
+
+def metadata_cache_max_size_bytes(parser):
+  parser.add_argument(
+      "--metadata-cache-max-size-bytes",
+      required=False,
+      type=int,
+      default=DEFAULT_MAX_SIZE_BYTES,
+      help=(
+          "Maximal size of the metadata cache, the least recently used entries"
+          f" are evicted beyond it. Defaults to {DEFAULT_MAX_SIZE_BYTES} bytes."
+      ),
+  )
+
+
+def discover_cache_ttl_seconds(parser):
+  parser.add_argument(
+      "--discover-cache-ttl-seconds",
+      required=False,
+      type=float,
+      default=DEFAULT_DISCOVER_TTL_SECONDS,
+      help=(
+          "Time in seconds a cached discover result is used for. Defaults to"
+          f" {DEFAULT_DISCOVER_TTL_SECONDS} seconds."
+      ),
+  )
+
+
+def rebuild_artifacts(parser):
+  parser.add_argument(
+      "--rebuild-artifacts",
+      help=(
+          "Generate all SQL files again, even if their inputs didn't change"
+          " since they were generated."
+      ),
+      default=False,
+      action="store_true",
+  )
+
+
+def _api_rate_limits(value: str):
+  return _api_method_values(value, "requests_per_minute")
+
+
+def _api_deadlines(value: str):
+  return _api_method_values(value, "seconds")
+
+
+def _api_method_values(value: str, value_name: str):
+  values = {}
+  for api_method_value in value.split(","):
+    api_method, _, number = api_method_value.partition("=")
+    try:
+      values[ApiMethod(api_method.strip())] = float(number)
+    except ValueError:
+      raise argparse.ArgumentTypeError(
+          f"Invalid value '{api_method_value}', expected"
+          f" '<api_method>=<{value_name}>' where api_method is one of"
+          f" {[str(m) for m in ApiMethod]}."
+      )
+  return values
+
+
+def source_schema_from_api(parser):
+  parser.add_argument(
+      "--source-schema-from-api",
+      help=(
+          "Get the schema of the existing BigQuery table from the tables.get"
+          " API, instead of querying and parsing its DDL."
+      ),
+      default=False,
+      action="store_true",
+  )
+
+
+def stream_state_timeout_seconds(parser):
+  parser.add_argument(
+      "--stream-state-timeout-seconds",
+      required=False,
+      type=float,
+      default=DEFAULT_STREAM_STATE_TIMEOUT_SECONDS,
+      help=(
+          "Time in seconds to wait for a stream to be paused or resumed."
+          " Defaults to %(default)s seconds."
+      ),
+  )
+
+
+def latency_wait_seconds(parser):
+  parser.add_argument(
+      "--latency-wait-seconds",
+      required=False,
+      type=float,
+      default=DEFAULT_LATENCY_WAIT_SECONDS,
+      help=(
+          "Time in seconds to wait for in-flight events after the old stream"
+          " is paused, when its total latency can't be read from Cloud"
+          " Monitoring. Defaults to %(default)s seconds."
+      ),
+  )
+
+
+def verify_row_counts(parser):
+  parser.add_argument(
+      "--verify-row-counts",
+      help=(
+          "Compare the number of rows of each new table with the existing"
+          " table before resuming the stream."
+      ),
+      default=False,
+      action="store_true",
+  )
+
+
+def dataflow_drained(parser):
+  parser.add_argument(
+      "--dataflow-drained",
+      help=(
+          "The Dataflow job of the old pipeline is drained once the old"
+          " stream is paused, for example because it was already stopped."
+          " Don't wait for a confirmation before migrating the tables."
+          " Required with --force."
+      ),
+      default=False,
+      action="store_true",
+  )
+
+
+def scratch_dataset_name(parser):
+  parser.add_argument(
+      "--scratch-dataset-name",
+      required=True,
+      help=(
+          "Existing BigQuery dataset where the rehearsal creates the new"
+          " tables. Each table is deleted once it was measured. The dataset"
+          " must be in the region of the existing tables."
+      ),
+  )
+
+
+def sample_percent(parser):
+  parser.add_argument(
+      "--sample-percent",
+      required=False,
+      type=float,
+      default=DEFAULT_SAMPLE_PERCENT,
+      help=(
+          "Percent of each existing table that the rehearsal copies, sampled"
+          " by storage blocks with `TABLESAMPLE SYSTEM`. Defaults to"
+          " %(default)s percent."
+      ),
+  )
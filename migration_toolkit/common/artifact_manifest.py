@@ -0,0 +1,121 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, Optional
+from common.file_writer import write
+from common.monitoring_consts import USER_AGENT
+from common.output_names import ARTIFACT_MANIFEST_FILEPATH
+from common.sqlite_transaction import SqliteTransaction
+
+logger = logging.getLogger(__name__)
+
+CREATE_ARTIFACTS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS artifacts (
+  filepath TEXT PRIMARY KEY,
+  inputs_hash TEXT NOT NULL,
+  content_hash TEXT NOT NULL
+)
+"""
+
+
+# Keeps the hash of the inputs each generated file was built from, together
+# with the hash of its content, in a SQLite file shared by concurrent writers.
+# A file is up to date if it was built from the same inputs and wasn't changed
+# or removed since.
+class ArtifactManifest:
+
+  def __init__(self, filepath: str):
+    self.filepath: str = filepath
+
+    dirname = os.path.dirname(filepath)
+    if dirname:
+      os.makedirs(dirname, exist_ok=True)
+    with SqliteTransaction(self.filepath) as connection:
+      connection.execute(CREATE_ARTIFACTS_TABLE_SQL)
+
+  def is_up_to_date(self, filepath: str, inputs_hash: str) -> bool:
+    with SqliteTransaction(self.filepath, read_only=True) as connection:
+      row = connection.execute(
+          "SELECT inputs_hash, content_hash FROM artifacts WHERE filepath = ?",
+          (filepath,),
+      ).fetchone()
+
+    if not row or row[0] != inputs_hash or not os.path.exists(filepath):
+      return False
+    with open(filepath, "r") as f:
+      return _hash(f.read()) == row[1]
+
+  def record(self, filepath: str, inputs_hash: str, data: str):
+    with SqliteTransaction(self.filepath) as connection:
+      connection.execute(
+          "INSERT OR REPLACE INTO artifacts (filepath, inputs_hash,"
+          " content_hash) VALUES (?, ?, ?)",
+          (filepath, inputs_hash, _hash(data)),
+      )
+
+
+def hash_inputs(inputs: Dict[str, Any]) -> str:
+  # The toolkit version is part of the hash, so that files generated by a
+  # previous version are built again.
+  return _hash(
+      json.dumps(
+          {"version": USER_AGENT, "inputs": inputs}, sort_keys=True, default=str
+      )
+  )
+
+
+def _hash(data: str) -> str:
+  return hashlib.sha256(data.encode()).hexdigest()
+
+
+_artifact_manifest: Optional[ArtifactManifest] = None
+_manifest_filepath: str = ARTIFACT_MANIFEST_FILEPATH
+_rebuild: bool = False
+
+
+def configure_artifact_manifest(
+    filepath: str = ARTIFACT_MANIFEST_FILEPATH, rebuild: bool = False
+):
+  global _artifact_manifest, _manifest_filepath, _rebuild
+  _artifact_manifest = None
+  _manifest_filepath = filepath
+  _rebuild = rebuild
+
+
+def _get_artifact_manifest() -> ArtifactManifest:
+  global _artifact_manifest
+  if not _artifact_manifest:
+    _artifact_manifest = ArtifactManifest(_manifest_filepath)
+  return _artifact_manifest
+
+
+# Generates and writes the file, unless it is up to date with the given inputs.
+# Returns whether the file was written.
+def write_artifact(
+    filepath: str, inputs: Dict[str, Any], generate: Callable[[], str]
+) -> bool:
+  artifact_manifest = _get_artifact_manifest()
+  inputs_hash = hash_inputs(inputs)
+  if not _rebuild and artifact_manifest.is_up_to_date(filepath, inputs_hash):
+    logger.info(f"'{filepath}' is up to date, skipping it.")
+    return False
+
+  data = generate()
+  write(filepath=filepath, data=data)
+  artifact_manifest.record(filepath, inputs_hash, data)
+  return True
@@ -27,6 +27,11 @@ class BigQueryType(Enum):
   NUMERIC = "NUMERIC"
   BIGNUMERIC = "BIGNUMERIC"
   JSON = "JSON"
+  BOOL = "BOOL"
+  TIME = "TIME"
+  GEOGRAPHY = "GEOGRAPHY"
+  STRUCT = "STRUCT"
+  ARRAY = "ARRAY"
 
   def with_precision_and_scale(self, p, s) -> str:
     return f"{self.value}({p}, {s})"
@@ -0,0 +1,78 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import os
+from typing import Set
+from common.sqlite_transaction import SqliteTransaction
+
+CREATE_COMPLETED_BUCKETS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS completed_buckets (
+  destination_table TEXT NOT NULL,
+  sql_hash TEXT NOT NULL,
+  bucket_count INTEGER NOT NULL,
+  bucket INTEGER NOT NULL,
+  PRIMARY KEY (destination_table, sql_hash, bucket_count, bucket)
+)
+"""
+
+
+# Keeps the buckets of a merge copy that were already merged into their
+# destination table, in a SQLite file, so that a copy that failed partway
+# resumes from the first bucket that wasn't merged. Buckets are only reused for
+# the same SQL statement and number of buckets.
+class CopyCheckpoint:
+
+  def __init__(self, filepath: str):
+    self.filepath: str = filepath
+
+    dirname = os.path.dirname(filepath)
+    if dirname:
+      os.makedirs(dirname, exist_ok=True)
+    with SqliteTransaction(self.filepath) as connection:
+      connection.execute(CREATE_COMPLETED_BUCKETS_TABLE_SQL)
+
+  def get_completed_buckets(
+      self, destination_table: str, sql: str, bucket_count: int
+  ) -> Set[int]:
+    with SqliteTransaction(self.filepath, read_only=True) as connection:
+      rows = connection.execute(
+          "SELECT bucket FROM completed_buckets WHERE destination_table = ?"
+          " AND sql_hash = ? AND bucket_count = ?",
+          (destination_table, _hash(sql), bucket_count),
+      ).fetchall()
+    return {row[0] for row in rows}
+
+  def complete_bucket(
+      self, destination_table: str, sql: str, bucket_count: int, bucket: int
+  ):
+    with SqliteTransaction(self.filepath) as connection:
+      connection.execute(
+          "INSERT OR IGNORE INTO completed_buckets (destination_table,"
+          " sql_hash, bucket_count, bucket) VALUES (?, ?, ?, ?)",
+          (destination_table, _hash(sql), bucket_count, bucket),
+      )
+
+  # Called once all the buckets were merged, so that a later copy of the same
+  # table merges all of them again.
+  def clear(self, destination_table: str):
+    with SqliteTransaction(self.filepath) as connection:
+      connection.execute(
+          "DELETE FROM completed_buckets WHERE destination_table = ?",
+          (destination_table,),
+      )
+
+
+def _hash(data: str) -> str:
+  return hashlib.sha256(data.encode()).hexdigest()
@@ -0,0 +1,27 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import enum
+
+
+class CopyMethod(enum.Enum):
+  INSERT = "insert"
+  APPEND = "append"
+  MERGE = "merge"
+  BACKFILL = "backfill"
+  STORAGE_API = "storage_api"
+  EXTRACT_LOAD = "extract_load"
+
+  def __str__(self):
+    return self.value
@@ -0,0 +1,40 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Defaults of the command line arguments, shared with the modules that use
+# them, so that parsing the arguments doesn't import these modules.
+
+# batch.table_scheduler
+DEFAULT_LARGE_TABLE_THRESHOLD_BYTES = 100 * 1024**3
+
+# batch.queue_worker
+DEFAULT_LEASE_SECONDS = 300
+
+# batch.copy_planner
+DEFAULT_COPY_BYTES_PER_SECOND = 64 * 1024**2
+DEFAULT_BACKFILL_ROWS_PER_SECOND = 10000
+
+# batch.stream_control
+DEFAULT_STREAM_STATE_TIMEOUT_SECONDS = 1800
+DEFAULT_LATENCY_WAIT_SECONDS = 600
+
+# batch.rehearsal
+DEFAULT_SAMPLE_PERCENT = 1.0
+
+# executors.storage_copy.storage_copy_rows
+DEFAULT_READ_STREAM_COUNT = 8
+DEFAULT_WRITE_STREAM_COUNT = 4
+
+# executors.extract_load_rows
+DEFAULT_LOAD_JOB_COUNT = 1
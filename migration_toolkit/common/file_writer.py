@@ -12,10 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import csv
 import json
 import logging
 import os
-from typing import Any
+import tempfile
+from typing import Any, Callable, Iterable, List, TextIO
 
 logger = logging.getLogger(__name__)
 
@@ -24,19 +26,45 @@ def write(filepath: str, data: str):
   logger.info(f"Writing to file: '{filepath}'")
   logger.debug(f"Data: {data}")
 
-  dirname = os.path.dirname(filepath)
-  if not os.path.exists(dirname):
-    os.makedirs(dirname)
-  with open(filepath, "w") as f:
-    f.writelines(data)
+  _write_atomically(filepath, lambda f: f.writelines(data))
 
 
 def write_json(filepath: str, data: Any):
   logger.info(f"Writing JSON to file: '{filepath}'")
   logger.debug(f"Data: {data}")
 
+  _write_atomically(filepath, lambda f: json.dump(data, f))
+
+
+def write_csv(filepath: str, header: List[str], rows: Iterable[List[Any]]):
+  logger.info(f"Writing CSV to file: '{filepath}'")
+
+  _write_atomically(
+      filepath,
+      lambda f: csv.writer(f, lineterminator="\n").writerows([header, *rows]),
+  )
+
+
+# Writes to a temporary file in the same directory and renames it, so that
+# concurrent readers and writers never see a partially written file.
+def _write_atomically(filepath: str, write_fn: Callable[[TextIO], None]):
   dirname = os.path.dirname(filepath)
-  if not os.path.exists(dirname):
-    os.makedirs(dirname)
-  with open(filepath, "w") as f:
-    json.dump(data, f)
+  if dirname:
+    os.makedirs(dirname, exist_ok=True)
+
+  with tempfile.NamedTemporaryFile(
+      mode="w",
+      dir=dirname or ".",
+      prefix=f".{os.path.basename(filepath)}.",
+      suffix=".tmp",
+      delete=False,
+  ) as f:
+    try:
+      write_fn(f)
+    except BaseException:
+      f.close()
+      os.remove(f.name)
+      raise
+  # Temporary files are only readable by their owner, use the usual mode.
+  os.chmod(f.name, 0o644)
+  os.replace(f.name, filepath)
@@ -0,0 +1,182 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+import threading
+import time
+from typing import Optional
+from common.sqlite_transaction import SqliteTransaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE_BYTES = 512 * 1024**2
+DEFAULT_DISCOVER_TTL_SECONDS = 24 * 60 * 60
+
+CREATE_METADATA_CACHE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS metadata_cache (
+  key TEXT PRIMARY KEY,
+  value TEXT NOT NULL,
+  fingerprint TEXT,
+  created_at REAL NOT NULL,
+  last_accessed_at REAL NOT NULL,
+  size INTEGER NOT NULL
+)
+"""
+
+
+# A local cache of metadata that rarely changes between runs, such as discover
+# results and source table DDLs, persisted in a SQLite file. An entry is only
+# served if it is younger than the given TTL and was stored with the given
+# fingerprint (for example the table's etag), so changed objects are fetched
+# again. The least recently used entries are evicted once the cache grows
+# beyond its maximal size.
+class MetadataCache:
+
+  def __init__(
+      self,
+      filepath: str,
+      max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES,
+      discover_ttl_seconds: float = DEFAULT_DISCOVER_TTL_SECONDS,
+  ):
+    self.filepath: str = filepath
+    self.max_size_bytes: int = max_size_bytes
+    self.discover_ttl_seconds: float = discover_ttl_seconds
+    self.hits: int = 0
+    self.misses: int = 0
+    self._stats_lock = threading.Lock()
+
+    dirname = os.path.dirname(filepath)
+    if dirname:
+      os.makedirs(dirname, exist_ok=True)
+    with SqliteTransaction(self.filepath) as connection:
+      connection.execute(CREATE_METADATA_CACHE_TABLE_SQL)
+
+  def get(
+      self,
+      key: str,
+      fingerprint: Optional[str] = None,
+      ttl_seconds: Optional[float] = None,
+  ) -> Optional[str]:
+    now = time.time()
+    with SqliteTransaction(self.filepath, read_only=True) as connection:
+      row = connection.execute(
+          "SELECT value, fingerprint, created_at FROM metadata_cache WHERE"
+          " key = ?",
+          (key,),
+      ).fetchone()
+
+    hit = (
+        row is not None
+        and row[1] == fingerprint
+        and (ttl_seconds is None or now - row[2] <= ttl_seconds)
+    )
+    if hit:
+      with SqliteTransaction(self.filepath) as connection:
+        connection.execute(
+            "UPDATE metadata_cache SET last_accessed_at = ? WHERE key = ?",
+            (now, key),
+        )
+
+    with self._stats_lock:
+      if hit:
+        self.hits += 1
+      else:
+        self.misses += 1
+
+    logger.debug(f"Metadata cache {'hit' if hit else 'miss'} for '{key}'")
+    return row[0] if hit else None
+
+  def put(self, key: str, value: str, fingerprint: Optional[str] = None):
+    now = time.time()
+    with SqliteTransaction(self.filepath) as connection:
+      connection.execute(
+          "INSERT OR REPLACE INTO metadata_cache (key, value, fingerprint,"
+          " created_at, last_accessed_at, size) VALUES (?, ?, ?, ?, ?, ?)",
+          (key, value, fingerprint, now, now, len(value.encode())),
+      )
+      self._evict(connection)
+
+  def _evict(self, connection):
+    (size,) = connection.execute(
+        "SELECT COALESCE(SUM(size), 0) FROM metadata_cache"
+    ).fetchone()
+    if size <= self.max_size_bytes:
+      return
+
+    evicted = 0
+    for key, entry_size in connection.execute(
+        "SELECT key, size FROM metadata_cache ORDER BY last_accessed_at"
+    ).fetchall():
+      if size <= self.max_size_bytes:
+        break
+      connection.execute("DELETE FROM metadata_cache WHERE key = ?", (key,))
+      size -= entry_size
+      evicted += 1
+
+    logger.debug(f"Evicted {evicted} entries from the metadata cache")
+
+
+# Discover results of whole schemas are keyed without a table name.
+def discover_key(
+    connection_profile_name: str,
+    source_schema_name: str,
+    source_table_name: Optional[str],
+) -> str:
+  return (
+      f"discover/{connection_profile_name}/{source_schema_name}/"
+      f"{source_table_name or ''}"
+  )
+
+
+def source_table_ddl_key(table_id: str) -> str:
+  return f"source_table_ddl/{table_id}"
+
+
+# The etag changes whenever the table's metadata (including its schema)
+# changes.
+def table_fingerprint(table) -> str:
+  return f"{table.etag}/{table.modified.isoformat() if table.modified else ''}"
+
+
+_metadata_cache: Optional[MetadataCache] = None
+
+
+def configure_metadata_cache(
+    filepath: Optional[str],
+    max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES,
+    discover_ttl_seconds: float = DEFAULT_DISCOVER_TTL_SECONDS,
+):
+  global _metadata_cache
+  _metadata_cache = (
+      MetadataCache(
+          filepath=filepath,
+          max_size_bytes=max_size_bytes,
+          discover_ttl_seconds=discover_ttl_seconds,
+      )
+      if filepath
+      else None
+  )
+
+
+def get_metadata_cache() -> Optional[MetadataCache]:
+  return _metadata_cache
+
+
+def log_stats():
+  if _metadata_cache:
+    logger.info(
+        f"Metadata cache: {_metadata_cache.hits} hits,"
+        f" {_metadata_cache.misses} misses."
+    )
@@ -33,6 +33,11 @@ CREATE_TARGET_TABLE_DDL_DIRECTORY = os.path.join(
 )
 CREATE_TARGET_TABLE_DDL_FILENAME_TEMPLATE = "{table_name}.sql"
 
+CREATE_TARGET_DATASET_DDL_DIRECTORY = os.path.join(
+    OUTPUT_DIRECTORY_BASE, "create_target_dataset"
+)
+CREATE_TARGET_DATASET_DDL_FILENAME_TEMPLATE = "{dataset_name}.sql"
+
 BIGQUERY_TABLE_SCHEMA_DIRECTORY = os.path.join(
     OUTPUT_DIRECTORY_BASE, "bigquery_table_schema"
 )
@@ -42,6 +47,27 @@ FETCH_BIGQUERY_TABLE_DDL_DIRECTORY = os.path.join(
     OUTPUT_DIRECTORY_BASE, "fetch_source_bigquery_table_ddl"
 )
 FETCH_BIGQUERY_TABLE_DDL_FILENAME_TEMPLATE = "{table_name}.sql"
+BATCH_FETCH_BIGQUERY_TABLE_DDL_FILENAME_TEMPLATE = "{dataset_name}.sql"
 
 COPY_ROWS_DIRECTORY = os.path.join(OUTPUT_DIRECTORY_BASE, "copy_rows")
 COPY_ROWS_FILENAME_TEMPLATE = "{source_table}__to__{destination_table}.sql"
+
+METADATA_CACHE_FILEPATH = os.path.join(
+    OUTPUT_DIRECTORY_BASE, "metadata_cache.sqlite"
+)
+
+ARTIFACT_MANIFEST_FILEPATH = os.path.join(
+    OUTPUT_DIRECTORY_BASE, "artifact_manifest.sqlite"
+)
+
+PLAN_CACHE_FILEPATH = os.path.join(OUTPUT_DIRECTORY_BASE, "plan_cache.sqlite")
+
+COPY_CHECKPOINT_FILEPATH = os.path.join(
+    OUTPUT_DIRECTORY_BASE, "copy_checkpoint.sqlite"
+)
+
+REHEARSAL_REPORT_FILEPATH = os.path.join(OUTPUT_DIRECTORY_BASE, "rehearsal.csv")
+
+COMPATIBILITY_AUDIT_FILEPATH = os.path.join(
+    OUTPUT_DIRECTORY_BASE, "compatibility_audit.csv"
+)
@@ -0,0 +1,258 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import enum
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from common.bigquery_type import BigQueryType
+from common.table_schema import TableSchema, clean_column_name
+from google.cloud.bigquery.table import Table
+
+logger = logging.getLogger(__name__)
+
+# Pseudo column of ingestion time partitioned tables.
+INGESTION_TIME_COLUMN = "_PARTITIONTIME"
+DATAFLOW_METADATA_COLUMN_PREFIX = "_metadata_"
+
+
+class PartitionGranularity(enum.Enum):
+  HOUR = "HOUR"
+  DAY = "DAY"
+  MONTH = "MONTH"
+  YEAR = "YEAR"
+
+  def __str__(self):
+    return self.value
+
+
+# Format of the partition IDs of time partitioned tables, in
+# INFORMATION_SCHEMA.PARTITIONS.
+PARTITION_ID_FORMATS: Dict[PartitionGranularity, str] = {
+    PartitionGranularity.HOUR: "%Y%m%d%H",
+    PartitionGranularity.DAY: "%Y%m%d",
+    PartitionGranularity.MONTH: "%Y%m",
+    PartitionGranularity.YEAR: "%Y",
+}
+
+# Smallest and largest value of each partitioning column type, and the step
+# between consecutive values.
+_COLUMN_TYPE_BOUNDS: Dict[BigQueryType, Tuple[Any, Any, Any]] = {
+    BigQueryType.TIMESTAMP: (
+        datetime.datetime.min.replace(tzinfo=datetime.timezone.utc),
+        datetime.datetime.max.replace(tzinfo=datetime.timezone.utc),
+        datetime.timedelta(microseconds=1),
+    ),
+    BigQueryType.DATETIME: (
+        datetime.datetime.min,
+        datetime.datetime.max,
+        datetime.timedelta(microseconds=1),
+    ),
+    BigQueryType.DATE: (
+        datetime.date.min,
+        datetime.date.max,
+        datetime.timedelta(days=1),
+    ),
+    BigQueryType.INT64: (-(2**63), 2**63 - 1, 1),
+}
+
+_FIELD_TYPES: Dict[str, BigQueryType] = {
+    "TIMESTAMP": BigQueryType.TIMESTAMP,
+    "DATETIME": BigQueryType.DATETIME,
+    "DATE": BigQueryType.DATE,
+    "INTEGER": BigQueryType.INT64,
+    "INT64": BigQueryType.INT64,
+}
+
+
+# How the target table is partitioned, either by a time unit column or by an
+# integer range column.
+class Partitioning(NamedTuple):
+  column: str
+  granularity: PartitionGranularity = PartitionGranularity.DAY
+  # (start, end, interval) of integer range partitioning.
+  integer_range: Optional[Tuple[int, int, int]] = None
+
+  def to_json(self) -> List[Any]:
+    return [self.column, self.granularity.value, self.integer_range]
+
+  # Returns the PARTITION BY expression, based on the column's type in the
+  # target table.
+  def get_expression(self, table_schema: TableSchema) -> str:
+    column_name = clean_column_name(self.column)
+    column_type = table_schema.get_schema().get(column_name)
+    if column_type is None:
+      raise ValueError(
+          f"Partitioning column {column_name} isn't a column of table"
+          f" {table_schema.get_fully_qualified_table_name()}."
+      )
+
+    column = f"`{column_name}`"
+    if self.integer_range:
+      if column_type != BigQueryType.INT64:
+        raise ValueError(
+            f"Integer range partitioning column {column_name} must be INT64,"
+            f" but is {column_type}."
+        )
+      start, end, interval = self.integer_range
+      return (
+          f"RANGE_BUCKET({column}, GENERATE_ARRAY({start}, {end}, {interval}))"
+      )
+    if column_type == BigQueryType.TIMESTAMP:
+      return f"TIMESTAMP_TRUNC({column}, {self.granularity})"
+    if column_type == BigQueryType.DATETIME:
+      return f"DATETIME_TRUNC({column}, {self.granularity})"
+    if column_type == BigQueryType.DATE:
+      if self.granularity == PartitionGranularity.DAY:
+        return column
+      if self.granularity != PartitionGranularity.HOUR:
+        return f"DATE_TRUNC({column}, {self.granularity})"
+    raise ValueError(
+        f"Column {column_name} of type {column_type} can't be partitioned by"
+        f" {self.granularity}."
+    )
+
+
+# How an existing BigQuery table is partitioned. `column` is the pseudo column
+# `_PARTITIONTIME` for ingestion time partitioned tables.
+class SourcePartitioning(NamedTuple):
+  column: str
+  column_type: BigQueryType
+  granularity: Optional[PartitionGranularity] = None
+  integer_range: Optional[Tuple[int, int, int]] = None
+
+  # The same partitioning for the target table. Datastream doesn't write rows
+  # by ingestion time, or Dataflow's metadata columns, so partitioning by them
+  # isn't kept.
+  def to_partitioning(self) -> Optional[Partitioning]:
+    if self.column == INGESTION_TIME_COLUMN or self.column.startswith(
+        DATAFLOW_METADATA_COLUMN_PREFIX
+    ):
+      logger.warning(
+          f"The existing table is partitioned by {self.column}, which the new"
+          " table doesn't have. The new table isn't partitioned."
+      )
+      return None
+    return Partitioning(
+        column=self.column,
+        granularity=self.granularity or PartitionGranularity.DAY,
+        integer_range=self.integer_range,
+    )
+
+  # Returns the first value of each partition, or None for the partitions of
+  # NULL and unpartitioned rows.
+  def get_partition_start(self, partition_id: str) -> Optional[Any]:
+    if partition_id.startswith("__"):
+      return None
+    if self.integer_range:
+      return int(partition_id)
+
+    start = datetime.datetime.strptime(
+        partition_id, PARTITION_ID_FORMATS[self.granularity]
+    )
+    if self.column_type == BigQueryType.DATE:
+      return start.date()
+    if self.column_type == BigQueryType.TIMESTAMP:
+      return start.replace(tzinfo=datetime.timezone.utc)
+    return start
+
+
+def get_source_partitioning(
+    table: Optional[Table],
+) -> Optional[SourcePartitioning]:
+  if table is None:
+    return None
+
+  if table.range_partitioning:
+    field = table.range_partitioning.field
+    integer_range = table.range_partitioning.range_
+    return SourcePartitioning(
+        column=field,
+        column_type=BigQueryType.INT64,
+        integer_range=(
+            integer_range.start,
+            integer_range.end,
+            integer_range.interval,
+        ),
+    )
+
+  if table.time_partitioning:
+    granularity = PartitionGranularity(table.time_partitioning.type_)
+    field = table.time_partitioning.field
+    if not field:
+      return SourcePartitioning(
+          column=INGESTION_TIME_COLUMN,
+          column_type=BigQueryType.TIMESTAMP,
+          granularity=granularity,
+      )
+    field_types = {f.name: f.field_type for f in table.schema}
+    return SourcePartitioning(
+        column=field,
+        column_type=_FIELD_TYPES[field_types[field]],
+        granularity=granularity,
+    )
+
+  return None
+
+
+# A range of partitions copied by one statement, from `start` to `end`
+# inclusive. The first range also copies the rows whose partitioning column is
+# NULL.
+class PartitionRange(NamedTuple):
+  start: Any
+  end: Any
+  copy_nulls: bool
+
+
+# Splits the partitions into at most `range_count` contiguous ranges of about
+# the same number of rows. The first and last ranges are open ended, so rows
+# outside of the listed partitions are copied too.
+def get_partition_ranges(
+    source_partitioning: SourcePartitioning,
+    partition_rows: Dict[str, int],
+    range_count: int,
+) -> List[PartitionRange]:
+  min_value, max_value, step = _COLUMN_TYPE_BOUNDS[
+      source_partitioning.column_type
+  ]
+  partitions = sorted(
+      (start, num_rows)
+      for start, num_rows in (
+          (source_partitioning.get_partition_start(partition_id), num_rows)
+          for partition_id, num_rows in partition_rows.items()
+      )
+      if start is not None
+  )
+  total_rows = sum(num_rows for _, num_rows in partitions)
+
+  # A new range starts at the partition whose middle row is past the current
+  # range's share of rows.
+  range_starts = [min_value]
+  copied_rows = 0
+  for start, num_rows in partitions:
+    if (
+        len(range_starts) < range_count
+        and copied_rows > 0
+        and copied_rows + num_rows / 2
+        >= total_rows * len(range_starts) / range_count
+        and start > range_starts[-1]
+    ):
+      range_starts.append(start)
+    copied_rows += num_rows
+
+  range_ends = [start - step for start in range_starts[1:]] + [max_value]
+  return [
+      PartitionRange(start=start, end=end, copy_nulls=i == 0)
+      for i, (start, end) in enumerate(zip(range_starts, range_ends))
+  ]
@@ -0,0 +1,101 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, TypeVar
+from common.metadata_cache import MetadataCache
+from common.monitoring_consts import USER_AGENT
+from common.output_names import PLAN_CACHE_FILEPATH
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+MAX_IN_MEMORY_PLANS = 10000
+
+
+# Memoizes plans derived only from table schemas, such as the converted columns
+# of a source table or the casts between a source and a destination schema, so
+# that tables of the same shape (for example shards of the same table) share
+# them. Plans are keyed by a fingerprint of the schemas they were derived from,
+# kept in memory, and persisted in a SQLite file between runs. When
+# `rebuild` is set, stored plans are ignored and computed again.
+class PlanCache:
+
+  def __init__(self, filepath: str, rebuild: bool = False):
+    self.store: MetadataCache = MetadataCache(filepath=filepath)
+    self.rebuild: bool = rebuild
+    self._plans: Dict[str, Any] = {}
+    self._lock = threading.Lock()
+
+  def get_or_compute(
+      self,
+      kind: str,
+      schemas: Any,
+      compute: Callable[[], T],
+      to_json: Callable[[T], Any],
+      from_json: Callable[[Any], T],
+  ) -> T:
+    key = f"{kind}/{fingerprint(schemas)}"
+    with self._lock:
+      plan = self._plans.get(key)
+    if plan is not None:
+      return plan
+
+    stored_plan = None if self.rebuild else self.store.get(key)
+    if stored_plan is not None:
+      logger.debug(f"Using stored {kind} plan {key}")
+      plan = from_json(json.loads(stored_plan))
+    else:
+      plan = compute()
+      self.store.put(key, json.dumps(to_json(plan)))
+
+    with self._lock:
+      if len(self._plans) >= MAX_IN_MEMORY_PLANS:
+        self._plans.clear()
+      self._plans[key] = plan
+    return plan
+
+
+# The toolkit version is part of the fingerprint, so that plans computed by a
+# previous version are computed again.
+def fingerprint(schemas: Any) -> str:
+  return hashlib.sha256(
+      json.dumps([USER_AGENT, schemas], sort_keys=True, default=str).encode()
+  ).hexdigest()
+
+
+_plan_cache: Optional[PlanCache] = None
+_plan_cache_lock = threading.Lock()
+_rebuild: bool = False
+
+
+# Set with `--rebuild-artifacts`, so that regenerated SQL doesn't reuse the
+# plans stored by previous runs.
+def configure_plan_cache(rebuild: bool = False):
+  global _plan_cache, _rebuild
+  with _plan_cache_lock:
+    _plan_cache = None
+    _rebuild = rebuild
+
+
+def get_plan_cache() -> PlanCache:
+  global _plan_cache
+  with _plan_cache_lock:
+    if not _plan_cache:
+      _plan_cache = PlanCache(PLAN_CACHE_FILEPATH, rebuild=_rebuild)
+    return _plan_cache
@@ -0,0 +1,187 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from abc import ABC, abstractmethod
+import logging
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+from common.api_method import ApiMethod
+from common.sqlite_transaction import SqliteTransaction
+
+logger = logging.getLogger(__name__)
+
+CREATE_TOKEN_BUCKETS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS token_buckets (
+  name TEXT PRIMARY KEY,
+  tokens REAL NOT NULL,
+  updated_at REAL NOT NULL
+)
+"""
+
+
+class RateLimiterStats(NamedTuple):
+  acquired: int
+  total_wait_seconds: float
+  max_wait_seconds: float
+
+
+# Token buckets hand out one token per API call. A caller that finds the bucket
+# empty reserves the next token and sleeps until it is refilled, so concurrent
+# callers are served in order at a steady rate instead of in bursts.
+class BaseTokenBucket(ABC):
+
+  def __init__(self, requests_per_minute: float):
+    if requests_per_minute <= 0:
+      raise ValueError(
+          "Rate limits must be positive, but got"
+          f" {requests_per_minute} requests per minute"
+      )
+    self.rate: float = requests_per_minute / 60
+    self.capacity: float = max(1.0, self.rate)
+
+  def acquire(self) -> float:
+    wait_seconds = self._reserve()
+    if wait_seconds > 0:
+      time.sleep(wait_seconds)
+    return wait_seconds
+
+  def _refill_and_take(self, tokens: float, elapsed_seconds: float) -> float:
+    return min(self.capacity, tokens + elapsed_seconds * self.rate) - 1
+
+  def _wait_seconds(self, tokens: float) -> float:
+    return max(0.0, -tokens / self.rate)
+
+  @abstractmethod
+  def _reserve(self) -> float:
+    raise NotImplementedError
+
+
+class TokenBucket(BaseTokenBucket):
+
+  def __init__(self, requests_per_minute: float):
+    super().__init__(requests_per_minute)
+    self._tokens: float = self.capacity
+    self._updated_at: float = time.monotonic()
+    self._lock = threading.Lock()
+
+  def _reserve(self) -> float:
+    with self._lock:
+      now = time.monotonic()
+      self._tokens = self._refill_and_take(self._tokens, now - self._updated_at)
+      self._updated_at = now
+      return self._wait_seconds(self._tokens)
+
+
+# Shares the bucket between processes through a SQLite file, for example all
+# the workers of a batch migration on a shared volume. The file keeps the
+# rollback journal, since workers on other hosts may share it.
+class SqliteTokenBucket(BaseTokenBucket):
+
+  def __init__(self, requests_per_minute: float, filepath: str, name: str):
+    super().__init__(requests_per_minute)
+    self.filepath: str = filepath
+    self.name: str = name
+    with SqliteTransaction(self.filepath, wal=False) as connection:
+      connection.execute(CREATE_TOKEN_BUCKETS_TABLE_SQL)
+      connection.execute(
+          "INSERT OR IGNORE INTO token_buckets (name, tokens, updated_at)"
+          " VALUES (?, ?, ?)",
+          (self.name, self.capacity, time.time()),
+      )
+
+  def _reserve(self) -> float:
+    with SqliteTransaction(self.filepath, wal=False) as connection:
+      now = time.time()
+      tokens, updated_at = connection.execute(
+          "SELECT tokens, updated_at FROM token_buckets WHERE name = ?",
+          (self.name,),
+      ).fetchone()
+      tokens = self._refill_and_take(tokens, max(0.0, now - updated_at))
+      connection.execute(
+          "UPDATE token_buckets SET tokens = ?, updated_at = ? WHERE name = ?",
+          (tokens, now, self.name),
+      )
+    return self._wait_seconds(tokens)
+
+
+class RateLimiter:
+
+  def __init__(self, buckets: Dict[ApiMethod, BaseTokenBucket]):
+    self.buckets: Dict[ApiMethod, BaseTokenBucket] = buckets
+    self._stats: Dict[ApiMethod, RateLimiterStats] = {}
+    self._stats_lock = threading.Lock()
+
+  def acquire(self, api_method: ApiMethod):
+    bucket = self.buckets.get(api_method)
+    wait_seconds = bucket.acquire() if bucket else 0.0
+    if wait_seconds > 0:
+      logger.debug(
+          f"Waited {wait_seconds:.2f} seconds for the '{api_method}' rate"
+          " limit"
+      )
+
+    with self._stats_lock:
+      stats = self._stats.get(api_method, RateLimiterStats(0, 0.0, 0.0))
+      self._stats[api_method] = RateLimiterStats(
+          acquired=stats.acquired + 1,
+          total_wait_seconds=stats.total_wait_seconds + wait_seconds,
+          max_wait_seconds=max(stats.max_wait_seconds, wait_seconds),
+      )
+
+  def get_stats(self) -> Dict[ApiMethod, RateLimiterStats]:
+    with self._stats_lock:
+      return dict(self._stats)
+
+
+_rate_limiter: RateLimiter = RateLimiter(buckets={})
+
+
+def configure_rate_limits(
+    requests_per_minute: Dict[ApiMethod, float],
+    shared_state_path: Optional[str] = None,
+):
+  global _rate_limiter
+  if shared_state_path:
+    buckets = {
+        api_method: SqliteTokenBucket(
+            requests_per_minute=rpm,
+            filepath=shared_state_path,
+            name=str(api_method),
+        )
+        for api_method, rpm in requests_per_minute.items()
+    }
+  else:
+    buckets = {
+        api_method: TokenBucket(requests_per_minute=rpm)
+        for api_method, rpm in requests_per_minute.items()
+    }
+
+  logger.debug(f"Rate limits (requests per minute): {requests_per_minute}")
+  _rate_limiter = RateLimiter(buckets=buckets)
+
+
+def acquire(api_method: ApiMethod):
+  _rate_limiter.acquire(api_method)
+
+
+def log_stats():
+  for api_method, stats in _rate_limiter.get_stats().items():
+    average_wait_seconds = stats.total_wait_seconds / stats.acquired
+    logger.info(
+        f"API method '{api_method}': {stats.acquired} calls, waited"
+        f" {stats.total_wait_seconds:.2f} seconds in total for the rate limit"
+        f" ({average_wait_seconds:.2f} seconds on average, at most"
+        f" {stats.max_wait_seconds:.2f} seconds)."
+    )
@@ -0,0 +1,211 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import logging
+import random
+import time
+from typing import Callable, Dict, NamedTuple, Optional, TypeVar
+from common import rate_limiter
+from common.api_method import ApiMethod
+from google.api_core import exceptions
+import requests
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Errors after which the same request may succeed if sent again.
+TRANSIENT_ERRORS = (
+    exceptions.InternalServerError,
+    exceptions.BadGateway,
+    exceptions.ServiceUnavailable,
+    exceptions.GatewayTimeout,
+    exceptions.TooManyRequests,
+    exceptions.Aborted,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+)
+
+
+class RetryPolicy(NamedTuple):
+  # Total time allowed for the operation, including all its retries.
+  deadline_seconds: float
+  # Timeout of a single attempt, passed to the API call.
+  timeout_seconds: float
+  initial_backoff_seconds: float = 1.0
+  max_backoff_seconds: float = 32.0
+  backoff_multiplier: float = 2.0
+
+
+DEFAULT_RETRY_POLICIES: Dict[ApiMethod, RetryPolicy] = {
+    ApiMethod.DISCOVER: RetryPolicy(deadline_seconds=600, timeout_seconds=300),
+    ApiMethod.GET_STREAM: RetryPolicy(deadline_seconds=120, timeout_seconds=30),
+    ApiMethod.UPDATE_STREAM: RetryPolicy(
+        deadline_seconds=600, timeout_seconds=60
+    ),
+    ApiMethod.GET_TABLE: RetryPolicy(deadline_seconds=120, timeout_seconds=30),
+    ApiMethod.LIST_TABLES: RetryPolicy(
+        deadline_seconds=300, timeout_seconds=60
+    ),
+    ApiMethod.DELETE_TABLE: RetryPolicy(
+        deadline_seconds=120, timeout_seconds=30
+    ),
+    ApiMethod.LOOKUP_STREAM_OBJECT: RetryPolicy(
+        deadline_seconds=120, timeout_seconds=30
+    ),
+    ApiMethod.START_BACKFILL_JOB: RetryPolicy(
+        deadline_seconds=120, timeout_seconds=30
+    ),
+    ApiMethod.INSERT_JOB: RetryPolicy(deadline_seconds=600, timeout_seconds=60),
+    ApiMethod.GET_JOB: RetryPolicy(deadline_seconds=600, timeout_seconds=60),
+    ApiMethod.CREATE_READ_SESSION: RetryPolicy(
+        deadline_seconds=300, timeout_seconds=60
+    ),
+    ApiMethod.CREATE_WRITE_STREAM: RetryPolicy(
+        deadline_seconds=120, timeout_seconds=30
+    ),
+    ApiMethod.FINALIZE_WRITE_STREAM: RetryPolicy(
+        deadline_seconds=120, timeout_seconds=30
+    ),
+    ApiMethod.COMMIT_WRITE_STREAMS: RetryPolicy(
+        deadline_seconds=300, timeout_seconds=60
+    ),
+}
+
+_retry_policies: Dict[ApiMethod, RetryPolicy] = dict(DEFAULT_RETRY_POLICIES)
+_hedge_after_seconds: Optional[float] = None
+_hedging_executor: Optional[ThreadPoolExecutor] = None
+
+
+# `max_concurrent_calls` is the number of threads that may send hedged
+# requests at the same time, such as the tables migrated concurrently. The
+# hedging pool holds a primary and a hedged request for each of them, so that
+# hedged requests of one table don't queue behind those of another.
+def configure_retry_policies(
+    deadline_seconds: Dict[ApiMethod, float],
+    hedge_after_seconds: Optional[float] = None,
+    max_concurrent_calls: int = 1,
+):
+  global _hedge_after_seconds, _hedging_executor
+  for api_method, deadline in deadline_seconds.items():
+    _retry_policies[api_method] = _retry_policies[api_method]._replace(
+        deadline_seconds=deadline,
+        timeout_seconds=min(
+            deadline, _retry_policies[api_method].timeout_seconds
+        ),
+    )
+  _hedge_after_seconds = hedge_after_seconds
+  if hedge_after_seconds is not None:
+    if _hedging_executor:
+      _hedging_executor.shutdown(wait=False)
+    _hedging_executor = ThreadPoolExecutor(
+        max_workers=2 * max(1, max_concurrent_calls),
+        thread_name_prefix="hedged-request",
+    )
+  logger.debug(f"Retry policies: {_retry_policies}")
+
+
+def get_retry_policy(api_method: ApiMethod) -> RetryPolicy:
+  return _retry_policies[api_method]
+
+
+def is_transient_error(ex: BaseException) -> bool:
+  return isinstance(ex, TRANSIENT_ERRORS)
+
+
+# Calls `fn` with the timeout of a single attempt, retrying transient errors
+# with jittered exponential backoff until the operation's deadline. Requests
+# that aren't idempotent are sent only once, since a transient error doesn't
+# tell whether they took effect; make them idempotent (for example with a
+# stable request or job ID) to retry them. `is_retryable` narrows down the
+# errors that are retried.
+def call_with_retry(
+    api_method: ApiMethod,
+    fn: Callable[[float], T],
+    idempotent: bool = True,
+    is_retryable: Callable[[BaseException], bool] = is_transient_error,
+) -> T:
+  policy = get_retry_policy(api_method)
+  deadline = time.monotonic() + policy.deadline_seconds
+  backoff_seconds = policy.initial_backoff_seconds
+  attempt = 1
+
+  while True:
+    rate_limiter.acquire(api_method)
+    try:
+      return fn(policy.timeout_seconds)
+    except Exception as ex:
+      if not idempotent or not is_retryable(ex):
+        raise
+
+      sleep_seconds = random.uniform(0, backoff_seconds)
+      if time.monotonic() + sleep_seconds >= deadline:
+        logger.error(
+            f"'{api_method}' failed after {attempt} attempts, the deadline of"
+            f" {policy.deadline_seconds} seconds was exceeded."
+        )
+        raise
+
+      logger.warning(
+          f"'{api_method}' attempt {attempt} failed with a transient error,"
+          f" retrying in {sleep_seconds:.1f} seconds: {ex!r}"
+      )
+      time.sleep(sleep_seconds)
+      backoff_seconds = min(
+          policy.max_backoff_seconds,
+          backoff_seconds * policy.backoff_multiplier,
+      )
+      attempt += 1
+
+
+# Like `call_with_retry`, but if an attempt of a read only request doesn't
+# complete within the hedging delay (`--hedge-after-seconds`), a duplicate
+# request is sent and the first response wins. This cuts the tail latency of
+# metadata reads on many tables at the cost of a few extra requests.
+def call_hedged_with_retry(
+    api_method: ApiMethod, fn: Callable[[float], T]
+) -> T:
+  if _hedge_after_seconds is None or not _hedging_executor:
+    return call_with_retry(api_method, fn)
+
+  return call_with_retry(
+      api_method, lambda timeout: _call_hedged(api_method, fn, timeout)
+  )
+
+
+def _call_hedged(
+    api_method: ApiMethod, fn: Callable[[float], T], timeout: float
+) -> T:
+  futures = [_hedging_executor.submit(fn, timeout)]
+  done, _ = wait(futures, timeout=_hedge_after_seconds)
+
+  if not done:
+    logger.debug(
+        f"'{api_method}' didn't respond within {_hedge_after_seconds} seconds,"
+        " sending a hedged request."
+    )
+    rate_limiter.acquire(api_method)
+    futures.append(_hedging_executor.submit(fn, timeout))
+
+  pending = set(futures)
+  error: Optional[BaseException] = None
+  while pending:
+    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+      if future.exception() is None:
+        return future.result()
+      error = future.exception()
+
+  raise error
@@ -0,0 +1,75 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sqlite3
+import threading
+from typing import Dict, Tuple
+
+SQLITE_BUSY_TIMEOUT_SECONDS = 60
+
+
+# Runs a transaction on a SQLite file that may be shared by several processes.
+# Each process keeps one connection per file, and its threads take turns
+# running transactions on it. Reads run in deferred transactions, which don't
+# take the write lock. Files only shared by the processes of one host use
+# write-ahead logging, so that reads don't wait for writes. Files on storage
+# shared by several hosts, such as the work queue, keep the rollback journal,
+# since write-ahead logging doesn't work across hosts.
+class SqliteTransaction:
+
+  def __init__(self, filepath: str, read_only: bool = False, wal: bool = True):
+    self.read_only: bool = read_only
+    self.connection, self._lock = _get_connection(filepath, wal=wal)
+
+  def __enter__(self) -> sqlite3.Connection:
+    self._lock.acquire()
+    try:
+      self.connection.execute("BEGIN" if self.read_only else "BEGIN IMMEDIATE")
+    except BaseException:
+      self._lock.release()
+      raise
+    return self.connection
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    try:
+      self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
+    finally:
+      self._lock.release()
+
+
+# Connections by file, of the process that opened them. Forked processes open
+# their own connections.
+_connections: Dict[str, Tuple[int, sqlite3.Connection, threading.RLock]] = {}
+_connections_lock = threading.Lock()
+
+
+def _get_connection(
+    filepath: str, wal: bool
+) -> Tuple[sqlite3.Connection, threading.RLock]:
+  filepath = os.path.abspath(filepath)
+  with _connections_lock:
+    pid, connection, lock = _connections.get(filepath, (None, None, None))
+    if pid != os.getpid():
+      connection = sqlite3.connect(
+          filepath,
+          timeout=SQLITE_BUSY_TIMEOUT_SECONDS,
+          isolation_level=None,
+          check_same_thread=False,
+      )
+      if wal:
+        connection.execute("PRAGMA journal_mode=WAL")
+      lock = threading.RLock()
+      _connections[filepath] = (os.getpid(), connection, lock)
+    return connection, lock
@@ -0,0 +1,102 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from common.table_schema import clean_column_name
+
+# Keys of the schemas, schema name, tables and columns in the include and
+# exclude objects of a stream's source config JSON, for each source type.
+_RDBMS_KEYS: Dict[str, Tuple[str, str, str, str]] = {
+    "mysqlSourceConfig": (
+        "mysqlDatabases",
+        "database",
+        "mysqlTables",
+        "mysqlColumns",
+    ),
+    "oracleSourceConfig": (
+        "oracleSchemas",
+        "schema",
+        "oracleTables",
+        "oracleColumns",
+    ),
+}
+
+
+# The columns of a source table that the stream replicates, according to the
+# include and exclude objects of its source config. A table that is listed
+# without columns stands for all of its columns.
+class ColumnFilter(NamedTuple):
+  # None if all the columns are included.
+  included_columns: Optional[List[str]] = None
+  excluded_columns: Optional[List[str]] = None
+
+  # Matches both source column names and the BigQuery column names they were
+  # cleaned to.
+  def includes(self, column_name: str) -> bool:
+    if self.included_columns is not None and not _matches(
+        column_name, self.included_columns
+    ):
+      return False
+    return not _matches(column_name, self.excluded_columns or [])
+
+
+# The column lists of the tables in a stream's include and exclude objects,
+# indexed once so that looking up the filter of one table in a stream with
+# thousands of tables is cheap.
+class StreamObjectFilter:
+
+  def __init__(self, source_config_json: Dict[str, Any]):
+    self.included_columns: Dict[Tuple[str, str], List[str]] = {}
+    self.excluded_columns: Dict[Tuple[str, str], List[str]] = {}
+    for source_config_key, keys in _RDBMS_KEYS.items():
+      source_config = source_config_json.get(source_config_key)
+      if source_config is not None:
+        self.included_columns = _index_table_columns(
+            source_config.get("includeObjects"), keys
+        )
+        self.excluded_columns = _index_table_columns(
+            source_config.get("excludeObjects"), keys
+        )
+        break
+
+  def get_column_filter(
+      self, source_schema_name: str, source_table_name: str
+  ) -> ColumnFilter:
+    table = (source_schema_name, source_table_name)
+    return ColumnFilter(
+        included_columns=self.included_columns.get(table),
+        excluded_columns=self.excluded_columns.get(table),
+    )
+
+
+# Maps (schema, table) to the columns listed for the table. Tables listed
+# without specific columns are left out.
+def _index_table_columns(
+    rdbms: Optional[Dict[str, Any]], keys: Tuple[str, str, str, str]
+) -> Dict[Tuple[str, str], List[str]]:
+  schemas_key, schema_key, tables_key, columns_key = keys
+  table_columns = {}
+  for schema in (rdbms or {}).get(schemas_key, []):
+    for table in schema.get(tables_key, []):
+      if table.get(columns_key):
+        table_columns[(schema.get(schema_key), table.get("table"))] = [
+            column["column"] for column in table[columns_key]
+        ]
+  return table_columns
+
+
+def _matches(column_name: str, column_names: List[str]) -> bool:
+  return any(
+      column_name in (name, clean_column_name(name)) for name in column_names
+  )
@@ -0,0 +1,154 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+from common.bigquery_type import BigQueryType
+
+
+# A column of the source table, as described by the discover result. The column
+# name is cleaned to a valid BigQuery column name once, when the column is
+# created.
+class SourceColumn(NamedTuple):
+  name: str
+  cleaned_name: str
+  data_type: str
+  precision: Optional[int]
+  scale: Optional[int]
+  primary_key: bool
+
+  @classmethod
+  def from_discover(cls, column: Dict[str, Union[str, int]]) -> "SourceColumn":
+    return cls(
+        name=column["column"],
+        cleaned_name=clean_column_name(column["column"]),
+        data_type=column["dataType"].upper(),
+        precision=column.get("precision"),
+        scale=column.get("scale"),
+        primary_key=column.get("primaryKey") is True,
+    )
+
+
+# A BigQuery column type, with the precision and scale of parameterized
+# decimal types.
+class ColumnType(NamedTuple):
+  bigquery_type: BigQueryType
+  precision: Optional[int] = None
+  scale: Optional[int] = None
+
+  def __str__(self):
+    if self.precision is None:
+      return str(self.bigquery_type)
+    return self.bigquery_type.with_precision_and_scale(
+        self.precision, self.scale
+    )
+
+
+class Column(NamedTuple):
+  name: str
+  column_type: ColumnType
+  primary_key: bool = False
+
+  def to_json(self) -> List[Any]:
+    return [
+        self.name,
+        self.column_type.bigquery_type.value,
+        self.column_type.precision,
+        self.column_type.scale,
+        self.primary_key,
+    ]
+
+  @classmethod
+  def from_json(cls, column: List[Any]) -> "Column":
+    name, bigquery_type, precision, scale, primary_key = column
+    return cls(
+        name=name,
+        column_type=ColumnType(BigQueryType(bigquery_type), precision, scale),
+        primary_key=primary_key,
+    )
+
+
+# The schema of a BigQuery table, either generated by the toolkit or parsed
+# from an existing table. It is built once and shared by the SQL generators,
+# so that column names and types aren't parsed and cleaned again. Metadata
+# columns added by Datastream or Dataflow aren't part of the columns, only their
+# names are kept.
+class TableSchema:
+  __slots__ = (
+      "_fully_qualified_table_name",
+      "_columns",
+      "_schema",
+      "_metadata_columns",
+  )
+
+  def __init__(
+      self,
+      fully_qualified_table_name: str,
+      columns: List[Column],
+      metadata_columns: Optional[List[str]] = None,
+  ):
+    self._fully_qualified_table_name: str = fully_qualified_table_name
+    self._columns: List[Column] = columns
+    self._metadata_columns: List[str] = metadata_columns or []
+    self._schema: Dict[str, BigQueryType] = {
+        column.name: column.column_type.bigquery_type for column in columns
+    }
+
+  def get_schema(self) -> Dict[str, BigQueryType]:
+    return self._schema
+
+  def get_columns(self) -> List[Column]:
+    return self._columns
+
+  def get_metadata_columns(self) -> List[str]:
+    return self._metadata_columns
+
+  def get_primary_keys(self) -> List[Column]:
+    return [column for column in self._columns if column.primary_key]
+
+  def get_fully_qualified_table_name(self):
+    return self._fully_qualified_table_name
+
+  @classmethod
+  def from_schema(
+      cls,
+      fully_qualified_table_name: str,
+      schema: Dict[str, BigQueryType],
+      metadata_columns: Optional[List[str]] = None,
+      primary_keys: Optional[List[str]] = None,
+  ) -> "TableSchema":
+    primary_keys = primary_keys or []
+    return cls(
+        fully_qualified_table_name=fully_qualified_table_name,
+        columns=[
+            Column(
+                name=name,
+                column_type=ColumnType(bigquery_type),
+                primary_key=name in primary_keys,
+            )
+            for name, bigquery_type in schema.items()
+        ],
+        metadata_columns=metadata_columns,
+    )
+
+
+_INVALID_COLUMN_NAME_CHARACTERS = re.compile("[^\\w]", flags=re.ASCII)
+
+
+def clean_column_name(column_name: str) -> str:
+  cleaned_name = _INVALID_COLUMN_NAME_CHARACTERS.sub("_", column_name)
+  if cleaned_name[0].isdigit():
+    return f"_{cleaned_name}"
+
+  return cleaned_name
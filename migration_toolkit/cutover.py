@@ -0,0 +1,144 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import sys
+import time
+from batch.source_tables import source_table_id
+from batch.stream_control import pause_stream, resume_stream, wait_for_in_flight_events
+from common.copy_method import CopyMethod
+from common.monitoring_consts import USER_AGENT
+from executors.count_rows import execute_count_rows
+from google.api_core.gapic_v1.client_info import ClientInfo
+from google.cloud import bigquery
+from migrate_table import wait_for_user_prompt_if_necessary
+from migrate_tables import log_results, migrate_tables
+from migration_config import get_cutover_config
+
+logger = logging.getLogger(__name__)
+
+
+# Cuts over a batch of tables from the old pipeline to the new stream: pauses
+# the old stream, waits for its in-flight events, migrates the tables, and
+# resumes the new stream once all tables were copied.
+def main():
+  config: argparse.Namespace = get_cutover_config()
+  logger.debug(f"Using config {vars(config)}")
+
+  # Tables copied while the Dataflow job still writes to them miss its last
+  # events, the operator has to confirm the drain without a prompt.
+  if config.force and not config.dataflow_drained:
+    logger.error(
+        "ERROR: --force requires --dataflow-drained, the Dataflow job of the"
+        " old pipeline has to be drained before the tables are migrated."
+    )
+    sys.exit(1)
+
+  # A worker only knows the results of the tables it migrated itself, it
+  # can't tell whether the tables of the other workers were copied.
+  if config.work_queue_path:
+    logger.error(
+        "ERROR: The cutover resumes the new stream once all tables were"
+        " copied, it can't share a --work-queue-path with other workers."
+    )
+    sys.exit(1)
+
+  wait_for_user_prompt_if_necessary(
+      f"Pausing stream '{config.old_stream_id}', migrating"
+      f" {len(config.tables)} tables and resuming stream"
+      f" '{config.stream_id}'",
+      config.force,
+  )
+
+  pause_stream(
+      project_id=config.project_id,
+      datastream_region=config.datastream_region,
+      stream_id=config.old_stream_id,
+      datastream_api_endpoint_override=config.datastream_api_endpoint_override,
+      timeout_seconds=config.stream_state_timeout_seconds,
+  )
+  wait_for_in_flight_events(
+      project_id=config.project_id,
+      datastream_region=config.datastream_region,
+      stream_id=config.old_stream_id,
+      paused_at=time.time(),
+      fallback_seconds=config.latency_wait_seconds,
+  )
+  wait_for_user_prompt_if_necessary(
+      f"Stream '{config.old_stream_id}' is paused. Drain the Dataflow job of"
+      " the old pipeline before the tables are migrated",
+      config.dataflow_drained,
+  )
+
+  results = migrate_tables(config)
+  if not log_results(results):
+    logger.error(
+        f"ERROR: Stream '{config.stream_id}' wasn't resumed. Fix the failed"
+        " tables and resume it."
+    )
+    sys.exit(1)
+
+  if config.verify_row_counts and not _verify_row_counts(config):
+    logger.error(
+        f"ERROR: Stream '{config.stream_id}' wasn't resumed. Check the tables"
+        " whose row counts don't match and resume it."
+    )
+    sys.exit(1)
+
+  resume_stream(
+      project_id=config.project_id,
+      datastream_region=config.datastream_region,
+      stream_id=config.stream_id,
+      datastream_api_endpoint_override=config.datastream_api_endpoint_override,
+      timeout_seconds=config.stream_state_timeout_seconds,
+  )
+  logger.info(
+      f"Cutover finished successfully, stream '{config.stream_id}' is running."
+  )
+
+
+# Returns whether every new table has as many rows as its existing table.
+def _verify_row_counts(config: argparse.Namespace) -> bool:
+  bigquery_client = bigquery.Client(
+      client_info=ClientInfo(user_agent=USER_AGENT)
+  )
+
+  def verify(table_config: argparse.Namespace) -> bool:
+    source_table = source_table_id(table_config)
+    target_table = (
+        f"{table_config.project_id}.{table_config.bigquery_target_dataset_name}."
+        f"{table_config.bigquery_target_table_name}"
+    )
+    source_rows = execute_count_rows(source_table, bigquery_client)
+    target_rows = execute_count_rows(target_table, bigquery_client)
+    if source_rows != target_rows:
+      logger.error(
+          f"ERROR: Table {target_table} has {target_rows} rows, but"
+          f" {source_table} has {source_rows} rows."
+      )
+      return False
+    return True
+
+  # Backfilled tables are only filled once the new stream is running.
+  copied_tables = [
+      c for c in config.tables if c.copy_method != CopyMethod.BACKFILL
+  ]
+  with ThreadPoolExecutor(max_workers=config.max_concurrent_tables) as executor:
+    return all(list(executor.map(verify, copied_tables)))
+
+
+if __name__ == "__main__":
+  main()
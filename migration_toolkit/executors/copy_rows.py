@@ -12,18 +12,189 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from concurrent.futures import ThreadPoolExecutor
 import logging
+from typing import List, Optional
+from common.bigquery_type import BigQueryType
+from common.copy_checkpoint import CopyCheckpoint
 from common.file_reader import read
+from common.output_names import COPY_CHECKPOINT_FILEPATH
+from common.partitioning import PartitionRange
+from executors.query import execute_query
 from google.cloud import bigquery
+from google.cloud.bigquery.job import CreateDisposition, QueryJobConfig, WriteDisposition
+from google.cloud.bigquery.query import ScalarQueryParameter
 
 logger = logging.getLogger(__name__)
 
 
 def execute_copy_rows(filepath: str, bigquery_client: bigquery.Client):
   logger.debug(f"Executing copy rows. Filepath: {filepath}")
-  sql = read(filepath)
+  execute_copy_rows_sql(read(filepath), bigquery_client=bigquery_client)
 
+
+def execute_copy_rows_sql(sql: str, bigquery_client: bigquery.Client):
   logger.info(f"Running SQL query:\n{sql}")
-  query_job = bigquery_client.query(sql)
-  res = [r for r in query_job.result()]
+  res = execute_query(sql, bigquery_client=bigquery_client)
+  logger.debug(f"Done. Result: {res}")
+
+
+def execute_append_rows(
+    filepath: str, destination_table_id: str, bigquery_client: bigquery.Client
+):
+  logger.debug(f"Executing append rows. Filepath: {filepath}")
+  execute_append_rows_sql(
+      read(filepath),
+      destination_table_id=destination_table_id,
+      bigquery_client=bigquery_client,
+  )
+
+
+# Appends the results of the query to the existing table. Unlike an `INSERT`
+# DML statement, an append job isn't queued behind other jobs writing to the
+# same table. The table is never created or altered, so its primary key,
+# clustering and max staleness are kept.
+def execute_append_rows_sql(
+    sql: str, destination_table_id: str, bigquery_client: bigquery.Client
+):
+  logger.info(f"Running SQL query, appending to {destination_table_id}:\n{sql}")
+  res = execute_query(
+      sql,
+      bigquery_client=bigquery_client,
+      job_config=_append_job_config(destination_table_id),
+  )
   logger.debug(f"Done. Result: {res}")
+
+
+def _append_job_config(destination_table_id: str, **kwargs) -> QueryJobConfig:
+  return QueryJobConfig(
+      destination=destination_table_id,
+      write_disposition=WriteDisposition.WRITE_APPEND,
+      create_disposition=CreateDisposition.CREATE_NEVER,
+      **kwargs,
+  )
+
+
+def execute_partitioned_copy_rows(
+    filepath: str,
+    partition_ranges: List[PartitionRange],
+    partition_column_type: BigQueryType,
+    bigquery_client: bigquery.Client,
+    append_to_table_id: Optional[str] = None,
+):
+  logger.debug(f"Executing partitioned copy rows. Filepath: {filepath}")
+  execute_partitioned_copy_rows_sql(
+      read(filepath),
+      partition_ranges=partition_ranges,
+      partition_column_type=partition_column_type,
+      bigquery_client=bigquery_client,
+      append_to_table_id=append_to_table_id,
+  )
+
+
+# Copies the ranges of partitions concurrently, each range by a separate job.
+# The rows are inserted by the statement, or appended to `append_to_table_id`
+# when the SQL is a query.
+def execute_partitioned_copy_rows_sql(
+    sql: str,
+    partition_ranges: List[PartitionRange],
+    partition_column_type: BigQueryType,
+    bigquery_client: bigquery.Client,
+    append_to_table_id: Optional[str] = None,
+):
+  logger.info(
+      f"Running SQL query on {len(partition_ranges)} ranges of partitions:\n{sql}"
+  )
+
+  def copy(partition_range: PartitionRange):
+    logger.info(
+        f"Copying partitions from {partition_range.start} to"
+        f" {partition_range.end}"
+    )
+    query_parameters = [
+        ScalarQueryParameter(
+            "partition_start", str(partition_column_type), partition_range.start
+        ),
+        ScalarQueryParameter(
+            "partition_end", str(partition_column_type), partition_range.end
+        ),
+        ScalarQueryParameter("copy_nulls", "BOOL", partition_range.copy_nulls),
+    ]
+    res = execute_query(
+        sql,
+        bigquery_client=bigquery_client,
+        job_config=(
+            _append_job_config(
+                append_to_table_id, query_parameters=query_parameters
+            )
+            if append_to_table_id
+            else QueryJobConfig(query_parameters=query_parameters)
+        ),
+    )
+    logger.debug(f"Done. Result: {res}")
+
+  with ThreadPoolExecutor(max_workers=len(partition_ranges)) as executor:
+    list(executor.map(copy, partition_ranges))
+
+
+def execute_merge_rows(
+    filepath: str,
+    destination_table_id: str,
+    bucket_count: int,
+    bigquery_client: bigquery.Client,
+):
+  logger.debug(f"Executing merge rows. Filepath: {filepath}")
+  execute_merge_rows_sql(
+      read(filepath),
+      destination_table_id=destination_table_id,
+      bucket_count=bucket_count,
+      bigquery_client=bigquery_client,
+  )
+
+
+# Merges the buckets of rows one by one, skipping the buckets that were merged
+# by a previous run of the same statement. A bucket that failed partway is
+# merged again, which converges since rows are matched on their primary key.
+def execute_merge_rows_sql(
+    sql: str,
+    destination_table_id: str,
+    bucket_count: int,
+    bigquery_client: bigquery.Client,
+):
+  checkpoint = CopyCheckpoint(COPY_CHECKPOINT_FILEPATH)
+  completed_buckets = checkpoint.get_completed_buckets(
+      destination_table_id, sql=sql, bucket_count=bucket_count
+  )
+  logger.info(f"Running SQL query:\n{sql}")
+
+  for bucket in range(bucket_count):
+    if bucket in completed_buckets:
+      logger.info(
+          f"Bucket {bucket + 1}/{bucket_count} of {destination_table_id} was"
+          " already merged, skipping it."
+      )
+      continue
+
+    logger.info(
+        f"Merging bucket {bucket + 1}/{bucket_count} of {destination_table_id}"
+    )
+    res = execute_query(
+        sql,
+        bigquery_client=bigquery_client,
+        job_config=(
+            QueryJobConfig(
+                query_parameters=[
+                    ScalarQueryParameter("bucket_count", "INT64", bucket_count),
+                    ScalarQueryParameter("bucket", "INT64", bucket),
+                ]
+            )
+            if bucket_count > 1
+            else None
+        ),
+    )
+    logger.debug(f"Done. Result: {res}")
+    checkpoint.complete_bucket(
+        destination_table_id, sql=sql, bucket_count=bucket_count, bucket=bucket
+    )
+
+  checkpoint.clear(destination_table_id)
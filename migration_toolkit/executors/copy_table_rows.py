@@ -0,0 +1,171 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from typing import List, Optional
+from common.copy_method import CopyMethod
+from common.defaults import DEFAULT_LOAD_JOB_COUNT, DEFAULT_READ_STREAM_COUNT, DEFAULT_WRITE_STREAM_COUNT
+from common.extract_format import ExtractFormat
+from common.partitioning import PartitionRange, SourcePartitioning, get_partition_ranges
+from executors.copy_rows import execute_append_rows_sql, execute_copy_rows_sql, execute_merge_rows_sql, execute_partitioned_copy_rows_sql
+from executors.extract_load_rows import execute_extract_load_rows
+from executors.list_partitions import execute_list_partitions
+from executors.staging_storage import StagingStorage
+from executors.storage_copy.storage_copy_rows import execute_storage_copy_rows
+from google.cloud import bigquery
+from sql_generators.copy_rows.copy_rows import CopyDataSQLGenerator
+
+logger = logging.getLogger(__name__)
+
+
+# Returns the ranges of partitions that are copied concurrently, or None if the
+# rows are copied by a single statement.
+def get_copy_partition_ranges(
+    copy_method: CopyMethod,
+    source_table_id: str,
+    source_partitioning: Optional[SourcePartitioning],
+    partition_range_count: int,
+    bigquery_client: bigquery.Client,
+) -> Optional[List[PartitionRange]]:
+  if partition_range_count <= 1:
+    return None
+  if copy_method == CopyMethod.MERGE:
+    logger.warning(
+        f"The '{CopyMethod.MERGE}' copy method doesn't copy partition ranges,"
+        " use `--merge-bucket-count` to split the copy."
+    )
+    return None
+  if copy_method == CopyMethod.STORAGE_API:
+    logger.warning(
+        f"The '{CopyMethod.STORAGE_API}' copy method doesn't copy partition"
+        " ranges, use `--storage-read-stream-count` to split the copy."
+    )
+    return None
+  if copy_method == CopyMethod.EXTRACT_LOAD:
+    logger.warning(
+        f"The '{CopyMethod.EXTRACT_LOAD}' copy method doesn't copy partition"
+        " ranges, use `--load-job-count` to split the copy."
+    )
+    return None
+  if not source_partitioning:
+    logger.warning(
+        f"Table {source_table_id} isn't partitioned, copying it with a single"
+        " statement."
+    )
+    return None
+
+  partition_ranges = get_partition_ranges(
+      source_partitioning,
+      partition_rows=execute_list_partitions(
+          source_table_id, bigquery_client=bigquery_client
+      ),
+      range_count=partition_range_count,
+  )
+  return partition_ranges if len(partition_ranges) > 1 else None
+
+
+# Copies the rows of the existing table to the new table, which already exists,
+# with the given copy method. `copy_rows_sql` is generated by
+# `copy_data_sql_generator`, with the partition column of `source_partitioning`
+# when the rows are copied by `partition_ranges`. Backfilled tables aren't
+# copied.
+def execute_copy_table_rows(
+    copy_method: CopyMethod,
+    project_id: str,
+    source_table_id: str,
+    destination_table_id: str,
+    copy_data_sql_generator: CopyDataSQLGenerator,
+    copy_rows_sql: str,
+    bigquery_client: bigquery.Client,
+    merge_bucket_count: int = 1,
+    source_partitioning: Optional[SourcePartitioning] = None,
+    partition_ranges: Optional[List[PartitionRange]] = None,
+    staging_storage: Optional[StagingStorage] = None,
+    extract_format: ExtractFormat = ExtractFormat.AVRO,
+    load_job_count: int = DEFAULT_LOAD_JOB_COUNT,
+    storage_read_stream_count: int = DEFAULT_READ_STREAM_COUNT,
+    storage_write_stream_count: int = DEFAULT_WRITE_STREAM_COUNT,
+):
+  if copy_method == CopyMethod.BACKFILL:
+    raise ValueError(
+        f"The rows of tables migrated with the '{CopyMethod.BACKFILL}' copy"
+        " method are backfilled by Datastream."
+    )
+
+  # Rows are copied with a query, unless they are streamed with the Storage
+  # APIs or extracted and loaded
+  if copy_method == CopyMethod.STORAGE_API:
+    execute_storage_copy_rows(
+        project_id=project_id,
+        source_table_id=source_table_id,
+        destination_table_id=destination_table_id,
+        column_casts=copy_data_sql_generator.get_column_casts(),
+        read_stream_count=storage_read_stream_count,
+        write_stream_count=storage_write_stream_count,
+    )
+  elif copy_method == CopyMethod.EXTRACT_LOAD and _is_cast_free(
+      source_table_id, copy_data_sql_generator=copy_data_sql_generator
+  ):
+    if not staging_storage:
+      raise ValueError(
+          f"The '{CopyMethod.EXTRACT_LOAD}' copy method requires a staging"
+          " storage."
+      )
+    execute_extract_load_rows(
+        source_table_id=source_table_id,
+        destination_table_id=destination_table_id,
+        staging_storage=staging_storage,
+        bigquery_client=bigquery_client,
+        extract_format=extract_format,
+        load_job_count=load_job_count,
+    )
+  elif partition_ranges:
+    execute_partitioned_copy_rows_sql(
+        copy_rows_sql,
+        partition_ranges=partition_ranges,
+        partition_column_type=source_partitioning.column_type,
+        bigquery_client=bigquery_client,
+        append_to_table_id=(
+            destination_table_id if copy_method == CopyMethod.APPEND else None
+        ),
+    )
+  elif copy_method == CopyMethod.APPEND:
+    execute_append_rows_sql(
+        copy_rows_sql,
+        destination_table_id=destination_table_id,
+        bigquery_client=bigquery_client,
+    )
+  elif copy_method == CopyMethod.MERGE:
+    execute_merge_rows_sql(
+        copy_rows_sql,
+        destination_table_id=destination_table_id,
+        bucket_count=merge_bucket_count,
+        bigquery_client=bigquery_client,
+    )
+  else:
+    execute_copy_rows_sql(copy_rows_sql, bigquery_client=bigquery_client)
+
+
+# Extracted rows are loaded as they are, tables that need casts are copied by a
+# query instead.
+def _is_cast_free(
+    source_table_id: str, copy_data_sql_generator: CopyDataSQLGenerator
+) -> bool:
+  cast_count = copy_data_sql_generator.get_cast_count()
+  if cast_count:
+    logger.warning(
+        f"Table {source_table_id} has {cast_count} columns that need casts,"
+        " copying it with a query instead of extract and load jobs."
+    )
+  return cast_count == 0
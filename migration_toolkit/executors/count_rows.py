@@ -0,0 +1,28 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from executors.query import execute_query
+from google.cloud import bigquery
+
+logger = logging.getLogger(__name__)
+
+COUNT_ROWS_SQL = "SELECT COUNT(*) AS num_rows FROM `{table_id}`;"
+
+
+def execute_count_rows(table_id: str, bigquery_client: bigquery.Client) -> int:
+  sql = COUNT_ROWS_SQL.format(table_id=table_id)
+  logger.debug(f"Running SQL query:\n{sql}")
+  rows = execute_query(sql, bigquery_client=bigquery_client)
+  return rows[0]["num_rows"]
@@ -0,0 +1,28 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from common.file_reader import read
+from executors.query import execute_query
+from google.cloud import bigquery
+
+logger = logging.getLogger(__name__)
+
+
+def execute_create_dataset(filepath: str, bigquery_client: bigquery.Client):
+  logger.debug(f"Executing create bigquery dataset. Filepath: {filepath}")
+  ddl = read(filepath)
+  logger.info(f"Running SQL query:\n{ddl}")
+  res = execute_query(ddl, bigquery_client=bigquery_client)
+  logger.debug(f"Done. Result: {res}")
@@ -14,6 +14,7 @@
 
 import logging
 from common.file_reader import read
+from executors.query import execute_query
 from google.cloud import bigquery
 
 logger = logging.getLogger(__name__)
@@ -21,9 +22,10 @@ logger = logging.getLogger(__name__)
 
 def execute_create_table(filepath: str, bigquery_client: bigquery.Client):
   logger.debug(f"Executing create bigquery table. Filepath: {filepath}")
-  ddl = read(filepath)
+  execute_create_table_ddl(read(filepath), bigquery_client=bigquery_client)
 
+
+def execute_create_table_ddl(ddl: str, bigquery_client: bigquery.Client):
   logger.info(f"Running SQL query:\n{ddl}")
-  query_job = bigquery_client.query(ddl)
-  res = [r for r in query_job.result()]
+  res = execute_query(ddl, bigquery_client=bigquery_client)
   logger.debug(f"Done. Result: {res}")
@@ -0,0 +1,36 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from common.api_method import ApiMethod
+from common.retry_policy import call_with_retry
+from google.cloud import bigquery
+
+logger = logging.getLogger(__name__)
+
+
+# Deletes the table, if it exists.
+def execute_delete_bigquery_table(
+    bigquery_table_name: str, bigquery_client: bigquery.Client
+):
+  logger.debug(f"Executing delete table for {bigquery_table_name}")
+
+  call_with_retry(
+      ApiMethod.DELETE_TABLE,
+      lambda timeout: bigquery_client.delete_table(
+          bigquery_table_name, not_found_ok=True, retry=None, timeout=timeout
+      ),
+  )
+
+  logger.debug(f"Done. Deleted table {bigquery_table_name}")
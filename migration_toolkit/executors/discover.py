@@ -14,9 +14,12 @@
 
 import json
 import logging
-from typing import Dict
+from typing import Any, Dict, Optional
+from common.api_method import ApiMethod
 from common.file_writer import write_json
+from common.metadata_cache import discover_key, get_metadata_cache
 from common.monitoring_consts import USER_AGENT
+from common.retry_policy import call_with_retry
 from common.source_type import SourceType
 from google.api_core.gapic_v1.client_info import ClientInfo
 from google.cloud import datastream_v1
@@ -45,13 +48,16 @@ def _pb_to_json(pb):
   return json.loads(type(pb).to_json(pb))
 
 
-def _build_data_object(source_type: SourceType, schema: str, table: str):
+# Without a table, all the tables of the schema are discovered.
+def _build_data_object(
+    source_type: SourceType, schema: str, table: Optional[str]
+):
+  schema_object = {SOURCE_TYPE_TO_SCHEMA[source_type]: schema}
+  if table is not None:
+    schema_object[SOURCE_TYPE_TO_TABLES[source_type]] = [{"table": table}]
   return {
       SOURCE_TYPE_TO_RDBMS[source_type]: {
-          SOURCE_TYPE_TO_SCHEMAS[source_type]: [{
-              SOURCE_TYPE_TO_SCHEMA[source_type]: schema,
-              SOURCE_TYPE_TO_TABLES[source_type]: [{"table": table}],
-          }]
+          SOURCE_TYPE_TO_SCHEMAS[source_type]: [schema_object]
       }
   }
 
@@ -59,11 +65,30 @@ def _build_data_object(source_type: SourceType, schema: str, table: str):
 def execute_discover(
     connection_profile_name: str,
     source_type: SourceType,
-    source_table_name: str,
+    source_table_name: Optional[str],
     source_schema_name: str,
     datastream_api_endpoint_override: str,
-    filepath: str,
-):
+    filepath: Optional[str],
+) -> Dict[str, Any]:
+  metadata_cache = get_metadata_cache()
+  cache_key = discover_key(
+      connection_profile_name=connection_profile_name,
+      source_schema_name=source_schema_name,
+      source_table_name=source_table_name,
+  )
+  if metadata_cache:
+    cached_resp = metadata_cache.get(
+        cache_key, ttl_seconds=metadata_cache.discover_ttl_seconds
+    )
+    if cached_resp is not None:
+      logger.info(
+          "Using cached discover result of connection profile"
+          f" '{connection_profile_name}'"
+      )
+      resp = json.loads(cached_resp)
+      _write_to_file(filepath=filepath, resp=resp)
+      return resp
+
   logger.info(
       f"Calling discover on connection profile '{connection_profile_name}'.."
   )
@@ -94,6 +119,23 @@ def execute_discover(
       ),
   )
 
-  resp = client.discover_connection_profile(request=request)
+  resp = call_with_retry(
+      ApiMethod.DISCOVER,
+      lambda timeout: client.discover_connection_profile(
+          request=request, retry=None, timeout=timeout
+      ),
+  )
   resp = _pb_to_json(resp)
-  write_json(filepath=filepath, data=resp)
+  _write_to_file(filepath=filepath, resp=resp)
+
+  if metadata_cache:
+    metadata_cache.put(cache_key, json.dumps(resp))
+
+  return resp
+
+
+# The discover result is only written when a file path is given, it is
+# returned either way.
+def _write_to_file(filepath: Optional[str], resp: Dict[str, Any]):
+  if filepath:
+    write_json(filepath=filepath, data=resp)
@@ -0,0 +1,150 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import math
+from typing import List
+import uuid
+from common.defaults import DEFAULT_LOAD_JOB_COUNT
+from common.extract_format import ExtractFormat
+from executors.query import JOB_ID_PREFIX, execute_job
+from executors.staging_storage import StagingStorage
+from google.cloud import bigquery
+from google.cloud.bigquery.job import CreateDisposition, ExtractJobConfig, LoadJob, LoadJobConfig, WriteDisposition
+
+logger = logging.getLogger(__name__)
+
+# A load job reads at most 10,000 URIs.
+MAX_URIS_PER_LOAD_JOB = 10000
+
+
+# Copies the rows with an extract job to the staging storage, followed by load
+# jobs that append the extracted files to the destination table. Extract and
+# load jobs don't scan the table like a query, so they aren't billed by the
+# bytes processed. The rows are loaded as they are, so the destination's
+# columns must have the same types as the source's; columns that only the
+# source has, like Dataflow's metadata columns, are ignored by the load. The
+# staged files are deleted afterwards, whether the copy succeeded or not.
+# A single load job loads the rows atomically. Files split between several jobs
+# are appended by each job separately, so the rows of the jobs that succeeded
+# stay in the table when another job fails. Returns the number of loaded rows.
+def execute_extract_load_rows(
+    source_table_id: str,
+    destination_table_id: str,
+    staging_storage: StagingStorage,
+    bigquery_client: bigquery.Client,
+    extract_format: ExtractFormat = ExtractFormat.AVRO,
+    load_job_count: int = DEFAULT_LOAD_JOB_COUNT,
+) -> int:
+  prefix = f"{JOB_ID_PREFIX}{destination_table_id}_{uuid.uuid4().hex}/"
+  try:
+    _extract(
+        source_table_id=source_table_id,
+        destination_uri=staging_storage.get_uri(
+            f"{prefix}shard-*.{extract_format}"
+        ),
+        extract_format=extract_format,
+        bigquery_client=bigquery_client,
+    )
+    # The extract job shards large tables into many files.
+    uris = staging_storage.list_uris(prefix)
+    uri_shards = _split_uris(uris, load_job_count)
+    logger.info(
+        f"Loading {len(uris)} files to {destination_table_id} with"
+        f" {len(uri_shards)} load jobs."
+    )
+
+    def load(shard: List[str]) -> int:
+      load_job: LoadJob = execute_job(
+          lambda job_id, timeout: bigquery_client.load_table_from_uri(
+              shard,
+              destination_table_id,
+              job_id=job_id,
+              job_config=_load_job_config(extract_format),
+              retry=None,
+              timeout=timeout,
+          ),
+          bigquery_client=bigquery_client,
+      )
+      return load_job.output_rows or 0
+
+    with ThreadPoolExecutor(max_workers=max(1, len(uri_shards))) as executor:
+      futures = [executor.submit(load, shard) for shard in uri_shards]
+
+    errors = [f.exception() for f in futures if f.exception()]
+    if errors:
+      if len(errors) < len(futures):
+        logger.error(
+            f"ERROR: {len(errors)} out of {len(futures)} load jobs failed, the"
+            " rows of the other jobs were appended to"
+            f" {destination_table_id}. Drop the table and rerun the migration."
+        )
+      raise errors[0]
+    row_count = sum(f.result() for f in futures)
+  finally:
+    staging_storage.delete(prefix)
+
+  logger.info(f"Loaded {row_count} rows to {destination_table_id}.")
+  return row_count
+
+
+def _extract(
+    source_table_id: str,
+    destination_uri: str,
+    extract_format: ExtractFormat,
+    bigquery_client: bigquery.Client,
+):
+  logger.info(f"Extracting table {source_table_id} to {destination_uri}")
+  execute_job(
+      lambda job_id, timeout: bigquery_client.extract_table(
+          source_table_id,
+          destination_uri,
+          job_id=job_id,
+          job_config=ExtractJobConfig(
+              destination_format=extract_format.value.upper(),
+              use_avro_logical_types=extract_format == ExtractFormat.AVRO,
+          ),
+          retry=None,
+          timeout=timeout,
+      ),
+      bigquery_client=bigquery_client,
+  )
+
+
+# Avro logical types keep the DATE, TIME, DATETIME and TIMESTAMP values typed,
+# instead of loading them as integers or strings.
+def _load_job_config(extract_format: ExtractFormat) -> LoadJobConfig:
+  return LoadJobConfig(
+      source_format=extract_format.value.upper(),
+      use_avro_logical_types=extract_format == ExtractFormat.AVRO,
+      write_disposition=WriteDisposition.WRITE_APPEND,
+      create_disposition=CreateDisposition.CREATE_NEVER,
+      ignore_unknown_values=True,
+  )
+
+
+# Splits the files into contiguous shards, one per load job.
+def _split_uris(uris: List[str], load_job_count: int) -> List[List[str]]:
+  if not uris:
+    return []
+  shard_count = max(
+      min(load_job_count, len(uris)),
+      math.ceil(len(uris) / MAX_URIS_PER_LOAD_JOB),
+  )
+  shard_size = math.ceil(len(uris) / shard_count)
+  return [
+      uris[start : start + shard_size]
+      for start in range(0, len(uris), shard_size)
+  ]
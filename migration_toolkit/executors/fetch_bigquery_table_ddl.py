@@ -13,34 +13,79 @@
 # limitations under the License.
 
 import logging
-from typing import List
+from typing import Dict
 from common.file_reader import read
 from common.file_writer import write
+from executors.query import execute_query
 from google.cloud import bigquery
+from google.cloud.bigquery import ArrayQueryParameter, QueryJobConfig
+from sql_generators.fetch_bigquery_table_ddl.fetch_bigquery_table_ddl import TABLE_NAMES_PARAMETER
 
 logger = logging.getLogger(__name__)
 
 
 def execute_fetch_bigquery_table_ddl(
     sql_filepath: str, output_path: str, bigquery_client: bigquery.Client
-):
+) -> str:
   logger.debug(f"Executing fetch BigQuery table DDL. Filepath: {sql_filepath}")
 
-  sql = read(filepath=sql_filepath)
+  ddl = execute_fetch_bigquery_table_ddl_sql(
+      read(filepath=sql_filepath), bigquery_client=bigquery_client
+  )
+  _write_to_file(path=output_path, ddl=ddl)
+  return ddl
+
 
+def execute_fetch_bigquery_table_ddl_sql(
+    sql: str, bigquery_client: bigquery.Client
+) -> str:
   logger.info(f"Running SQL query: {sql}")
-  query_job = bigquery_client.query(sql)
-  rows = [row for row in query_job.result()]
+  rows = execute_query(sql, bigquery_client=bigquery_client)
 
   if len(rows) != 1:
     raise AssertionError(
         f"Expected only one match for query: '{sql}', but got: {rows}"
     )
 
-  ddl: List[str] = rows[0]["ddl"]
+  ddl: str = rows[0]["ddl"]
   logger.info(f"Got response: {ddl}")
+  return ddl
 
-  _write_to_file(path=output_path, ddl=ddl)
+
+def execute_batch_fetch_bigquery_table_ddl(
+    sql_filepath: str,
+    output_paths: Dict[str, str],
+    bigquery_client: bigquery.Client,
+) -> Dict[str, str]:
+  logger.debug(
+      f"Executing batch fetch BigQuery table DDL. Filepath: {sql_filepath}"
+  )
+
+  sql = read(filepath=sql_filepath)
+  table_names = sorted(output_paths)
+  job_config = QueryJobConfig(
+      query_parameters=[
+          ArrayQueryParameter(TABLE_NAMES_PARAMETER, "STRING", table_names)
+      ]
+  )
+
+  logger.info(f"Running SQL query for {len(table_names)} tables: {sql}")
+  rows = execute_query(
+      sql, bigquery_client=bigquery_client, job_config=job_config
+  )
+
+  ddls: Dict[str, str] = {row["table_name"]: row["ddl"] for row in rows}
+  for table_name, ddl in ddls.items():
+    _write_to_file(path=output_paths[table_name], ddl=ddl)
+
+  missing_tables = set(table_names) - set(ddls)
+  if missing_tables:
+    logger.warning(
+        f"The DDL of {len(missing_tables)} out of {len(table_names)} tables"
+        f" wasn't found: {sorted(missing_tables)}"
+    )
+
+  return ddls
 
 
 def _write_to_file(path, ddl):
@@ -13,6 +13,8 @@
 # limitations under the License.
 
 import logging
+from common.api_method import ApiMethod
+from common.retry_policy import call_hedged_with_retry
 from google.api_core.exceptions import NotFound
 from google.cloud import bigquery
 from google.cloud.bigquery.table import Table
@@ -26,7 +28,12 @@ def execute_get_bigquery_table(
   logger.debug(f"Executing get table for {bigquery_table_name}")
 
   try:
-    table: Table = bigquery_client.get_table(bigquery_table_name)
+    table: Table = call_hedged_with_retry(
+        ApiMethod.GET_TABLE,
+        lambda timeout: bigquery_client.get_table(
+            bigquery_table_name, retry=None, timeout=timeout
+        ),
+    )
   except NotFound:
     table = None
 
@@ -15,7 +15,9 @@
 import json
 import logging
 import sys
+from common.api_method import ApiMethod
 from common.monitoring_consts import USER_AGENT
+from common.retry_policy import call_hedged_with_retry
 from google.api_core.exceptions import NotFound
 from google.api_core.gapic_v1.client_info import ClientInfo
 from google.cloud import datastream_v1
@@ -54,7 +56,12 @@ def execute_get_stream(
   request = datastream_v1.GetStreamRequest(name=fully_qualified_stream_id)
 
   try:
-    stream: Stream = client.get_stream(request=request)
+    stream: Stream = call_hedged_with_retry(
+        ApiMethod.GET_STREAM,
+        lambda timeout: client.get_stream(
+            request=request, retry=None, timeout=timeout
+        ),
+    )
   except NotFound:
     logger.error(
         f"ERROR: Stream '{stream_id}' not found. Make sure the stream exists"
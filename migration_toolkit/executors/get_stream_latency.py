@@ -0,0 +1,81 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import time
+from typing import Optional
+from common.monitoring_consts import USER_AGENT
+from google.api_core.gapic_v1.client_info import ClientInfo
+
+# Cloud Monitoring is only used to shorten the wait for in-flight events, it
+# isn't required by the toolkit.
+try:
+  from google.cloud import monitoring_v3
+except ImportError:
+  monitoring_v3 = None
+
+logger = logging.getLogger(__name__)
+
+TOTAL_LATENCIES_METRIC_TYPE = "datastream.googleapis.com/stream/total_latencies"
+LOOKBACK_SECONDS = 600
+ALIGNMENT_PERIOD_SECONDS = 300
+
+
+# Returns the latest 99th percentile of the stream's total latency in seconds,
+# or None if Cloud Monitoring isn't installed or has no recent data.
+def execute_get_stream_total_latency(
+    project_id: str, datastream_region: str, stream_id: str
+) -> Optional[float]:
+  if monitoring_v3 is None:
+    logger.debug(
+        "google-cloud-monitoring isn't installed, can't read the latency of"
+        f" stream '{stream_id}'."
+    )
+    return None
+
+  logger.debug(f"Reading the total latency of stream '{stream_id}'..")
+  client = monitoring_v3.MetricServiceClient(
+      client_info=ClientInfo(user_agent=USER_AGENT)
+  )
+  now = int(time.time())
+  time_series = client.list_time_series(
+      request={
+          "name": f"projects/{project_id}",
+          "filter": (
+              f'metric.type = "{TOTAL_LATENCIES_METRIC_TYPE}" AND'
+              f' resource.labels.location = "{datastream_region}" AND'
+              f' resource.labels.stream_id = "{stream_id}"'
+          ),
+          "interval": monitoring_v3.TimeInterval(
+              end_time={"seconds": now},
+              start_time={"seconds": now - LOOKBACK_SECONDS},
+          ),
+          "aggregation": monitoring_v3.Aggregation(
+              alignment_period={"seconds": ALIGNMENT_PERIOD_SECONDS},
+              per_series_aligner=monitoring_v3.Aggregation.Aligner.ALIGN_PERCENTILE_99,
+              cross_series_reducer=monitoring_v3.Aggregation.Reducer.REDUCE_MAX,
+          ),
+          "view": monitoring_v3.ListTimeSeriesRequest.TimeSeriesView.FULL,
+      }
+  )
+
+  # Points are returned newest first.
+  latencies = [
+      series.points[0].value.double_value
+      for series in time_series
+      if series.points
+  ]
+  latency = max(latencies) if latencies else None
+  logger.debug(f"Done. Total latency of stream '{stream_id}': {latency}")
+  return latency
@@ -0,0 +1,47 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from typing import Optional, Set
+from common.api_method import ApiMethod
+from common.retry_policy import call_with_retry
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery
+
+logger = logging.getLogger(__name__)
+
+
+# Returns the names of the dataset's tables, or None if the dataset doesn't
+# exist.
+def execute_list_bigquery_tables(
+    dataset_id: str, bigquery_client: bigquery.Client
+) -> Optional[Set[str]]:
+  logger.debug(f"Executing list tables for {dataset_id}")
+
+  try:
+    table_names: Optional[Set[str]] = call_with_retry(
+        ApiMethod.LIST_TABLES,
+        lambda timeout: {
+            table.table_id
+            for table in bigquery_client.list_tables(
+                dataset_id, retry=None, timeout=timeout
+            )
+        },
+    )
+  except NotFound:
+    table_names = None
+
+  logger.debug(f"Done. Found {len(table_names or [])} tables in {dataset_id}")
+
+  return table_names
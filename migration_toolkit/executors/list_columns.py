@@ -0,0 +1,61 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from typing import Dict, List, NamedTuple
+from executors.query import execute_query
+from google.cloud import bigquery
+from google.cloud.bigquery import ArrayQueryParameter, QueryJobConfig
+
+logger = logging.getLogger(__name__)
+
+LIST_COLUMNS_SQL = (
+    "SELECT table_name, column_name, data_type\n"
+    "FROM `{project_id}.{dataset}`.INFORMATION_SCHEMA.COLUMNS\n"
+    "WHERE table_name IN UNNEST(@table_names)\n"
+    "ORDER BY table_name, ordinal_position;"
+)
+
+
+class ColumnInfo(NamedTuple):
+  name: str
+  data_type: str
+
+
+# Returns the columns of each of the dataset's tables, in their order, by table
+# name, with a single query. Tables that don't exist aren't returned.
+def execute_list_columns(
+    project_id: str,
+    dataset: str,
+    table_names: List[str],
+    bigquery_client: bigquery.Client,
+) -> Dict[str, List[ColumnInfo]]:
+  sql = LIST_COLUMNS_SQL.format(project_id=project_id, dataset=dataset)
+  logger.debug(f"Running SQL query for {len(table_names)} tables:\n{sql}")
+  rows = execute_query(
+      sql,
+      bigquery_client=bigquery_client,
+      job_config=QueryJobConfig(
+          query_parameters=[
+              ArrayQueryParameter("table_names", "STRING", sorted(table_names))
+          ]
+      ),
+  )
+
+  columns: Dict[str, List[ColumnInfo]] = {}
+  for row in rows:
+    columns.setdefault(row["table_name"], []).append(
+        ColumnInfo(name=row["column_name"], data_type=row["data_type"])
+    )
+  return columns
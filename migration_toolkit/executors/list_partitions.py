@@ -0,0 +1,39 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from typing import Dict
+from executors.query import execute_query
+from google.cloud import bigquery
+
+logger = logging.getLogger(__name__)
+
+LIST_PARTITIONS_SQL = (
+    "SELECT partition_id, total_rows\n"
+    "FROM `{project_id}.{dataset}`.INFORMATION_SCHEMA.PARTITIONS\n"
+    "WHERE table_name = '{table}';"
+)
+
+
+# Returns the number of rows of each partition of the table, by partition ID.
+def execute_list_partitions(
+    table_id: str, bigquery_client: bigquery.Client
+) -> Dict[str, int]:
+  project_id, dataset, table = table_id.split(".")
+  sql = LIST_PARTITIONS_SQL.format(
+      project_id=project_id, dataset=dataset, table=table
+  )
+  logger.debug(f"Running SQL query:\n{sql}")
+  rows = execute_query(sql, bigquery_client=bigquery_client)
+  return {row["partition_id"]: row["total_rows"] or 0 for row in rows}
@@ -0,0 +1,132 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from typing import Any, Callable, List, Optional, Union
+import uuid
+from common.api_method import ApiMethod
+from common.retry_policy import call_with_retry, is_transient_error
+from google.api_core.exceptions import Conflict
+from google.cloud import bigquery
+from google.cloud.bigquery.job import ExtractJob, LoadJob, QueryJob, QueryJobConfig
+from google.cloud.bigquery.table import Row
+
+logger = logging.getLogger(__name__)
+
+JOB_ID_PREFIX = "datastream_migration_"
+MAX_JOB_ATTEMPTS = 3
+
+Job = Union[QueryJob, ExtractJob, LoadJob]
+
+# Called with every job that finished successfully, for collecting their
+# statistics.
+_job_listener: Optional[Callable[[Job], None]] = None
+
+
+def set_job_listener(listener: Optional[Callable[[Job], None]]):
+  global _job_listener
+  _job_listener = listener
+
+
+# Runs a query job and waits for its result.
+def execute_query(
+    sql: str,
+    bigquery_client: bigquery.Client,
+    job_config: Optional[QueryJobConfig] = None,
+) -> List[Row]:
+  return [
+      row
+      for row in execute_job(
+          lambda job_id, timeout: bigquery_client.query(
+              sql,
+              job_config=job_config,
+              job_id=job_id,
+              retry=None,
+              job_retry=None,
+              timeout=timeout,
+          ),
+          bigquery_client=bigquery_client,
+      )
+  ]
+
+
+# Runs a job and waits for its result. `insert` starts the job under the given
+# job ID. Every submission uses a job ID generated up front, so a jobs.insert
+# request that failed ambiguously can be retried safely: if the job was in
+# fact created, the existing job is used instead of starting a second one. A
+# job that failed with a transient error had no effect, so it is resubmitted
+# under a new job ID.
+def execute_job(
+    insert: Callable[[str, float], Job],
+    bigquery_client: bigquery.Client,
+) -> Any:
+  for attempt in range(1, MAX_JOB_ATTEMPTS + 1):
+    job = _insert_job(insert=insert, bigquery_client=bigquery_client)
+    try:
+      result = _get_job_result(job)
+    except Exception as ex:
+      if (
+          not is_transient_error(ex)
+          or not _job_failed(job)
+          or attempt == MAX_JOB_ATTEMPTS
+      ):
+        raise
+      logger.warning(
+          f"Job {job.job_id} failed with a transient error, resubmitting"
+          f" it (attempt {attempt}): {ex!r}"
+      )
+      continue
+
+    if _job_listener:
+      _job_listener(job)
+    return result
+
+
+# Waiting for a job or fetching its result can fail with a transient error
+# although the job itself succeeded, or is still running. Only the result is
+# fetched again then: resubmitting the job would run it, and for example copy
+# its rows, twice.
+def _get_job_result(job: Job) -> Any:
+  return call_with_retry(
+      ApiMethod.GET_JOB,
+      lambda timeout: job.result(),
+      is_retryable=lambda ex: is_transient_error(ex) and not _job_failed(job),
+  )
+
+
+# Whether the job itself failed, as opposed to the requests that wait for it.
+def _job_failed(job: Job) -> bool:
+  return job.state == "DONE" and job.error_result is not None
+
+
+def _insert_job(
+    insert: Callable[[str, float], Job],
+    bigquery_client: bigquery.Client,
+) -> Job:
+  job_id = f"{JOB_ID_PREFIX}{uuid.uuid4().hex}"
+
+  def insert_once(timeout: float) -> Job:
+    try:
+      return insert(job_id, timeout)
+    except Conflict:
+      logger.debug(f"Job {job_id} already exists, using the existing job.")
+      # Jobs are inserted in the client's location, jobs.get doesn't find
+      # jobs outside of the US and EU multi-regions without it.
+      return bigquery_client.get_job(
+          job_id, location=bigquery_client.location, timeout=timeout
+      )
+
+  job: Job = call_with_retry(ApiMethod.INSERT_JOB, insert_once)
+  logger.debug(f"Inserted job {job.job_id}")
+  return job
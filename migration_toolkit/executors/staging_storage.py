@@ -0,0 +1,123 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from abc import ABC, abstractmethod
+import glob
+import logging
+import os
+import shutil
+from typing import List
+from common.monitoring_consts import USER_AGENT
+from google.api_core.gapic_v1.client_info import ClientInfo
+
+# Cloud Storage is only used by the extract and load copy method, it isn't
+# required by the toolkit.
+try:
+  from google.cloud import storage
+except ImportError:
+  storage = None
+
+logger = logging.getLogger(__name__)
+
+GCS_SCHEME = "gs://"
+
+
+# Where the rows of a table are staged between the extract and load jobs.
+# Files are grouped by a directory-like prefix, which is listed once the
+# extract job finished and deleted once the rows were loaded.
+class StagingStorage(ABC):
+
+  # Returns the URI of a file, or of a wildcard pattern, under the staging
+  # location.
+  @abstractmethod
+  def get_uri(self, path: str) -> str:
+    pass
+
+  @abstractmethod
+  def list_uris(self, prefix: str) -> List[str]:
+    pass
+
+  @abstractmethod
+  def delete(self, prefix: str):
+    pass
+
+
+def get_staging_storage(staging_uri: str) -> StagingStorage:
+  if staging_uri.startswith(GCS_SCHEME):
+    return GcsStagingStorage(staging_uri)
+  return LocalStagingStorage(staging_uri)
+
+
+# Stages files in a Cloud Storage bucket, which BigQuery extract and load jobs
+# read and write directly.
+class GcsStagingStorage(StagingStorage):
+
+  def __init__(self, staging_uri: str):
+    if storage is None:
+      raise ValueError(
+          "Staging files in Cloud Storage requires `google-cloud-storage`."
+      )
+    bucket_name, _, path = staging_uri[len(GCS_SCHEME) :].partition("/")
+    self.bucket_name: str = bucket_name
+    self.path: str = path.strip("/")
+    self.client = storage.Client(client_info=ClientInfo(user_agent=USER_AGENT))
+
+  def get_uri(self, path: str) -> str:
+    return f"{GCS_SCHEME}{self.bucket_name}/{self._get_blob_name(path)}"
+
+  def list_uris(self, prefix: str) -> List[str]:
+    return [
+        f"{GCS_SCHEME}{self.bucket_name}/{blob.name}"
+        for blob in self._list_blobs(prefix)
+    ]
+
+  def delete(self, prefix: str):
+    blobs = list(self._list_blobs(prefix))
+    # Deletes are sent in batches of up to 100 requests.
+    for start in range(0, len(blobs), 100):
+      with self.client.batch():
+        for blob in blobs[start : start + 100]:
+          blob.delete()
+    logger.debug(f"Deleted {len(blobs)} staged files under {prefix}.")
+
+  def _list_blobs(self, prefix: str):
+    return self.client.list_blobs(
+        self.bucket_name, prefix=self._get_blob_name(prefix)
+    )
+
+  def _get_blob_name(self, path: str) -> str:
+    return f"{self.path}/{path}" if self.path else path
+
+
+# Stages files in a local directory. BigQuery can't read or write it, it stands
+# in for a bucket when the jobs are run by a local fake of BigQuery.
+class LocalStagingStorage(StagingStorage):
+
+  def __init__(self, directory: str):
+    self.directory: str = directory
+
+  def get_uri(self, path: str) -> str:
+    return os.path.join(self.directory, path)
+
+  def list_uris(self, prefix: str) -> List[str]:
+    return sorted(
+        uri
+        for uri in glob.glob(
+            os.path.join(self.directory, prefix, "**"), recursive=True
+        )
+        if os.path.isfile(uri)
+    )
+
+  def delete(self, prefix: str):
+    shutil.rmtree(os.path.join(self.directory, prefix), ignore_errors=True)
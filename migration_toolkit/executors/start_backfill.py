@@ -0,0 +1,103 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import sys
+from common.api_method import ApiMethod
+from common.monitoring_consts import USER_AGENT
+from common.retry_policy import call_with_retry
+from common.source_type import SourceType
+from google.api_core.exceptions import FailedPrecondition, NotFound
+from google.api_core.gapic_v1.client_info import ClientInfo
+from google.cloud import datastream_v1
+
+logger = logging.getLogger(__name__)
+
+
+# Starts a Datastream backfill of the source table, instead of copying its rows
+# from the existing BigQuery table. The backfill runs once the stream is
+# running.
+def execute_start_backfill(
+    stream_name: str,
+    source_type: SourceType,
+    source_schema_name: str,
+    source_table_name: str,
+    datastream_api_endpoint_override: str,
+):
+  client_options = (
+      {"api_endpoint": datastream_api_endpoint_override}
+      if datastream_api_endpoint_override
+      else {}
+  )
+  client = datastream_v1.DatastreamClient(
+      client_options=client_options,
+      client_info=ClientInfo(user_agent=USER_AGENT),
+  )
+
+  object_name = f"{source_schema_name}.{source_table_name}"
+  try:
+    stream_object = call_with_retry(
+        ApiMethod.LOOKUP_STREAM_OBJECT,
+        lambda timeout: client.lookup_stream_object(
+            request=datastream_v1.LookupStreamObjectRequest(
+                parent=stream_name,
+                source_object_identifier=_build_source_object_identifier(
+                    source_type=source_type,
+                    source_schema_name=source_schema_name,
+                    source_table_name=source_table_name,
+                ),
+            ),
+            retry=None,
+            timeout=timeout,
+        ),
+    )
+  except NotFound:
+    logger.error(
+        f"ERROR: Table {object_name} isn't an object of stream '{stream_name}'."
+        " Make sure the stream includes the table and rerun the migration."
+    )
+    sys.exit(1)
+
+  logger.info(f"Starting a backfill of {object_name}..")
+  try:
+    # A retried request could start a second backfill, it's sent only once.
+    call_with_retry(
+        ApiMethod.START_BACKFILL_JOB,
+        lambda timeout: client.start_backfill_job(
+            object_=stream_object.name, retry=None, timeout=timeout
+        ),
+        idempotent=False,
+    )
+  except FailedPrecondition as ex:
+    logger.error(
+        f"ERROR: Backfill of {object_name} wasn't started: {ex.message}. Make"
+        " sure no backfill of the table is running and rerun the migration."
+    )
+    sys.exit(1)
+
+
+def _build_source_object_identifier(
+    source_type: SourceType, source_schema_name: str, source_table_name: str
+) -> datastream_v1.SourceObjectIdentifier:
+  if source_type == SourceType.MYSQL:
+    return datastream_v1.SourceObjectIdentifier(
+        mysql_identifier=datastream_v1.SourceObjectIdentifier.MysqlObjectIdentifier(
+            database=source_schema_name, table=source_table_name
+        )
+    )
+  return datastream_v1.SourceObjectIdentifier(
+      oracle_identifier=datastream_v1.SourceObjectIdentifier.OracleObjectIdentifier(
+          schema=source_schema_name, table=source_table_name
+      )
+  )
@@ -0,0 +1,203 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from typing import Callable, Dict, List
+from common.bigquery_type import BigQueryType
+from sql_generators.copy_rows.copy_rows import ColumnCast, ColumnSchema
+
+# Arrow is only needed by the storage copy engine, it isn't required by the
+# toolkit.
+try:
+  import numpy
+  import pyarrow
+  import pyarrow.compute
+except ImportError:
+  numpy = None
+  pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+MICROSECONDS_PER_HOUR = 3600000000
+MICROSECONDS_PER_SECOND = 1000000
+NANOSECONDS_PER_SECOND = 1000000000
+NUMERIC_PRECISION = 38
+NUMERIC_SCALE = 9
+# BigQuery rounds halfway values away from zero when casting decimals.
+_ROUND_HALF_AWAY_FROM_ZERO = "half_towards_infinity"
+# Trailing zeros of the fraction, and the decimal point of whole numbers.
+_TRAILING_ZEROS_PATTERN = r"\.0+$|(\.\d*[1-9])0+$"
+
+
+def _bytes_to_string(array: "pyarrow.Array") -> "pyarrow.Array":
+  strings = array.view(pyarrow.string())
+  try:
+    strings.validate(full=True)
+    return strings
+  except pyarrow.ArrowInvalid:
+    # Like SAFE_CONVERT_BYTES_TO_STRING, invalid UTF-8 characters are replaced
+    # by the Unicode replacement character. Arrow has no kernel for it, so only
+    # batches with invalid values are decoded value by value.
+    logger.debug("Replacing invalid UTF-8 characters in a batch of BYTES.")
+    return pyarrow.array(
+        [
+            value.decode("utf-8", errors="replace")
+            if value is not None
+            else None
+            for value in array.to_pylist()
+        ],
+        type=pyarrow.string(),
+    )
+
+
+def _timestamp_to_datetime(array: "pyarrow.Array") -> "pyarrow.Array":
+  # Timestamps are read in UTC, which is the time zone CAST uses by default.
+  return pyarrow.compute.cast(array, pyarrow.timestamp("us"))
+
+
+def _bignumeric_to_numeric(array: "pyarrow.Array") -> "pyarrow.Array":
+  return pyarrow.compute.cast(
+      pyarrow.compute.round(
+          array, ndigits=NUMERIC_SCALE, round_mode=_ROUND_HALF_AWAY_FROM_ZERO
+      ),
+      pyarrow.decimal128(NUMERIC_PRECISION, NUMERIC_SCALE),
+  )
+
+
+def _bignumeric_to_string(array: "pyarrow.Array") -> "pyarrow.Array":
+  # Arrow keeps all the digits of the decimal's scale, CAST doesn't.
+  return pyarrow.compute.replace_substring_regex(
+      pyarrow.compute.cast(array, pyarrow.string()),
+      pattern=_TRAILING_ZEROS_PATTERN,
+      replacement=r"\1",
+  )
+
+
+def _bignumeric_to_int64(array: "pyarrow.Array") -> "pyarrow.Array":
+  return pyarrow.compute.cast(
+      pyarrow.compute.round(
+          array, ndigits=0, round_mode=_ROUND_HALF_AWAY_FROM_ZERO
+      ),
+      pyarrow.int64(),
+  )
+
+
+# Dataflow wrote MySQL TIME values as the number of microseconds. Like the
+# MAKE_INTERVAL expression, the fraction of the second is dropped, and the
+# division truncates towards zero.
+def _string_to_interval(array: "pyarrow.Array") -> "pyarrow.Array":
+  compute = pyarrow.compute
+  microseconds = compute.cast(array, pyarrow.int64())
+  hours = compute.divide(microseconds, MICROSECONDS_PER_HOUR)
+  seconds = compute.divide(
+      compute.subtract(
+          microseconds, compute.multiply(hours, MICROSECONDS_PER_HOUR)
+      ),
+      MICROSECONDS_PER_SECOND,
+  )
+  nanoseconds = compute.multiply(
+      compute.add(compute.multiply(hours, 3600), seconds),
+      NANOSECONDS_PER_SECOND,
+  )
+  # Each interval is 32 bit months and days, which are always zero, followed
+  # by 64 bit nanoseconds.
+  values = numpy.zeros(2 * len(nanoseconds), dtype=numpy.int64)
+  values[1::2] = nanoseconds.fill_null(0).to_numpy()
+  return pyarrow.Array.from_buffers(
+      pyarrow.month_day_nano_interval(),
+      len(nanoseconds),
+      [nanoseconds.buffers()[0], pyarrow.py_buffer(values)],
+      null_count=nanoseconds.null_count,
+  )
+
+
+def _string_to_int64(array: "pyarrow.Array") -> "pyarrow.Array":
+  return pyarrow.compute.cast(array, pyarrow.int64())
+
+
+# JSON columns are written as strings, and parsed by BigQuery like PARSE_JSON.
+def _string_to_json(array: "pyarrow.Array") -> "pyarrow.Array":
+  return array
+
+
+# The Arrow equivalents of `COLUMN_SCHEMAS_TO_CAST_EXPRESSION`, for converting
+# rows outside of BigQuery. Each cast converts a whole column of a record batch.
+COLUMN_SCHEMAS_TO_ARROW_CAST: Dict[
+    ColumnSchema, Callable[["pyarrow.Array"], "pyarrow.Array"]
+] = {
+    ColumnSchema(BigQueryType.BYTES, BigQueryType.STRING): _bytes_to_string,
+    ColumnSchema(
+        BigQueryType.TIMESTAMP, BigQueryType.DATETIME
+    ): _timestamp_to_datetime,
+    ColumnSchema(
+        BigQueryType.BIGNUMERIC, BigQueryType.NUMERIC
+    ): _bignumeric_to_numeric,
+    ColumnSchema(
+        BigQueryType.BIGNUMERIC, BigQueryType.STRING
+    ): _bignumeric_to_string,
+    ColumnSchema(
+        BigQueryType.STRING, BigQueryType.INTERVAL
+    ): _string_to_interval,
+    ColumnSchema(BigQueryType.STRING, BigQueryType.INT64): _string_to_int64,
+    ColumnSchema(BigQueryType.STRING, BigQueryType.JSON): _string_to_json,
+    ColumnSchema(
+        BigQueryType.BIGNUMERIC, BigQueryType.INT64
+    ): _bignumeric_to_int64,
+}
+
+
+# Converts record batches of the source table to the destination's columns.
+# The columns are converted with Arrow compute kernels, without creating a
+# Python object per row.
+class RecordBatchConverter:
+
+  def __init__(self, column_casts: List[ColumnCast]):
+    self.column_casts: List[ColumnCast] = column_casts
+    for column_cast in column_casts:
+      column_schema = column_cast.column_schema
+      if (
+          column_schema.source != column_schema.destination
+          and column_schema not in COLUMN_SCHEMAS_TO_ARROW_CAST
+      ):
+        raise ValueError(
+            f"Can't convert column '{column_cast.source_column}' from"
+            f" {column_schema.source} to {column_schema.destination}."
+        )
+
+  def get_source_columns(self) -> List[str]:
+    return [column_cast.source_column for column_cast in self.column_casts]
+
+  def convert(self, batch: "pyarrow.RecordBatch") -> "pyarrow.RecordBatch":
+    arrays = []
+    for column_cast in self.column_casts:
+      array = batch.column(column_cast.source_column)
+      column_schema = column_cast.column_schema
+      if column_schema.source != column_schema.destination:
+        array = COLUMN_SCHEMAS_TO_ARROW_CAST[column_schema](array)
+      arrays.append(array)
+    return pyarrow.RecordBatch.from_arrays(
+        arrays,
+        names=[
+            column_cast.destination_column for column_cast in self.column_casts
+        ],
+    )
+
+  # The schema of the converted batches, which the destination is opened with
+  # before the first batch is read.
+  def get_destination_schema(
+      self, source_schema: "pyarrow.Schema"
+  ) -> "pyarrow.Schema":
+    return self.convert(
+        pyarrow.RecordBatch.from_pylist([], schema=source_schema)
+    ).schema
@@ -0,0 +1,183 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+import logging
+from typing import List, Optional
+from common.api_method import ApiMethod
+from common.monitoring_consts import USER_AGENT
+from common.retry_policy import call_with_retry
+from executors.storage_copy.row_source import get_table_path
+from google.api_core.gapic_v1.client_info import ClientInfo
+
+# The Storage Write API and Arrow are only needed by the storage copy engine,
+# they aren't required by the toolkit.
+try:
+  from google.cloud import bigquery_storage_v1
+  from google.cloud.bigquery_storage_v1 import writer
+  import pyarrow
+except ImportError:
+  bigquery_storage_v1 = None
+  writer = None
+  pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+
+# One of the streams that the storage copy engine writes concurrently. Appends
+# return a future, so that several of them can be in flight.
+class RowSinkStream(ABC):
+
+  @abstractmethod
+  def append(self, batch: "pyarrow.RecordBatch") -> Future:
+    pass
+
+  # Called once all the appends completed. Returns the number of rows written
+  # to the stream.
+  @abstractmethod
+  def finish(self) -> int:
+    pass
+
+
+# Where the storage copy engine writes rows to. Rows of all the streams become
+# visible together, once the streams are committed.
+class RowSink(ABC):
+
+  @abstractmethod
+  def open_stream(self, schema: "pyarrow.Schema") -> RowSinkStream:
+    pass
+
+  @abstractmethod
+  def commit(self, streams: List[RowSinkStream]):
+    pass
+
+
+# Arrow rows were added to the Storage Write API after the version of the
+# client that the toolkit's dependencies are pinned to.
+def storage_write_supports_arrow() -> bool:
+  return bigquery_storage_v1 is not None and hasattr(
+      bigquery_storage_v1.types.AppendRowsRequest, "ArrowData"
+  )
+
+
+# A pending stream of the Storage Write API. Each append is sent with its
+# offset, so an append that is retried after a transient error isn't written
+# twice.
+class BigQueryWriteStream(RowSinkStream):
+
+  def __init__(
+      self,
+      client: "bigquery_storage_v1.BigQueryWriteClient",
+      table_path: str,
+      schema: "pyarrow.Schema",
+  ):
+    types = bigquery_storage_v1.types
+    self.client = client
+    self.name: str = call_with_retry(
+        ApiMethod.CREATE_WRITE_STREAM,
+        lambda timeout: client.create_write_stream(
+            parent=table_path,
+            write_stream=types.WriteStream(
+                type_=types.WriteStream.Type.PENDING
+            ),
+            retry=None,
+            timeout=timeout,
+        ),
+    ).name
+    self._append_rows_stream = writer.AppendRowsStream(
+        client,
+        types.AppendRowsRequest(
+            write_stream=self.name,
+            arrow_rows=types.AppendRowsRequest.ArrowData(
+                writer_schema=types.ArrowSchema(
+                    serialized_schema=schema.serialize().to_pybytes()
+                )
+            ),
+        ),
+    )
+    self._offset: int = 0
+
+  def append(self, batch: "pyarrow.RecordBatch") -> Future:
+    types = bigquery_storage_v1.types
+    future = self._append_rows_stream.send(
+        types.AppendRowsRequest(
+            offset=self._offset,
+            arrow_rows=types.AppendRowsRequest.ArrowData(
+                rows=types.ArrowRecordBatch(
+                    serialized_record_batch=batch.serialize().to_pybytes(),
+                    row_count=batch.num_rows,
+                )
+            ),
+        )
+    )
+    self._offset += batch.num_rows
+    return future
+
+  def finish(self) -> int:
+    self._append_rows_stream.close()
+    row_count = call_with_retry(
+        ApiMethod.FINALIZE_WRITE_STREAM,
+        lambda timeout: self.client.finalize_write_stream(
+            name=self.name, retry=None, timeout=timeout
+        ),
+    ).row_count
+    if row_count != self._offset:
+      raise RuntimeError(
+          f"Write stream {self.name} has {row_count} rows, but"
+          f" {self._offset} rows were appended to it."
+      )
+    return row_count
+
+
+# Writes to a BigQuery table with the Storage Write API, which can be in
+# another region than the source table. Rows are written to pending streams,
+# so nothing is visible in the table until all the streams are committed, and
+# a failed copy leaves the table empty.
+class BigQueryWriteSink(RowSink):
+
+  def __init__(
+      self,
+      table_id: str,
+      client: Optional["bigquery_storage_v1.BigQueryWriteClient"] = None,
+  ):
+    self.table_id: str = table_id
+    self.table_path: str = get_table_path(table_id)
+    self.client = client or bigquery_storage_v1.BigQueryWriteClient(
+        client_info=ClientInfo(user_agent=USER_AGENT)
+    )
+
+  def open_stream(self, schema: "pyarrow.Schema") -> BigQueryWriteStream:
+    return BigQueryWriteStream(
+        self.client, table_path=self.table_path, schema=schema
+    )
+
+  def commit(self, streams: List[BigQueryWriteStream]):
+    response = call_with_retry(
+        ApiMethod.COMMIT_WRITE_STREAMS,
+        lambda timeout: self.client.batch_commit_write_streams(
+            parent=self.table_path,
+            write_streams=[stream.name for stream in streams],
+            retry=None,
+            timeout=timeout,
+        ),
+    )
+    if response.stream_errors:
+      raise RuntimeError(
+          f"Failed to commit the rows written to table {self.table_id}:"
+          f" {[error.error_message for error in response.stream_errors]}"
+      )
+    logger.info(
+        f"Committed {len(streams)} write streams to table {self.table_id}."
+    )
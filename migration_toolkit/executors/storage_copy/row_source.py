@@ -0,0 +1,129 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from abc import ABC, abstractmethod
+import logging
+from typing import Iterator, List, Optional
+from common.api_method import ApiMethod
+from common.monitoring_consts import USER_AGENT
+from common.retry_policy import call_with_retry
+from google.api_core.gapic_v1.client_info import ClientInfo
+
+# The Storage Read API and Arrow are only needed by the storage copy engine,
+# they aren't required by the toolkit.
+try:
+  from google.cloud import bigquery_storage_v1
+  import pyarrow
+except ImportError:
+  bigquery_storage_v1 = None
+  pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+
+# Where the storage copy engine reads rows from. The rows are split into
+# streams that are read concurrently, each as a sequence of record batches.
+class RowSource(ABC):
+
+  @abstractmethod
+  def get_schema(self) -> "pyarrow.Schema":
+    pass
+
+  @abstractmethod
+  def get_streams(self) -> List[str]:
+    pass
+
+  @abstractmethod
+  def read_batches(self, stream: str) -> Iterator["pyarrow.RecordBatch"]:
+    pass
+
+
+def get_table_path(table_id: str) -> str:
+  project_id, dataset_id, table_name = table_id.split(".")
+  return f"projects/{project_id}/datasets/{dataset_id}/tables/{table_name}"
+
+
+# Reads a BigQuery table with the Storage Read API. The table's region doesn't
+# need to match the destination's. Batches are compressed, since the rows may
+# be sent across regions.
+class BigQueryReadSource(RowSource):
+
+  def __init__(
+      self,
+      project_id: str,
+      table_id: str,
+      selected_fields: List[str],
+      max_stream_count: int,
+      client: Optional["bigquery_storage_v1.BigQueryReadClient"] = None,
+  ):
+    self.project_id: str = project_id
+    self.table_id: str = table_id
+    self.selected_fields: List[str] = selected_fields
+    self.max_stream_count: int = max_stream_count
+    self.client = client or bigquery_storage_v1.BigQueryReadClient(
+        client_info=ClientInfo(user_agent=USER_AGENT)
+    )
+    self._session: Optional["bigquery_storage_v1.types.ReadSession"] = None
+    self._schema: Optional["pyarrow.Schema"] = None
+
+  def get_schema(self) -> "pyarrow.Schema":
+    if self._schema is None:
+      self._schema = pyarrow.ipc.read_schema(
+          pyarrow.py_buffer(self._get_session().arrow_schema.serialized_schema)
+      )
+    return self._schema
+
+  def get_streams(self) -> List[str]:
+    return [stream.name for stream in self._get_session().streams]
+
+  # The client resumes the stream from the last row it read after transient
+  # errors.
+  def read_batches(self, stream: str) -> Iterator["pyarrow.RecordBatch"]:
+    schema = self.get_schema()
+    for response in self.client.read_rows(stream):
+      yield pyarrow.ipc.read_record_batch(
+          pyarrow.py_buffer(
+              response.arrow_record_batch.serialized_record_batch
+          ),
+          schema,
+      )
+
+  def _get_session(self) -> "bigquery_storage_v1.types.ReadSession":
+    if self._session is None:
+      types = bigquery_storage_v1.types
+      read_session = types.ReadSession(
+          table=get_table_path(self.table_id),
+          data_format=types.DataFormat.ARROW,
+          read_options=types.ReadSession.TableReadOptions(
+              selected_fields=self.selected_fields,
+              arrow_serialization_options=types.ArrowSerializationOptions(
+                  buffer_compression=types.ArrowSerializationOptions.CompressionCodec.LZ4_FRAME
+              ),
+          ),
+      )
+      self._session = call_with_retry(
+          ApiMethod.CREATE_READ_SESSION,
+          lambda timeout: self.client.create_read_session(
+              parent=f"projects/{self.project_id}",
+              read_session=read_session,
+              max_stream_count=self.max_stream_count,
+              retry=None,
+              timeout=timeout,
+          ),
+      )
+      logger.info(
+          f"Reading table {self.table_id} with"
+          f" {len(self._session.streams)} streams."
+      )
+    return self._session
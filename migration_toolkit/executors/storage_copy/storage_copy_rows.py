@@ -0,0 +1,207 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+from concurrent.futures import Future, ThreadPoolExecutor
+import logging
+import queue
+import sys
+import threading
+from typing import Deque, Iterator, List, Optional, Tuple
+from common.defaults import DEFAULT_READ_STREAM_COUNT, DEFAULT_WRITE_STREAM_COUNT
+from executors.storage_copy import arrow_casts
+from executors.storage_copy.arrow_casts import RecordBatchConverter
+from executors.storage_copy.row_sink import BigQueryWriteSink, RowSink, RowSinkStream, storage_write_supports_arrow
+from executors.storage_copy.row_source import BigQueryReadSource, RowSource
+from sql_generators.copy_rows.copy_rows import ColumnCast
+
+logger = logging.getLogger(__name__)
+
+# Bounds the memory used by a copy: each write stream has at most this many
+# converted batches waiting for it, and this many appends in flight.
+MAX_QUEUED_BATCHES_PER_WRITE_STREAM = 2
+MAX_APPENDS_IN_FLIGHT = 4
+# Append requests are limited to 10 MB, larger batches are split.
+MAX_APPEND_BYTES = 8 * 1024 * 1024
+_QUEUE_POLL_SECONDS = 1
+
+
+# Exits if the storage copy engine's optional dependencies aren't installed,
+# before anything is created.
+def verify_storage_copy_supported():
+  if arrow_casts.pyarrow is None or not storage_write_supports_arrow():
+    logger.error(
+        "ERROR: Copying rows with the Storage Read and Write APIs requires"
+        " `pyarrow`, `numpy` and a version of `google-cloud-bigquery-storage`"
+        " that writes Arrow rows. Install them and rerun the migration."
+    )
+    sys.exit(1)
+
+
+# Copies the rows of the source table to the destination table, which may be
+# in another region, without running a query. Returns the number of copied
+# rows.
+def execute_storage_copy_rows(
+    project_id: str,
+    source_table_id: str,
+    destination_table_id: str,
+    column_casts: List[ColumnCast],
+    read_stream_count: int = DEFAULT_READ_STREAM_COUNT,
+    write_stream_count: int = DEFAULT_WRITE_STREAM_COUNT,
+) -> int:
+  verify_storage_copy_supported()
+  converter = RecordBatchConverter(column_casts)
+  logger.info(
+      f"Copying rows from {source_table_id} to {destination_table_id} with the"
+      " Storage Read and Write APIs."
+  )
+  row_count = StorageCopy(
+      source=BigQueryReadSource(
+          project_id=project_id,
+          table_id=source_table_id,
+          selected_fields=converter.get_source_columns(),
+          max_stream_count=read_stream_count,
+      ),
+      sink=BigQueryWriteSink(table_id=destination_table_id),
+      converter=converter,
+      write_stream_count=write_stream_count,
+  ).run()
+  logger.info(f"Copied {row_count} rows to {destination_table_id}.")
+  return row_count
+
+
+# Streams record batches from the source to the sink. Each stream of the
+# source is read by its own thread, which converts the batches and puts them
+# on a bounded queue. The writer threads take the batches off the queue and
+# append them to their own stream of the sink, so slow writes hold back the
+# reads instead of buffering the table in memory. The sink's streams are
+# committed once all the batches were written. Any other source or sink, such
+# as a local fake, can be copied from or to.
+class StorageCopy:
+
+  def __init__(
+      self,
+      source: RowSource,
+      sink: RowSink,
+      converter: RecordBatchConverter,
+      write_stream_count: int = DEFAULT_WRITE_STREAM_COUNT,
+  ):
+    self.source: RowSource = source
+    self.sink: RowSink = sink
+    self.converter: RecordBatchConverter = converter
+    self.write_stream_count: int = write_stream_count
+
+  def run(self) -> int:
+    schema = self.converter.get_destination_schema(self.source.get_schema())
+    source_streams = self.source.get_streams()
+    batches: queue.Queue = queue.Queue(
+        maxsize=self.write_stream_count * MAX_QUEUED_BATCHES_PER_WRITE_STREAM
+    )
+    failed = threading.Event()
+
+    with ThreadPoolExecutor(
+        max_workers=len(source_streams) + self.write_stream_count,
+        thread_name_prefix="storage-copy",
+    ) as executor:
+      writers = [
+          executor.submit(self._write, schema, batches, failed)
+          for _ in range(self.write_stream_count)
+      ]
+      readers = [
+          executor.submit(self._read, source_stream, batches, failed)
+          for source_stream in source_streams
+      ]
+      try:
+        for reader in readers:
+          reader.result()
+      finally:
+        # Each writer stops at the first end marker it takes off the queue.
+        for _ in writers:
+          _put(batches, None, failed)
+      written_streams = [writer.result() for writer in writers]
+
+    if failed.is_set():
+      raise RuntimeError("Copying rows failed, no rows were committed.")
+    self.sink.commit([sink_stream for sink_stream, _ in written_streams])
+    return sum(row_count for _, row_count in written_streams)
+
+  def _read(
+      self, source_stream: str, batches: queue.Queue, failed: threading.Event
+  ):
+    try:
+      for batch in self.source.read_batches(source_stream):
+        for append_batch in _split(self.converter.convert(batch)):
+          if not _put(batches, append_batch, failed):
+            return
+    except Exception:
+      failed.set()
+      raise
+
+  def _write(
+      self,
+      schema: "arrow_casts.pyarrow.Schema",
+      batches: queue.Queue,
+      failed: threading.Event,
+  ) -> Optional[Tuple[RowSinkStream, int]]:
+    try:
+      sink_stream = self.sink.open_stream(schema)
+      appends: Deque[Future] = collections.deque()
+      while True:
+        batch = _get(batches, failed)
+        if failed.is_set():
+          return None
+        if batch is None:
+          break
+        appends.append(sink_stream.append(batch))
+        if len(appends) >= MAX_APPENDS_IN_FLIGHT:
+          appends.popleft().result()
+      for append in appends:
+        append.result()
+      return sink_stream, sink_stream.finish()
+    except Exception:
+      failed.set()
+      raise
+
+
+# Slices batches that are too large for a single append. Slices share the
+# batch's memory.
+def _split(
+    batch: "arrow_casts.pyarrow.RecordBatch",
+) -> Iterator["arrow_casts.pyarrow.RecordBatch"]:
+  if batch.nbytes <= MAX_APPEND_BYTES:
+    yield batch
+    return
+  rows_per_slice = max(1, batch.num_rows * MAX_APPEND_BYTES // batch.nbytes)
+  for offset in range(0, batch.num_rows, rows_per_slice):
+    yield batch.slice(offset, rows_per_slice)
+
+
+# Returns False if the copy failed while waiting for room on the queue.
+def _put(batches: queue.Queue, batch, failed: threading.Event) -> bool:
+  while not failed.is_set():
+    try:
+      batches.put(batch, timeout=_QUEUE_POLL_SECONDS)
+      return True
+    except queue.Full:
+      pass
+  return False
+
+
+def _get(batches: queue.Queue, failed: threading.Event):
+  while not failed.is_set():
+    try:
+      return batches.get(timeout=_QUEUE_POLL_SECONDS)
+    except queue.Empty:
+      pass
+  return None
@@ -14,11 +14,18 @@
 
 import logging
 import sys
+import threading
+from typing import List, Optional
+import uuid
+from common.api_method import ApiMethod
 from common.monitoring_consts import USER_AGENT
+from common.retry_policy import call_with_retry
 from google.api_core.exceptions import NotFound
 from google.api_core.gapic_v1.client_info import ClientInfo
+from google.api_core.operation import Operation
 from google.cloud import datastream_v1
 from google.cloud.datastream_v1.types import Stream
+from google.protobuf import field_mask_pb2
 
 logger = logging.getLogger(__name__)
 
@@ -26,7 +33,23 @@ logger = logging.getLogger(__name__)
 def execute_update_stream(
     stream: Stream,
     datastream_api_endpoint_override: str,
+    update_mask: Optional[List[str]] = None,
 ) -> Stream:
+  return start_update_stream(
+      stream=stream,
+      datastream_api_endpoint_override=datastream_api_endpoint_override,
+      update_mask=update_mask,
+  ).wait()
+
+
+# Sends the update request and returns without waiting for the long running
+# operation to finish. Only the fields in `update_mask` are updated, or the
+# whole stream if it isn't given.
+def start_update_stream(
+    stream: Stream,
+    datastream_api_endpoint_override: str,
+    update_mask: Optional[List[str]] = None,
+) -> "PendingStreamUpdate":
   client_options = (
       {"api_endpoint": datastream_api_endpoint_override}
       if datastream_api_endpoint_override
@@ -42,17 +65,54 @@ def execute_update_stream(
       client_info=ClientInfo(user_agent=USER_AGENT),
   )
 
-  request = datastream_v1.UpdateStreamRequest(stream=stream)
+  # A stable request ID makes retries of the update idempotent.
+  request = datastream_v1.UpdateStreamRequest(
+      stream=stream,
+      request_id=str(uuid.uuid4()),
+      update_mask=(
+          field_mask_pb2.FieldMask(paths=update_mask) if update_mask else None
+      ),
+  )
 
   try:
-    operation = client.update_stream(request=request)
-    res = operation.result()
-  except NotFound:
-    logger.error(
-        f"ERROR: Stream '{stream.display_name}' not found. Make sure the stream"
-        " exists before starting the migration."
+    operation = call_with_retry(
+        ApiMethod.UPDATE_STREAM,
+        lambda timeout: client.update_stream(
+            request=request, retry=None, timeout=timeout
+        ),
     )
-    sys.exit(1)
+  except NotFound:
+    _exit_stream_not_found(stream.display_name)
 
-  logging.debug(f"Got result {res}")
-  return res
+  return PendingStreamUpdate(
+      operation=operation, stream_display_name=stream.display_name
+  )
+
+
+# A stream update whose long running operation may still be running. Waiting
+# is safe from several threads, the operation is only polled by one of them.
+class PendingStreamUpdate:
+
+  def __init__(self, operation: Operation, stream_display_name: str):
+    self.operation: Operation = operation
+    self.stream_display_name: str = stream_display_name
+    self._lock = threading.Lock()
+    self._result: Optional[Stream] = None
+
+  def wait(self) -> Stream:
+    with self._lock:
+      if self._result is None:
+        try:
+          self._result = self.operation.result()
+        except NotFound:
+          _exit_stream_not_found(self.stream_display_name)
+        logging.debug(f"Got result {self._result}")
+    return self._result
+
+
+def _exit_stream_not_found(stream_display_name: str):
+  logger.error(
+      f"ERROR: Stream '{stream_display_name}' not found. Make sure the stream"
+      " exists before starting the migration."
+  )
+  sys.exit(1)
@@ -0,0 +1,60 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import logging
+import sys
+from batch.bulk_sql_generator import BulkSqlGenerator, SqlGenerationTask
+from migration_config import get_bulk_generation_config
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+  config: argparse.Namespace = get_bulk_generation_config()
+  logger.debug(f"Using config {vars(config)}")
+
+  tasks = [
+      SqlGenerationTask.from_config(
+          name=(
+              f"{table_config.source_schema_name}."
+              f"{table_config.source_table_name}"
+          ),
+          config=table_config,
+      )
+      for table_config in config.tables
+  ]
+
+  results = BulkSqlGenerator(
+      max_workers=config.max_workers,
+      chunksize=config.chunksize,
+      verbose=config.verbose,
+      rebuild=config.rebuild_artifacts,
+  ).generate(tasks)
+
+  failed_tables = [r.name for r in results if r.error]
+  if failed_tables:
+    logger.error(
+        f"ERROR: Failed to generate SQL for {len(failed_tables)} out of"
+        f" {len(results)} tables: {failed_tables}. Make sure their discover"
+        " result and source table DDL were fetched, for example by running"
+        " the migration in `dry_run` mode."
+    )
+    sys.exit(1)
+
+  logger.info(f"Generated SQL for all {len(results)} tables.")
+
+
+if __name__ == "__main__":
+  main()
@@ -15,22 +15,34 @@
 import argparse
 import logging
 import sys
+from typing import Optional
+from batch.source_tables import source_table_id
+from common import metadata_cache, rate_limiter
+from common.file_reader import read
+from common.file_writer import write
+from common.copy_method import CopyMethod
+from common.metadata_cache import get_metadata_cache, source_table_ddl_key, table_fingerprint
 from common.migration_mode import MigrationMode
 from common.monitoring_consts import LABEL_KEY, LABEL_VALUE, USER_AGENT
-from executors.copy_rows import execute_copy_rows
+from common.partitioning import Partitioning, SourcePartitioning, get_source_partitioning
+from executors.copy_table_rows import execute_copy_table_rows, get_copy_partition_ranges
 from executors.create_table import execute_create_table
+from executors.delete_bigquery_table import execute_delete_bigquery_table
 from executors.discover import execute_discover
 from executors.fetch_bigquery_table_ddl import execute_fetch_bigquery_table_ddl
 from executors.get_bigquery_table import execute_get_bigquery_table
-from executors.update_stream import execute_update_stream
+from executors.staging_storage import StagingStorage, get_staging_storage
+from executors.start_backfill import execute_start_backfill
+from executors.storage_copy.storage_copy_rows import verify_storage_copy_supported
+from executors.update_stream import PendingStreamUpdate, start_update_stream
 from google.api_core.gapic_v1.client_info import ClientInfo
 from google.cloud import bigquery
 from google.cloud.bigquery.table import Table
 from google.cloud.datastream_v1.types import Stream
 from migration_config import get_config
 from sql_generators.copy_rows.copy_rows import CopyDataSQLGenerator
-from sql_generators.create_table.dynamic_datasets_create_table import DynamicDatasetsCreateTable
-from sql_generators.create_table.single_dataset_create_table import SingleDatasetCreateTable
+from sql_generators.copy_rows.table_schema_parser import TableSchemaParser
+from sql_generators.create_table.table_creator import get_table_creator
 from sql_generators.fetch_bigquery_table_ddl.fetch_bigquery_table_ddl import BigQueryTableDDLFetcher
 
 logger = logging.getLogger(__name__)
@@ -41,52 +53,71 @@ def main():
   config: argparse.Namespace = get_config()
   logger.debug(f"Using config {vars(config)}")
 
-  _add_stream_label(
+  config.stream_label_update = add_stream_label(
       stream=config.stream,
       datastream_api_endpoint_override=config.datastream_api_endpoint_override,
   )
 
-  # Run Datastream's discover on connection profile and save response to a file
-  execute_discover(
-      connection_profile_name=config.connection_profile_name,
-      source_schema_name=config.source_schema_name,
-      source_table_name=config.source_table_name,
-      source_type=config.source_type,
-      datastream_api_endpoint_override=config.datastream_api_endpoint_override,
-      filepath=config.discover_result_filepath,
-  )
+  migrate_table(config)
+  wait_for_stream_label_update(config)
 
-  bigquery_client = bigquery.Client(
-      client_info=ClientInfo(user_agent=USER_AGENT)
-  )
+  rate_limiter.log_stats()
+  metadata_cache.log_stats()
 
-  if config.single_target_stream:
-    # Generate CREATE TABLE DDL for single dataset stream and save it to a file
-    table_creator = SingleDatasetCreateTable(
-        source_type=config.source_type,
-        discover_result_path=config.discover_result_filepath,
-        create_target_table_ddl_filepath=config.create_target_table_ddl_filepath,
-        source_table_name=config.source_table_name,
+
+def migrate_table(config: argparse.Namespace):
+  if (
+      config.copy_method == CopyMethod.STORAGE_API
+      and config.migration_mode == MigrationMode.FULL
+  ):
+    verify_storage_copy_supported()
+  staging_storage: Optional[StagingStorage] = None
+  if (
+      config.copy_method == CopyMethod.EXTRACT_LOAD
+      and config.migration_mode == MigrationMode.FULL
+  ):
+    staging_storage = _get_staging_storage(config)
+
+  if not config.discover_result_prefetched:
+    # Run Datastream's discover on connection profile and save response to a file
+    execute_discover(
+        connection_profile_name=config.connection_profile_name,
         source_schema_name=config.source_schema_name,
-        bigquery_dataset_name=config.bigquery_target_dataset_name,
-        bigquery_max_staleness_seconds=config.bigquery_max_staleness_seconds,
-        project_id=config.project_id,
-    )
-  else:
-    # Generate CREATE TABLE DDL for dynamic dataset stream and save it to a file
-    table_creator = DynamicDatasetsCreateTable(
-        source_type=config.source_type,
-        discover_result_path=config.discover_result_filepath,
-        create_target_table_ddl_filepath=config.create_target_table_ddl_filepath,
         source_table_name=config.source_table_name,
-        source_schema_name=config.source_schema_name,
-        bigquery_max_staleness_seconds=config.bigquery_max_staleness_seconds,
-        project_id=config.project_id,
-        bigquery_region=config.bigquery_region,
-        bigquery_kms_key_name=config.bigquery_kms_key_name,
-        bigquery_dataset_name=config.bigquery_target_dataset_name,
+        source_type=config.source_type,
+        datastream_api_endpoint_override=config.datastream_api_endpoint_override,
+        filepath=config.discover_result_filepath,
+    )
+
+  # Jobs run in the region of the new dataset, when the stream specifies it.
+  bigquery_client = bigquery.Client(
+      location=config.bigquery_region,
+      client_info=ClientInfo(user_agent=USER_AGENT),
+  )
+
+  source_partitioning: Optional[SourcePartitioning] = None
+  if config.partition_like_source_table or config.partition_range_count > 1:
+    source_partitioning = _get_source_partitioning(
+        config=config, bigquery_client=bigquery_client
     )
 
+  # Generate CREATE TABLE DDL and save it to a file
+  table_creator = get_table_creator(
+      single_target_stream=config.single_target_stream,
+      source_type=config.source_type,
+      discover_result_path=config.discover_result_filepath,
+      create_target_table_ddl_filepath=config.create_target_table_ddl_filepath,
+      source_schema_name=config.source_schema_name,
+      source_table_name=config.source_table_name,
+      project_id=config.project_id,
+      bigquery_max_staleness_seconds=config.bigquery_max_staleness_seconds,
+      bigquery_dataset_name=config.bigquery_target_dataset_name,
+      bigquery_region=config.bigquery_region,
+      bigquery_kms_key_name=config.bigquery_kms_key_name,
+      create_dataset=config.create_target_dataset,
+      column_filter=config.column_filter,
+      partitioning=_get_target_partitioning(config, source_partitioning),
+  )
   table_creator.generate_ddl()
   table_id = table_creator.get_fully_qualified_bigquery_table_name()
 
@@ -94,50 +125,97 @@ def main():
       config.migration_mode == MigrationMode.CREATE_TABLE
       or config.migration_mode == MigrationMode.FULL
   ):
-    _verify_bigquery_table_not_exist(
-        table_id=table_id, bigquery_client=bigquery_client
-    )
+    wait_for_stream_label_update(config)
 
-    _wait_for_user_prompt_if_necessary("Creating BigQuery table", config.force)
-    # Run DDL on BigQuery
-    execute_create_table(
-        filepath=config.create_target_table_ddl_filepath,
-        bigquery_client=bigquery_client,
-    )
+    # Merging rows into a table that already exists resumes a failed copy.
+    if config.copy_method == CopyMethod.MERGE and _bigquery_table_exists(
+        config=config, table_id=table_id, bigquery_client=bigquery_client
+    ):
+      logger.info(f"Table {table_id} already exists, merging the rows into it.")
+    else:
+      _drop_previous_attempt_table(
+          config=config, table_id=table_id, bigquery_client=bigquery_client
+      )
+      _verify_bigquery_table_not_exist(
+          config=config, table_id=table_id, bigquery_client=bigquery_client
+      )
 
-  # Generate SQL statement for fetching source BigQuery table DDL and save it to a file
-  BigQueryTableDDLFetcher(
-      project_id=config.project_id,
-      dataset=config.bigquery_source_dataset_name,
-      table=config.bigquery_source_table_name,
-      filepath=config.fetch_bigquery_source_table_ddl_filepath,
-  ).fetch_table_schema()
+      wait_for_user_prompt_if_necessary("Creating BigQuery table", config.force)
+      verify_lease_held(config)
+      # Run DDL on BigQuery
+      execute_create_table(
+          filepath=config.create_target_table_ddl_filepath,
+          bigquery_client=bigquery_client,
+      )
 
-  # Run SQL statement and save the DDL to a file
-  execute_fetch_bigquery_table_ddl(
-      sql_filepath=config.fetch_bigquery_source_table_ddl_filepath,
-      output_path=config.create_source_table_ddl_filepath,
+  # Backfilled tables only need the target DDL, their rows aren't copied.
+  if config.copy_method == CopyMethod.BACKFILL:
+    _backfill_table(config=config, table_id=table_id)
+    return
+
+  source_table_schema_parser: Optional[TableSchemaParser] = None
+  # The Storage APIs copy rows across regions, where querying the DDL of the
+  # existing table in the new table's region doesn't find it.
+  if (
+      config.source_schema_from_api
+      or config.copy_method == CopyMethod.STORAGE_API
+  ):
+    # Get the source BigQuery table schema from the tables.get API
+    source_table_schema_parser = _get_source_table_schema_parser(
+        config=config, bigquery_client=bigquery_client
+    )
+  elif not config.source_table_ddl_prefetched:
+    _fetch_source_table_ddl(config=config, bigquery_client=bigquery_client)
+
+  partition_ranges = get_copy_partition_ranges(
+      copy_method=config.copy_method,
+      source_table_id=source_table_id(config),
+      source_partitioning=source_partitioning,
+      partition_range_count=config.partition_range_count,
       bigquery_client=bigquery_client,
   )
 
   # Generate copy rows SQL statement and save it to a file
-  CopyDataSQLGenerator(
+  copy_data_sql_generator = CopyDataSQLGenerator(
       source_bigquery_table_ddl=config.create_source_table_ddl_filepath,
       destination_bigquery_table_ddl=config.create_target_table_ddl_filepath,
       filepath=config.copy_rows_filepath,
-  ).generate_sql()
+      source_table_schema_parser=source_table_schema_parser,
+      copy_method=config.copy_method,
+      merge_bucket_count=config.merge_bucket_count,
+      column_filter=config.column_filter,
+      partition_column=(
+          source_partitioning.column if partition_ranges else None
+      ),
+      sample_percent=config.sample_percent,
+  )
+  copy_data_sql_generator.generate_sql()
 
   if config.migration_mode == MigrationMode.FULL:
-    _wait_for_user_prompt_if_necessary(
+    wait_for_user_prompt_if_necessary(
         "Copying rows from"
         f" {config.project_id}.{config.bigquery_source_dataset_name}.{config.bigquery_source_table_name} to"
         f" {table_id}",
         config.force,
     )
+    verify_lease_held(config)
 
-    # Run SQL statement to copy rows
-    execute_copy_rows(
-        config.copy_rows_filepath, bigquery_client=bigquery_client
+    execute_copy_table_rows(
+        copy_method=config.copy_method,
+        project_id=config.project_id,
+        source_table_id=source_table_id(config),
+        destination_table_id=table_id,
+        copy_data_sql_generator=copy_data_sql_generator,
+        copy_rows_sql=read(config.copy_rows_filepath),
+        bigquery_client=bigquery_client,
+        merge_bucket_count=config.merge_bucket_count,
+        source_partitioning=source_partitioning,
+        partition_ranges=partition_ranges,
+        staging_storage=staging_storage,
+        extract_format=config.extract_format,
+        load_job_count=config.load_job_count,
+        storage_read_stream_count=config.storage_read_stream_count,
+        storage_write_stream_count=config.storage_write_stream_count,
     )
 
   if config.migration_mode == MigrationMode.DRY_RUN:
@@ -158,23 +236,199 @@ def main():
     )
 
 
-def _add_stream_label(stream: Stream, datastream_api_endpoint_override: str):
-  stream.labels[LABEL_KEY] = LABEL_VALUE
-  execute_update_stream(
-      stream=stream,
+# Batch migrations read the partitioning of all the existing tables up front.
+def _get_source_partitioning(
+    config: argparse.Namespace, bigquery_client: bigquery.Client
+) -> Optional[SourcePartitioning]:
+  if not config.source_partitioning_prefetched:
+    config.source_partitioning = get_source_partitioning(
+        execute_get_bigquery_table(
+            source_table_id(config), bigquery_client=bigquery_client
+        )
+    )
+    config.source_partitioning_prefetched = True
+  return config.source_partitioning
+
+
+def _get_target_partitioning(
+    config: argparse.Namespace,
+    source_partitioning: Optional[SourcePartitioning],
+) -> Optional[Partitioning]:
+  if config.partitioning:
+    return config.partitioning
+  if config.partition_like_source_table and source_partitioning:
+    return source_partitioning.to_partitioning()
+  return None
+
+
+def _get_staging_storage(config: argparse.Namespace) -> StagingStorage:
+  if not config.staging_uri:
+    logger.error(
+        f"ERROR: The '{CopyMethod.EXTRACT_LOAD}' copy method requires"
+        " `--staging-uri`."
+    )
+    sys.exit(1)
+  try:
+    return get_staging_storage(config.staging_uri)
+  except ValueError as ex:
+    logger.error(f"ERROR: {ex}")
+    sys.exit(1)
+
+
+def _backfill_table(config: argparse.Namespace, table_id: str):
+  if config.migration_mode == MigrationMode.FULL:
+    wait_for_user_prompt_if_necessary(
+        "Starting a Datastream backfill of"
+        f" {config.source_schema_name}.{config.source_table_name} to"
+        f" {table_id}",
+        config.force,
+    )
+    verify_lease_held(config)
+    execute_start_backfill(
+        stream_name=config.stream.name,
+        source_type=config.source_type,
+        source_schema_name=config.source_schema_name,
+        source_table_name=config.source_table_name,
+        datastream_api_endpoint_override=config.datastream_api_endpoint_override,
+    )
+    logger.info(
+        f"Migration finished successfully. New table name is `{table_id}`, its"
+        " rows are backfilled by Datastream once the stream is resumed."
+    )
+  elif config.migration_mode == MigrationMode.CREATE_TABLE:
+    logger.info(f"Table created successfully.\nNew table name is `{table_id}`.")
+  else:
+    logger.info(
+        "Dry run finished successfully.\nGenerated `CREATE TABLE` DDL at"
+        f" '{config.create_target_table_ddl_filepath}'."
+    )
+
+
+# Starts labeling the stream, unless it is already labeled. Only the labels
+# are updated, and the update runs in the background while the migration
+# continues.
+def add_stream_label(
+    stream: Stream, datastream_api_endpoint_override: str
+) -> Optional[PendingStreamUpdate]:
+  if LABEL_KEY in stream.labels:
+    logger.debug(f"Stream '{stream.display_name}' is already labeled.")
+    return None
+
+  labels = dict(stream.labels)
+  labels[LABEL_KEY] = LABEL_VALUE
+  return start_update_stream(
+      stream=Stream(
+          name=stream.name, display_name=stream.display_name, labels=labels
+      ),
       datastream_api_endpoint_override=datastream_api_endpoint_override,
+      update_mask=["labels"],
   )
 
 
-def _verify_bigquery_table_not_exist(
-    table_id: str, bigquery_client: bigquery.Client
+# The stream must be labeled before anything is created or copied.
+def wait_for_stream_label_update(config: argparse.Namespace):
+  if config.stream_label_update:
+    config.stream_label_update.wait()
+
+
+def _get_source_table_schema_parser(
+    config: argparse.Namespace, bigquery_client: bigquery.Client
+) -> TableSchemaParser:
+  table_id = source_table_id(config)
+  source_table: Table = execute_get_bigquery_table(
+      table_id, bigquery_client=bigquery_client
+  )
+
+  if not source_table:
+    logger.error(
+        f"ERROR: Table {table_id} doesn't exist. Make sure the existing"
+        " BigQuery table name is correct and rerun the migration."
+    )
+    sys.exit(1)
+
+  return TableSchemaParser(
+      fully_qualified_table_name=table_id, schema=source_table.schema
+  )
+
+
+def _fetch_source_table_ddl(
+    config: argparse.Namespace, bigquery_client: bigquery.Client
 ):
+  table_id = source_table_id(config)
+  source_table: Table = execute_get_bigquery_table(
+      table_id, bigquery_client=bigquery_client
+  )
+  if not source_table:
+    logger.error(
+        f"ERROR: Table {table_id} doesn't exist. Make sure the existing"
+        " BigQuery table name is correct and rerun the migration."
+    )
+    sys.exit(1)
+
+  cache = get_metadata_cache()
+  fingerprint: Optional[str] = None
+  if cache:
+    fingerprint = table_fingerprint(source_table)
+    ddl = cache.get(source_table_ddl_key(table_id), fingerprint=fingerprint)
+    if ddl is not None:
+      logger.info(f"Using cached DDL of table {table_id}")
+      write(filepath=config.create_source_table_ddl_filepath, data=ddl)
+      return
+
+  # Generate SQL statement for fetching source BigQuery table DDL and save it to a file
+  BigQueryTableDDLFetcher(
+      project_id=config.project_id,
+      dataset=config.bigquery_source_dataset_name,
+      table=config.bigquery_source_table_name,
+      filepath=config.fetch_bigquery_source_table_ddl_filepath,
+  ).fetch_table_schema()
+
+  # Run SQL statement and save the DDL to a file
+  ddl = execute_fetch_bigquery_table_ddl(
+      sql_filepath=config.fetch_bigquery_source_table_ddl_filepath,
+      output_path=config.create_source_table_ddl_filepath,
+      bigquery_client=bigquery_client,
+  )
+
+  if cache and fingerprint:
+    cache.put(source_table_ddl_key(table_id), ddl, fingerprint=fingerprint)
+
+
+# A worker whose lease on the table expired may have created the table, and
+# copied part of its rows. Tables created before that worker claimed the table
+# aren't dropped, they fail the migration like on a first attempt.
+def _drop_previous_attempt_table(
+    config: argparse.Namespace, table_id: str, bigquery_client: bigquery.Client
+):
+  if config.previous_attempt_started_at is None:
+    return
+
   table: Table = execute_get_bigquery_table(
       table_id, bigquery_client=bigquery_client
   )
+  if (
+      table is None
+      or table.created is None
+      or table.created.timestamp() < config.previous_attempt_started_at
+  ):
+    return
+
+  logger.warning(
+      f"Table {table_id} was created by a previous attempt to migrate it,"
+      " dropping it."
+  )
+  verify_lease_held(config)
+  execute_delete_bigquery_table(table_id, bigquery_client=bigquery_client)
+  config.target_table_exists = False
+
 
+def _verify_bigquery_table_not_exist(
+    config: argparse.Namespace, table_id: str, bigquery_client: bigquery.Client
+):
   # Table exists, exit to avoid data corruption.
-  if table:
+  if _bigquery_table_exists(
+      config=config, table_id=table_id, bigquery_client=bigquery_client
+  ):
     logger.error(
         f"ERROR: Table {table_id} already exists. Drop the table and rerun the"
         " migration."
@@ -182,7 +436,32 @@ def _verify_bigquery_table_not_exist(
     sys.exit(1)
 
 
-def _wait_for_user_prompt_if_necessary(msg: str, force: bool):
+def _bigquery_table_exists(
+    config: argparse.Namespace, table_id: str, bigquery_client: bigquery.Client
+) -> bool:
+  # Batch migrations index the tables of each target dataset up front.
+  if config.target_table_exists is not None:
+    return config.target_table_exists
+
+  table: Table = execute_get_bigquery_table(
+      table_id, bigquery_client=bigquery_client
+  )
+  return table is not None
+
+
+# Workers of a shared work queue stop migrating a table once they lost its
+# lease, since another worker may have claimed it.
+def verify_lease_held(config: argparse.Namespace):
+  if config.lease_lost is not None and config.lease_lost.is_set():
+    logger.error(
+        "ERROR: Lost the lease on table"
+        f" {config.source_schema_name}.{config.source_table_name}, stopping"
+        " its migration."
+    )
+    sys.exit(1)
+
+
+def wait_for_user_prompt_if_necessary(msg: str, force: bool):
   if force:
     logger.info(msg + ".")
   else:
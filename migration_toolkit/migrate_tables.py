@@ -0,0 +1,258 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import logging
+import sys
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from batch.copy_planner import CopyPlanner, plan_copy_methods
+from batch.queue_worker import QueueWorker
+from batch.source_tables import get_source_tables, prefetch_source_table_ddls, set_source_partitionings, source_table_id
+from batch.sqlite_work_queue import SqliteWorkQueue
+from batch.table_scheduler import ScheduledTable, TableResult, TableScheduler, TableSize
+from batch.target_datasets import index_target_tables, prepare_target_datasets
+from batch.work_queue import BaseWorkQueue, Lease, WorkItem
+from common import metadata_cache, rate_limiter
+from common.copy_method import CopyMethod
+from common.migration_mode import MigrationMode
+from common.monitoring_consts import USER_AGENT
+from google.api_core.gapic_v1.client_info import ClientInfo
+from google.cloud import bigquery
+from google.cloud.bigquery.table import Table
+from migrate_table import add_stream_label, migrate_table, wait_for_stream_label_update, wait_for_user_prompt_if_necessary
+from migration_config import get_batch_config
+
+logger = logging.getLogger(__name__)
+
+# Opens the work queue at `--work-queue-path`. Services embedding the toolkit
+# can share the work queue through another backend than a SQLite file.
+_work_queue_factory: Callable[[str], BaseWorkQueue] = SqliteWorkQueue
+
+
+def set_work_queue_factory(factory: Optional[Callable[[str], BaseWorkQueue]]):
+  global _work_queue_factory
+  _work_queue_factory = factory or SqliteWorkQueue
+
+
+def main():
+  config: argparse.Namespace = get_batch_config()
+  logger.debug(f"Using config {vars(config)}")
+
+  wait_for_user_prompt_if_necessary(
+      f"Migrating {len(config.tables)} tables in '{config.migration_mode}'"
+      " mode",
+      config.force,
+  )
+
+  results = migrate_tables(config)
+
+  if not log_results(results):
+    sys.exit(1)
+
+
+# Migrates all the tables of the batch, once the user confirmed it. Each table
+# is migrated by `fn`, which rehearsals wrap to measure the tables.
+def migrate_tables(
+    config: argparse.Namespace,
+    fn: Callable[[argparse.Namespace], Any] = migrate_table,
+) -> List[TableResult]:
+  config.stream_label_update = add_stream_label(
+      stream=config.stream,
+      datastream_api_endpoint_override=config.datastream_api_endpoint_override,
+  )
+
+  # The user confirmed the whole batch, don't prompt again for every table.
+  for table_config in config.tables:
+    table_config.force = True
+    table_config.stream_label_update = config.stream_label_update
+
+  bigquery_client = bigquery.Client(
+      client_info=ClientInfo(user_agent=USER_AGENT)
+  )
+
+  source_tables = get_source_tables(
+      config.tables,
+      bigquery_client=bigquery_client,
+      max_workers=config.max_concurrent_tables,
+  )
+  set_source_partitionings(config.tables, source_tables=source_tables)
+
+  if config.plan_copy_methods:
+    plan_copy_methods(
+        config.tables,
+        source_tables=source_tables,
+        planner=CopyPlanner(
+            copy_bytes_per_second=config.copy_bytes_per_second,
+            backfill_rows_per_second=config.backfill_rows_per_second,
+            max_copy_staleness_seconds=config.max_copy_staleness_seconds,
+        ),
+        max_workers=config.max_concurrent_tables,
+    )
+
+  # Backfilled tables don't need the DDL of the existing BigQuery table, and
+  # tables copied with the Storage APIs get its schema from the tables API.
+  if not config.source_schema_from_api:
+    prefetch_source_table_ddls(
+        [
+            c
+            for c in config.tables
+            if c.copy_method
+            not in (CopyMethod.BACKFILL, CopyMethod.STORAGE_API)
+        ],
+        source_tables=source_tables,
+        bigquery_client=bigquery_client,
+    )
+
+  target_tables = index_target_tables(
+      config.tables,
+      bigquery_client=bigquery_client,
+      max_workers=config.max_concurrent_tables,
+  )
+  create_datasets = config.migration_mode != MigrationMode.DRY_RUN
+  if create_datasets:
+    wait_for_stream_label_update(config)
+  prepare_target_datasets(
+      config.tables,
+      target_tables=target_tables,
+      bigquery_client=bigquery_client,
+      create_datasets=create_datasets,
+  )
+
+  if config.work_queue_path:
+    results = _run_queue_worker(config, source_tables=source_tables, fn=fn)
+  else:
+    results = _run_scheduler(config, source_tables=source_tables, fn=fn)
+
+  wait_for_stream_label_update(config)
+
+  rate_limiter.log_stats()
+  metadata_cache.log_stats()
+
+  return results
+
+
+# Returns whether all the tables were migrated successfully.
+def log_results(results: List[TableResult]) -> bool:
+  failed_tables = [r.name for r in results if r.error]
+  if failed_tables:
+    logger.error(
+        f"ERROR: {len(failed_tables)} out of {len(results)} tables failed to"
+        f" migrate: {failed_tables}"
+    )
+    return False
+
+  logger.info(f"All {len(results)} tables migrated successfully.")
+  return True
+
+
+def _run_scheduler(
+    config: argparse.Namespace,
+    source_tables: Dict[str, Optional[Table]],
+    fn: Callable[[argparse.Namespace], Any],
+) -> List[TableResult]:
+  scheduler = TableScheduler(
+      max_concurrent_tables=config.max_concurrent_tables,
+      max_concurrent_large_tables=config.max_concurrent_large_tables,
+      large_table_threshold_bytes=config.large_table_threshold_bytes,
+  )
+  return scheduler.run(
+      tables=_get_scheduled_tables(config.tables, source_tables),
+      fn=fn,
+  )
+
+
+def _run_queue_worker(
+    config: argparse.Namespace,
+    source_tables: Dict[str, Optional[Table]],
+    fn: Callable[[argparse.Namespace], Any],
+) -> List[TableResult]:
+  work_queue = _work_queue_factory(config.work_queue_path)
+
+  # Workers share the manifest, only the first one to see a table enqueues it.
+  enqueued_names = set(work_queue.list_names())
+  new_tables = [
+      c for c in config.tables if source_table_id(c) not in enqueued_names
+  ]
+  if new_tables:
+    work_queue.enqueue(
+        WorkItem(
+            name=t.name, num_bytes=t.size.num_bytes, num_rows=t.size.num_rows
+        )
+        for t in _get_scheduled_tables(new_tables, source_tables)
+    )
+
+  worker = QueueWorker(
+      work_queue=work_queue,
+      worker_id=config.worker_id,
+      max_concurrent_tables=config.max_concurrent_tables,
+      max_concurrent_large_tables=config.max_concurrent_large_tables,
+      large_table_threshold_bytes=config.large_table_threshold_bytes,
+      lease_seconds=config.lease_seconds,
+  )
+
+  # The table is only migrated while this worker holds the lease on it. A
+  # worker whose lease on the table expired may have created it since the
+  # target datasets were indexed.
+  def migrate_leased_table(
+      table_config: argparse.Namespace,
+      lease: Lease,
+      lease_lost: threading.Event,
+  ):
+    table_config.lease_lost = lease_lost
+    if lease.attempt > 1:
+      table_config.target_table_exists = None
+      table_config.previous_attempt_started_at = lease.first_claimed_at
+    return fn(table_config)
+
+  return worker.run(
+      payloads={source_table_id(c): c for c in config.tables},
+      fn=migrate_leased_table,
+  )
+
+
+def _get_scheduled_tables(
+    table_configs: List[argparse.Namespace],
+    source_tables: Dict[str, Optional[Table]],
+) -> List[ScheduledTable]:
+  return [
+      ScheduledTable(
+          name=source_table_id(table_config),
+          size=_get_source_table_size(table_config, source_tables),
+          payload=table_config,
+      )
+      for table_config in table_configs
+  ]
+
+
+def _get_source_table_size(
+    table_config: argparse.Namespace, source_tables: Dict[str, Optional[Table]]
+) -> TableSize:
+  # Backfilled tables aren't copied, they don't take the slots of large tables.
+  if table_config.copy_method == CopyMethod.BACKFILL:
+    return TableSize(num_bytes=0, num_rows=0)
+
+  table_id = source_table_id(table_config)
+  table = source_tables.get(table_id)
+  if not table:
+    logger.warning(
+        f"Table {table_id} wasn't found, scheduling it as an empty table."
+    )
+    return TableSize(num_bytes=0, num_rows=0)
+
+  return TableSize(num_bytes=table.num_bytes or 0, num_rows=table.num_rows or 0)
+
+
+if __name__ == "__main__":
+  main()
@@ -17,65 +17,396 @@ from argparse import RawTextHelpFormatter
 import json
 import logging
 import sys
+from typing import Dict, Optional
+from batch.table_manifest import read_table_manifest
 from common import argparse_arguments
+from common.artifact_manifest import configure_artifact_manifest
 from common import name_mapper
 from common.logging_config import configure_logging
+from common.metadata_cache import configure_metadata_cache
+from common.migration_mode import MigrationMode
 from common.output_names import *
+from common.partitioning import Partitioning
+from common.plan_cache import configure_plan_cache
+from common.rate_limiter import configure_rate_limits
+from common.retry_policy import configure_retry_policies
 from common.source_type import SourceType
+from common.stream_object_filter import StreamObjectFilter
 from executors.get_stream import execute_get_stream
 from google.cloud.datastream_v1.types import Stream
 
 logger = logging.getLogger(__name__)
 
+_stream_object_filters: Dict[str, StreamObjectFilter] = {}
+
 
 def get_config() -> argparse.Namespace:
   user_args = _get_user_args()
+  _configure(user_args)
+
+  stream: Stream = _get_stream(user_args)
+
+  return _get_table_config(stream=stream, user_args=user_args)
+
+
+def get_batch_config() -> argparse.Namespace:
+  user_args = _get_batch_user_args()
+  _configure(user_args)
+
+  stream: Stream = _get_stream(user_args)
+
+  return _get_tables_config(stream=stream, user_args=user_args)
+
+
+def get_cutover_config() -> argparse.Namespace:
+  user_args = _get_cutover_user_args()
+  # A cutover always creates the tables and copies all rows.
+  user_args.migration_mode = MigrationMode.FULL
+  _configure(user_args)
+
+  stream: Stream = _get_stream(user_args)
+
+  return _get_tables_config(stream=stream, user_args=user_args)
+
+
+def get_rehearsal_config() -> argparse.Namespace:
+  user_args = _get_rehearsal_user_args()
+  # A rehearsal creates the tables and copies their sampled rows.
+  user_args.migration_mode = MigrationMode.FULL
+  _configure(user_args)
+
+  if not 0 < user_args.sample_percent <= 100:
+    logger.error(
+        "ERROR: `--sample-percent` should be greater than 0 and at most 100,"
+        f" but it is {user_args.sample_percent}."
+    )
+    sys.exit(1)
+
+  stream: Stream = _get_stream(user_args)
+
+  # The tables are created in the scratch dataset, the stream may keep running.
+  return _get_tables_config(
+      stream=stream, user_args=user_args, require_paused_stream=False
+  )
+
+
+def get_audit_config() -> argparse.Namespace:
+  user_args = _get_audit_user_args()
+  _configure(user_args)
+
+  stream: Stream = _get_stream(user_args)
+
+  # Auditing doesn't change anything, the stream may keep running.
+  return _get_tables_config(
+      stream=stream, user_args=user_args, require_paused_stream=False
+  )
+
+
+def _get_tables_config(
+    stream: Stream, user_args, require_paused_stream: bool = True
+) -> argparse.Namespace:
+  tables = [
+      _get_table_config(
+          stream=stream,
+          user_args=argparse.Namespace(**(vars(user_args) | entry._asdict())),
+          require_paused_stream=require_paused_stream,
+      )
+      for entry in read_table_manifest(user_args.tables_file)
+  ]
+
+  return argparse.Namespace(**vars(user_args), stream=stream, tables=tables)
+
+
+def get_bulk_generation_config() -> argparse.Namespace:
+  user_args = _get_bulk_generation_user_args()
+  _configure(user_args)
+
+  stream: Stream = _get_stream(user_args)
+
+  # Generating SQL offline doesn't change anything, the stream may keep
+  # running.
+  return _get_tables_config(
+      stream=stream, user_args=user_args, require_paused_stream=False
+  )
+
+
+def get_warm_cache_config() -> argparse.Namespace:
+  user_args = _get_warm_cache_user_args()
+  _configure(user_args)
+
+  stream: Stream = _get_stream(user_args)
+
+  # Warming the cache doesn't change anything, the stream may keep running.
+  return _get_tables_config(
+      stream=stream, user_args=user_args, require_paused_stream=False
+  )
+
+
+def _configure(user_args):
   configure_logging(user_args.verbose)
+  configure_rate_limits(
+      requests_per_minute=user_args.api_rate_limits,
+      shared_state_path=user_args.api_rate_limits_state_path,
+  )
+  configure_retry_policies(
+      deadline_seconds=user_args.api_deadlines,
+      hedge_after_seconds=user_args.hedge_after_seconds,
+      max_concurrent_calls=getattr(user_args, "max_concurrent_tables", 1),
+  )
+  configure_metadata_cache(
+      filepath=user_args.metadata_cache_path,
+      max_size_bytes=user_args.metadata_cache_max_size_bytes,
+      discover_ttl_seconds=user_args.discover_cache_ttl_seconds,
+  )
+  configure_artifact_manifest(rebuild=user_args.rebuild_artifacts)
+  configure_plan_cache(rebuild=user_args.rebuild_artifacts)
+
 
-  stream: Stream = execute_get_stream(
+def _get_stream(user_args) -> Stream:
+  return execute_get_stream(
       project_id=user_args.project_id,
       datastream_region=user_args.datastream_region,
       stream_id=user_args.stream_id,
       datastream_api_endpoint_override=user_args.datastream_api_endpoint_override,
   )
-  args_from_stream = _get_args_from_stream(stream=stream, user_args=user_args)
+
+
+def _get_table_config(
+    stream: Stream, user_args, require_paused_stream: bool = True
+) -> argparse.Namespace:
+  args_from_stream = _get_args_from_stream(
+      stream=stream,
+      user_args=user_args,
+      require_paused_stream=require_paused_stream,
+  )
 
   all_args = vars(user_args) | args_from_stream
+  all_args["source_table_ddl_prefetched"] = False
+  all_args["discover_result_prefetched"] = False
+  all_args["create_target_dataset"] = True
+  all_args["target_table_exists"] = None
+  all_args["stream_label_update"] = None
+  all_args["lease_lost"] = None
+  all_args["previous_attempt_started_at"] = None
+  all_args["partitioning"] = _get_partitioning(user_args)
+  all_args["source_partitioning"] = None
+  all_args["source_partitioning_prefetched"] = False
+  all_args["sample_percent"] = getattr(user_args, "sample_percent", None)
+  if getattr(user_args, "scratch_dataset_name", None):
+    _use_scratch_dataset(all_args)
   _get_filepaths(all_args)
 
   return argparse.Namespace(**all_args)
 
 
+# Rehearsals create all the tables in the scratch dataset, named like the
+# tables of a single target dataset stream so that tables of different schemas
+# don't collide.
+def _use_scratch_dataset(args):
+  args["single_target_stream"] = True
+  args["bigquery_region"] = None
+  args["bigquery_kms_key_name"] = None
+  args["bigquery_target_dataset_name"] = args["scratch_dataset_name"]
+  args["bigquery_target_table_name"] = name_mapper.single_dataset_table_name(
+      source_schema_name=args["source_schema_name"],
+      source_table_name=args["source_table_name"],
+  )
+
+
+# Partitioning given on the command line, which takes precedence over the
+# partitioning of the existing BigQuery table.
+def _get_partitioning(user_args) -> Optional[Partitioning]:
+  if not getattr(user_args, "partition_column", None):
+    return None
+  return Partitioning(
+      column=user_args.partition_column,
+      granularity=user_args.partition_granularity,
+  )
+
+
 def _get_user_args():
+  parser = _get_parser()
+  argparse_arguments.copy_method(parser)
+  argparse_arguments.merge_bucket_count(parser)
+  argparse_arguments.source_schema_from_api(parser)
+  _add_partitioning_args(parser)
+  _add_storage_copy_args(parser)
+  _add_extract_load_args(parser)
+
+  required_args_parser = parser.add_argument_group("required arguments")
+  _add_common_required_args(required_args_parser)
+
+  argparse_arguments.source_schema_name(required_args_parser)
+  argparse_arguments.source_table_name(required_args_parser)
+
+  argparse_arguments.bigquery_source_dataset_name(required_args_parser)
+  argparse_arguments.bigquery_source_table_name(required_args_parser)
+
+  return parser.parse_args()
+
+
+def _get_batch_user_args():
+  parser = _get_parser()
+
+  required_args_parser = parser.add_argument_group("required arguments")
+  _add_batch_args(parser, required_args_parser)
+
+  return parser.parse_args()
+
+
+def _get_cutover_user_args():
+  parser = _get_parser(with_migration_mode=False)
+
+  argparse_arguments.stream_state_timeout_seconds(parser)
+  argparse_arguments.latency_wait_seconds(parser)
+  argparse_arguments.verify_row_counts(parser)
+  argparse_arguments.dataflow_drained(parser)
+
+  required_args_parser = parser.add_argument_group("required arguments")
+  _add_batch_args(parser, required_args_parser)
+  argparse_arguments.old_stream_id(required_args_parser)
+
+  return parser.parse_args()
+
+
+def _get_rehearsal_user_args():
+  parser = _get_parser(with_migration_mode=False)
+
+  argparse_arguments.sample_percent(parser)
+
+  required_args_parser = parser.add_argument_group("required arguments")
+  _add_batch_args(parser, required_args_parser)
+  argparse_arguments.scratch_dataset_name(required_args_parser)
+
+  return parser.parse_args()
+
+
+def _add_batch_args(parser, required_args_parser):
+  argparse_arguments.copy_method(parser)
+  argparse_arguments.merge_bucket_count(parser)
+  argparse_arguments.source_schema_from_api(parser)
+  argparse_arguments.plan_copy_methods(parser)
+  argparse_arguments.copy_bytes_per_second(parser)
+  argparse_arguments.backfill_rows_per_second(parser)
+  argparse_arguments.max_copy_staleness_seconds(parser)
+  _add_partitioning_args(parser)
+  _add_storage_copy_args(parser)
+  _add_extract_load_args(parser)
+
+  argparse_arguments.max_concurrent_tables(parser)
+  argparse_arguments.max_concurrent_large_tables(parser)
+  argparse_arguments.large_table_threshold_bytes(parser)
+  argparse_arguments.work_queue_path(parser)
+  argparse_arguments.worker_id(parser)
+  argparse_arguments.lease_seconds(parser)
+
+  _add_common_required_args(required_args_parser)
+  argparse_arguments.tables_file(required_args_parser)
+
+
+def _add_partitioning_args(parser):
+  argparse_arguments.partition_column(parser)
+  argparse_arguments.partition_granularity(parser)
+  argparse_arguments.partition_like_source_table(parser)
+  argparse_arguments.partition_range_count(parser)
+
+
+def _add_storage_copy_args(parser):
+  argparse_arguments.storage_read_stream_count(parser)
+  argparse_arguments.storage_write_stream_count(parser)
+
+
+def _add_extract_load_args(parser):
+  argparse_arguments.staging_uri(parser)
+  argparse_arguments.extract_format(parser)
+  argparse_arguments.load_job_count(parser)
+
+
+def _get_bulk_generation_user_args():
+  parser = _get_parser(with_migration_mode=False)
+  argparse_arguments.copy_method(parser)
+  argparse_arguments.merge_bucket_count(parser)
+  argparse_arguments.partition_column(parser)
+  argparse_arguments.partition_granularity(parser)
+
+  argparse_arguments.max_workers(parser)
+  argparse_arguments.chunksize(parser)
+
+  required_args_parser = parser.add_argument_group("required arguments")
+  _add_common_required_args(required_args_parser)
+  argparse_arguments.tables_file(required_args_parser)
+
+  return parser.parse_args()
+
+
+def _get_warm_cache_user_args():
+  parser = _get_parser(
+      with_migration_mode=False,
+      default_metadata_cache_path=METADATA_CACHE_FILEPATH,
+  )
+
+  argparse_arguments.max_concurrent_tables(parser)
+
+  required_args_parser = parser.add_argument_group("required arguments")
+  _add_common_required_args(required_args_parser)
+  argparse_arguments.tables_file(required_args_parser)
+
+  return parser.parse_args()
+
+
+def _get_audit_user_args():
+  parser = _get_parser(with_migration_mode=False)
+
+  argparse_arguments.max_concurrent_tables(parser)
+
+  required_args_parser = parser.add_argument_group("required arguments")
+  _add_common_required_args(required_args_parser)
+  argparse_arguments.tables_file(required_args_parser)
+
+  return parser.parse_args()
+
+
+def _get_parser(
+    with_migration_mode: bool = True,
+    default_metadata_cache_path: Optional[str] = None,
+) -> argparse.ArgumentParser:
   parser = argparse.ArgumentParser(
       description="Datastream BigQuery Migration Toolkit arguments",
       formatter_class=RawTextHelpFormatter,
   )
 
-  argparse_arguments.migration_mode(parser)
+  if with_migration_mode:
+    argparse_arguments.migration_mode(parser)
 
   argparse_arguments.force(parser)
   argparse_arguments.verbose(parser)
   argparse_arguments.datastream_api_endpoint_override(parser)
+  argparse_arguments.api_rate_limits(parser)
+  argparse_arguments.api_rate_limits_state_path(parser)
+  argparse_arguments.api_deadlines(parser)
+  argparse_arguments.hedge_after_seconds(parser)
+  argparse_arguments.metadata_cache_path(
+      parser, default=default_metadata_cache_path
+  )
+  argparse_arguments.metadata_cache_max_size_bytes(parser)
+  argparse_arguments.discover_cache_ttl_seconds(parser)
+  argparse_arguments.rebuild_artifacts(parser)
 
-  required_args_parser = parser.add_argument_group("required arguments")
+  return parser
+
+
+def _add_common_required_args(required_args_parser):
   argparse_arguments.project_id(required_args_parser)
   argparse_arguments.stream_id(required_args_parser)
   argparse_arguments.datastream_region(required_args_parser)
 
-  argparse_arguments.source_schema_name(required_args_parser)
-  argparse_arguments.source_table_name(required_args_parser)
-
-  argparse_arguments.bigquery_source_dataset_name(required_args_parser)
-  argparse_arguments.bigquery_source_table_name(required_args_parser)
 
-  return parser.parse_args()
-
-
-def _get_args_from_stream(stream: Stream, user_args):
+def _get_args_from_stream(
+    stream: Stream, user_args, require_paused_stream: bool = True
+):
   args_from_stream = {}
   stream_name = stream.display_name
-  if stream.state != Stream.State.PAUSED:
+  if require_paused_stream and stream.state != Stream.State.PAUSED:
     logger.error(
         f"ERROR: Stream '{stream_name}' should be in state PAUSED, but it is in"
         f" state {stream.state.name}. Please pause the stream and run the"
@@ -93,6 +424,13 @@ def _get_args_from_stream(stream: Stream, user_args):
       stream.source_config
   )
 
+  args_from_stream["column_filter"] = _get_stream_object_filter(
+      stream
+  ).get_column_filter(
+      source_schema_name=user_args.source_schema_name,
+      source_table_name=user_args.source_table_name,
+  )
+
   if not hasattr(stream.destination_config, "bigquery_destination_config"):
     logger.error(
         f"ERROR: Stream '{stream_name}' doesn't have BigQuery destination."
@@ -140,6 +478,8 @@ def _get_args_from_stream(stream: Stream, user_args):
     args_from_stream["single_target_stream"] = False
 
   else:
+    args_from_stream["bigquery_region"] = None
+    args_from_stream["bigquery_kms_key_name"] = None
     args_from_stream["bigquery_target_dataset_name"] = (
         stream.destination_config.bigquery_destination_config.single_target_dataset.dataset_id
     )
@@ -154,8 +494,21 @@ def _get_args_from_stream(stream: Stream, user_args):
   return args_from_stream
 
 
+# Batch configs look up the filter of every table in the same stream.
+def _get_stream_object_filter(stream: Stream) -> StreamObjectFilter:
+  if stream.name not in _stream_object_filters:
+    _stream_object_filters[stream.name] = StreamObjectFilter(
+        _pb_to_json(stream.source_config)
+    )
+  return _stream_object_filters[stream.name]
+
+
+def _pb_to_json(pb):
+  return json.loads(type(pb).to_json(pb))
+
+
 def _source_config_to_source_type(source_config):
-  source_config_json = json.loads(type(source_config).to_json(source_config))
+  source_config_json = _pb_to_json(source_config)
   return (
       SourceType.MYSQL
       if source_config_json.get("mysqlSourceConfig") is not None
@@ -194,6 +547,13 @@ def _get_filepaths(args):
       ),
   )
 
+  args["create_target_dataset_ddl_filepath"] = os.path.join(
+      CREATE_TARGET_DATASET_DDL_DIRECTORY,
+      CREATE_TARGET_DATASET_DDL_FILENAME_TEMPLATE.format(
+          dataset_name=f"{args['project_id']}.{args['bigquery_target_dataset_name']}"
+      ),
+  )
+
   args["create_source_table_ddl_filepath"] = os.path.join(
       SOURCE_TABLE_DDL_DIRECTORY,
       SOURCE_TABLE_DDL_FILENAME_TEMPLATE.format(
@@ -0,0 +1,414 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import logging
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+from common.copy_method import CopyMethod
+from common.defaults import DEFAULT_LOAD_JOB_COUNT, DEFAULT_READ_STREAM_COUNT, DEFAULT_WRITE_STREAM_COUNT
+from common.extract_format import ExtractFormat
+from common.file_writer import write
+from common.migration_mode import MigrationMode
+from common.partitioning import PartitionRange, Partitioning, SourcePartitioning, get_source_partitioning
+from common.source_type import SourceType
+from common.stream_object_filter import ColumnFilter
+from common.table_schema import TableSchema
+from executors.copy_table_rows import execute_copy_table_rows, get_copy_partition_ranges
+from executors.create_table import execute_create_table_ddl
+from executors.discover import execute_discover
+from executors.fetch_bigquery_table_ddl import execute_fetch_bigquery_table_ddl_sql
+from executors.get_bigquery_table import execute_get_bigquery_table
+from executors.staging_storage import get_staging_storage
+from executors.start_backfill import execute_start_backfill
+from executors.update_stream import PendingStreamUpdate
+from google.cloud import bigquery
+from google.cloud.bigquery.table import Table
+from sql_generators.copy_rows.copy_rows import CopyDataSQLGenerator
+from sql_generators.copy_rows.ddl_parser import DDLParser
+from sql_generators.copy_rows.table_schema_parser import TableSchemaParser
+from sql_generators.create_table.base_create_table import BaseCreateTable
+from sql_generators.create_table.table_creator import get_table_creator
+from sql_generators.fetch_bigquery_table_ddl.fetch_bigquery_table_ddl import BigQueryTableDDLFetcher
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactFilepaths(NamedTuple):
+  discover_result_filepath: str
+  create_target_table_ddl_filepath: str
+  create_source_table_ddl_filepath: str
+  copy_rows_filepath: str
+
+
+# Migrates a single table when the toolkit is used as a library. The discover
+# result, schemas and SQL statements are passed between the stages in memory,
+# and each stage runs at most once. Generated files are only written when
+# `artifact_filepaths` is given. The rows are copied like by migrate_table.py.
+# Before the table is created or its rows copied, the pipeline waits for
+# `stream_label_update`, and stops if `lease_lost` is set.
+class MigrationPipeline:
+
+  def __init__(
+      self,
+      connection_profile_name: str,
+      source_type: SourceType,
+      source_schema_name: str,
+      source_table_name: str,
+      project_id: str,
+      single_target_stream: bool,
+      bigquery_max_staleness_seconds: int,
+      bigquery_target_dataset_name: str,
+      bigquery_region: Optional[str],
+      bigquery_kms_key_name: Optional[str],
+      bigquery_source_dataset_name: str,
+      bigquery_source_table_name: str,
+      bigquery_client: bigquery.Client,
+      datastream_api_endpoint_override: Optional[str] = None,
+      source_schema_from_api: bool = False,
+      artifact_filepaths: Optional[ArtifactFilepaths] = None,
+      copy_method: CopyMethod = CopyMethod.INSERT,
+      merge_bucket_count: int = 1,
+      column_filter: Optional[ColumnFilter] = None,
+      stream_name: Optional[str] = None,
+      partitioning: Optional[Partitioning] = None,
+      staging_uri: Optional[str] = None,
+      extract_format: ExtractFormat = ExtractFormat.AVRO,
+      load_job_count: int = DEFAULT_LOAD_JOB_COUNT,
+      storage_read_stream_count: int = DEFAULT_READ_STREAM_COUNT,
+      storage_write_stream_count: int = DEFAULT_WRITE_STREAM_COUNT,
+      partition_range_count: int = 1,
+      sample_percent: Optional[float] = None,
+      stream_label_update: Optional[PendingStreamUpdate] = None,
+      lease_lost: Optional[threading.Event] = None,
+  ):
+    self.connection_profile_name: str = connection_profile_name
+    self.source_type: SourceType = source_type
+    self.source_schema_name: str = source_schema_name
+    self.source_table_name: str = source_table_name
+    self.project_id: str = project_id
+    self.single_target_stream: bool = single_target_stream
+    self.bigquery_max_staleness_seconds: int = bigquery_max_staleness_seconds
+    self.bigquery_target_dataset_name: str = bigquery_target_dataset_name
+    self.bigquery_region: Optional[str] = bigquery_region
+    self.bigquery_kms_key_name: Optional[str] = bigquery_kms_key_name
+    self.bigquery_source_dataset_name: str = bigquery_source_dataset_name
+    self.bigquery_source_table_name: str = bigquery_source_table_name
+    self.bigquery_client: bigquery.Client = bigquery_client
+    self.datastream_api_endpoint_override: Optional[str] = (
+        datastream_api_endpoint_override
+    )
+    self.source_schema_from_api: bool = source_schema_from_api
+    self.artifact_filepaths: Optional[ArtifactFilepaths] = artifact_filepaths
+    self.copy_method: CopyMethod = copy_method
+    self.merge_bucket_count: int = merge_bucket_count
+    self.column_filter: Optional[ColumnFilter] = column_filter
+    # Only needed by the backfill copy method.
+    self.stream_name: Optional[str] = stream_name
+    self.partitioning: Optional[Partitioning] = partitioning
+    # Only needed by the extract and load copy method.
+    self.staging_uri: Optional[str] = staging_uri
+    self.extract_format: ExtractFormat = extract_format
+    self.load_job_count: int = load_job_count
+    self.storage_read_stream_count: int = storage_read_stream_count
+    self.storage_write_stream_count: int = storage_write_stream_count
+    self.partition_range_count: int = partition_range_count
+    self.sample_percent: Optional[float] = sample_percent
+    self.stream_label_update: Optional[PendingStreamUpdate] = (
+        stream_label_update
+    )
+    self.lease_lost: Optional[threading.Event] = lease_lost
+
+    self._discover_result: Optional[Dict[str, Any]] = None
+    self._table_creator: Optional[BaseCreateTable] = None
+    self._create_table_ddl: Optional[str] = None
+    self._source_table_schema: Optional[Union[DDLParser, TableSchemaParser]] = (
+        None
+    )
+    self._source_partitioning: Optional[SourcePartitioning] = None
+    self._partition_ranges: Optional[List[PartitionRange]] = None
+    self._copy_data_sql_generator: Optional[CopyDataSQLGenerator] = None
+    self._copy_rows_sql: Optional[str] = None
+
+  @classmethod
+  def from_config(
+      cls,
+      config: argparse.Namespace,
+      bigquery_client: bigquery.Client,
+      write_artifacts: bool = False,
+  ) -> "MigrationPipeline":
+    return cls(
+        connection_profile_name=config.connection_profile_name,
+        source_type=config.source_type,
+        source_schema_name=config.source_schema_name,
+        source_table_name=config.source_table_name,
+        project_id=config.project_id,
+        single_target_stream=config.single_target_stream,
+        bigquery_max_staleness_seconds=config.bigquery_max_staleness_seconds,
+        bigquery_target_dataset_name=config.bigquery_target_dataset_name,
+        bigquery_region=config.bigquery_region,
+        bigquery_kms_key_name=config.bigquery_kms_key_name,
+        bigquery_source_dataset_name=config.bigquery_source_dataset_name,
+        bigquery_source_table_name=config.bigquery_source_table_name,
+        bigquery_client=bigquery_client,
+        datastream_api_endpoint_override=config.datastream_api_endpoint_override,
+        source_schema_from_api=config.source_schema_from_api,
+        artifact_filepaths=(
+            ArtifactFilepaths(
+                discover_result_filepath=config.discover_result_filepath,
+                create_target_table_ddl_filepath=config.create_target_table_ddl_filepath,
+                create_source_table_ddl_filepath=config.create_source_table_ddl_filepath,
+                copy_rows_filepath=config.copy_rows_filepath,
+            )
+            if write_artifacts
+            else None
+        ),
+        copy_method=config.copy_method,
+        merge_bucket_count=config.merge_bucket_count,
+        column_filter=config.column_filter,
+        stream_name=config.stream.name,
+        partitioning=config.partitioning,
+        staging_uri=config.staging_uri,
+        extract_format=config.extract_format,
+        load_job_count=config.load_job_count,
+        storage_read_stream_count=config.storage_read_stream_count,
+        storage_write_stream_count=config.storage_write_stream_count,
+        partition_range_count=config.partition_range_count,
+        sample_percent=config.sample_percent,
+        stream_label_update=config.stream_label_update,
+        lease_lost=config.lease_lost,
+    )
+
+  def run(self, migration_mode: MigrationMode):
+    self.get_create_table_ddl()
+    if self.copy_method != CopyMethod.BACKFILL:
+      self.get_copy_rows_sql()
+
+    if migration_mode in (MigrationMode.CREATE_TABLE, MigrationMode.FULL):
+      # Merging rows into a table that already exists resumes a failed copy.
+      if self.copy_method != CopyMethod.MERGE or not self._table_exists():
+        self.create_table()
+
+    if migration_mode == MigrationMode.FULL:
+      self.copy_rows()
+
+  def discover(self) -> Dict[str, Any]:
+    if self._discover_result is None:
+      self._discover_result = execute_discover(
+          connection_profile_name=self.connection_profile_name,
+          source_type=self.source_type,
+          source_table_name=self.source_table_name,
+          source_schema_name=self.source_schema_name,
+          datastream_api_endpoint_override=self.datastream_api_endpoint_override,
+          filepath=(
+              self.artifact_filepaths.discover_result_filepath
+              if self.artifact_filepaths
+              else None
+          ),
+      )
+    return self._discover_result
+
+  def get_create_table_ddl(self) -> str:
+    if self._create_table_ddl is None:
+      self._create_table_ddl = self._get_table_creator().get_ddl()
+      if self.artifact_filepaths:
+        write(
+            filepath=self.artifact_filepaths.create_target_table_ddl_filepath,
+            data=self._create_table_ddl,
+        )
+    return self._create_table_ddl
+
+  def get_target_table_schema(self) -> TableSchema:
+    return self._get_table_creator().get_table_schema()
+
+  def get_source_table_schema(self) -> Union[DDLParser, TableSchemaParser]:
+    if self._source_table_schema is None:
+      # The Storage APIs copy rows across regions, where querying the DDL of
+      # the existing table in the new table's region doesn't find it.
+      self._source_table_schema = (
+          self._get_source_table_schema_from_api()
+          if self.source_schema_from_api
+          or self.copy_method == CopyMethod.STORAGE_API
+          else self._get_source_table_schema_from_ddl()
+      )
+    return self._source_table_schema
+
+  def get_copy_rows_sql(self) -> str:
+    if self._copy_rows_sql is None:
+      self._copy_rows_sql = self._get_copy_data_sql_generator().get_sql()
+      if self.artifact_filepaths:
+        write(
+            filepath=self.artifact_filepaths.copy_rows_filepath,
+            data=self._copy_rows_sql,
+        )
+    return self._copy_rows_sql
+
+  def create_table(self):
+    if self._table_exists():
+      raise ValueError(f"Table {self._get_target_table_id()} already exists.")
+
+    self._verify_ready_to_write()
+    execute_create_table_ddl(
+        self.get_create_table_ddl(), bigquery_client=self.bigquery_client
+    )
+
+  def copy_rows(self):
+    if self.copy_method == CopyMethod.BACKFILL:
+      if not self.stream_name:
+        raise ValueError(
+            f"stream_name is required by the '{CopyMethod.BACKFILL}' copy"
+            " method."
+        )
+      self._verify_ready_to_write()
+      execute_start_backfill(
+          stream_name=self.stream_name,
+          source_type=self.source_type,
+          source_schema_name=self.source_schema_name,
+          source_table_name=self.source_table_name,
+          datastream_api_endpoint_override=self.datastream_api_endpoint_override,
+      )
+      return
+
+    copy_rows_sql = self.get_copy_rows_sql()
+    self._verify_ready_to_write()
+    execute_copy_table_rows(
+        copy_method=self.copy_method,
+        project_id=self.project_id,
+        source_table_id=self._get_source_table_id(),
+        destination_table_id=self._get_target_table_id(),
+        copy_data_sql_generator=self._get_copy_data_sql_generator(),
+        copy_rows_sql=copy_rows_sql,
+        bigquery_client=self.bigquery_client,
+        merge_bucket_count=self.merge_bucket_count,
+        source_partitioning=self._source_partitioning,
+        partition_ranges=self._partition_ranges,
+        staging_storage=(
+            get_staging_storage(self.staging_uri) if self.staging_uri else None
+        ),
+        extract_format=self.extract_format,
+        load_job_count=self.load_job_count,
+        storage_read_stream_count=self.storage_read_stream_count,
+        storage_write_stream_count=self.storage_write_stream_count,
+    )
+
+  def _verify_ready_to_write(self):
+    if self.stream_label_update:
+      self.stream_label_update.wait()
+    if self.lease_lost is not None and self.lease_lost.is_set():
+      raise RuntimeError(
+          f"Lost the lease on table {self._get_source_table_id()}, stopping"
+          " its migration."
+      )
+
+  # The SQL copies ranges of partitions concurrently when
+  # `partition_range_count` is above 1 and the existing table is partitioned.
+  def _get_copy_data_sql_generator(self) -> CopyDataSQLGenerator:
+    if self._copy_data_sql_generator is None:
+      if self.partition_range_count > 1:
+        self._source_partitioning = get_source_partitioning(
+            execute_get_bigquery_table(
+                self._get_source_table_id(),
+                bigquery_client=self.bigquery_client,
+            )
+        )
+      self._partition_ranges = get_copy_partition_ranges(
+          copy_method=self.copy_method,
+          source_table_id=self._get_source_table_id(),
+          source_partitioning=self._source_partitioning,
+          partition_range_count=self.partition_range_count,
+          bigquery_client=self.bigquery_client,
+      )
+      self._copy_data_sql_generator = CopyDataSQLGenerator(
+          source_bigquery_table_ddl=None,
+          destination_bigquery_table_ddl=None,
+          filepath=None,
+          source_table_schema_parser=self.get_source_table_schema(),
+          destination_table_schema=self.get_target_table_schema(),
+          copy_method=self.copy_method,
+          merge_bucket_count=self.merge_bucket_count,
+          column_filter=self.column_filter,
+          partition_column=(
+              self._source_partitioning.column
+              if self._partition_ranges
+              else None
+          ),
+          sample_percent=self.sample_percent,
+      )
+    return self._copy_data_sql_generator
+
+  def _get_target_table_id(self) -> str:
+    return self._get_table_creator().get_fully_qualified_bigquery_table_name()
+
+  def _table_exists(self) -> bool:
+    return (
+        execute_get_bigquery_table(
+            self._get_target_table_id(), bigquery_client=self.bigquery_client
+        )
+        is not None
+    )
+
+  def _get_table_creator(self) -> BaseCreateTable:
+    if self._table_creator is None:
+      self._table_creator = get_table_creator(
+          single_target_stream=self.single_target_stream,
+          source_type=self.source_type,
+          discover_result_path=None,
+          create_target_table_ddl_filepath=None,
+          source_schema_name=self.source_schema_name,
+          source_table_name=self.source_table_name,
+          project_id=self.project_id,
+          bigquery_max_staleness_seconds=self.bigquery_max_staleness_seconds,
+          bigquery_dataset_name=self.bigquery_target_dataset_name,
+          bigquery_region=self.bigquery_region,
+          bigquery_kms_key_name=self.bigquery_kms_key_name,
+          discover_result=self.discover(),
+          column_filter=self.column_filter,
+          partitioning=self.partitioning,
+      )
+    return self._table_creator
+
+  def _get_source_table_schema_from_ddl(self) -> DDLParser:
+    sql = BigQueryTableDDLFetcher(
+        project_id=self.project_id,
+        dataset=self.bigquery_source_dataset_name,
+        table=self.bigquery_source_table_name,
+        filepath=None,
+    ).get_sql()
+    ddl = execute_fetch_bigquery_table_ddl_sql(
+        sql, bigquery_client=self.bigquery_client
+    )
+    if self.artifact_filepaths:
+      write(
+          filepath=self.artifact_filepaths.create_source_table_ddl_filepath,
+          data=ddl,
+      )
+    return DDLParser(ddl=ddl)
+
+  def _get_source_table_schema_from_api(self) -> TableSchemaParser:
+    source_table_id = self._get_source_table_id()
+    source_table: Table = execute_get_bigquery_table(
+        source_table_id, bigquery_client=self.bigquery_client
+    )
+    if not source_table:
+      raise ValueError(f"Table {source_table_id} doesn't exist.")
+
+    return TableSchemaParser(
+        fully_qualified_table_name=source_table_id, schema=source_table.schema
+    )
+
+  def _get_source_table_id(self) -> str:
+    return (
+        f"{self.project_id}.{self.bigquery_source_dataset_name}."
+        f"{self.bigquery_source_table_name}"
+    )
@@ -0,0 +1,97 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import logging
+import sys
+from batch.rehearsal import REPORT_HEADER, Rehearsal
+from batch.table_scheduler import TableScheduler
+from common.file_writer import write_csv
+from common.monitoring_consts import USER_AGENT
+from common.output_names import REHEARSAL_REPORT_FILEPATH
+from executors.query import set_job_listener
+from google.api_core.gapic_v1.client_info import ClientInfo
+from google.cloud import bigquery
+from migrate_table import migrate_table, wait_for_user_prompt_if_necessary
+from migrate_tables import log_results, migrate_tables
+from migration_config import get_rehearsal_config
+
+logger = logging.getLogger(__name__)
+
+
+# Rehearses the migration of a batch of tables: migrates a sample of each table
+# to a scratch dataset, and extrapolates the duration, slot usage and scanned
+# bytes of migrating the whole tables.
+def main():
+  config: argparse.Namespace = get_rehearsal_config()
+  logger.debug(f"Using config {vars(config)}")
+
+  wait_for_user_prompt_if_necessary(
+      f"Rehearsing the migration of {len(config.tables)} tables on"
+      f" {config.sample_percent} percent of their rows, in dataset"
+      f" '{config.scratch_dataset_name}'",
+      config.force,
+  )
+
+  rehearsal = Rehearsal(
+      migrate=migrate_table,
+      sample_percent=config.sample_percent,
+      bigquery_client=bigquery.Client(
+          client_info=ClientInfo(user_agent=USER_AGENT)
+      ),
+  )
+  set_job_listener(rehearsal.record_job)
+  try:
+    results = migrate_tables(config, fn=rehearsal.rehearse_table)
+  finally:
+    set_job_listener(None)
+  succeeded = log_results(results)
+
+  if not rehearsal.get_tables():
+    logger.error("ERROR: No table was rehearsed.")
+    sys.exit(1)
+
+  write_csv(
+      REHEARSAL_REPORT_FILEPATH,
+      header=REPORT_HEADER,
+      rows=rehearsal.get_report_rows(),
+  )
+  _log_estimate(config, rehearsal)
+
+  if not succeeded:
+    sys.exit(1)
+
+
+def _log_estimate(config: argparse.Namespace, rehearsal: Rehearsal):
+  seconds = rehearsal.estimate_seconds(
+      TableScheduler(
+          max_concurrent_tables=config.max_concurrent_tables,
+          max_concurrent_large_tables=config.max_concurrent_large_tables,
+          large_table_threshold_bytes=config.large_table_threshold_bytes,
+      )
+  )
+  slot_hours = rehearsal.estimate_slot_hours()
+  logger.info(
+      f"Migrating the {len(rehearsal.get_tables())} rehearsed tables with"
+      f" {config.max_concurrent_tables} concurrent tables is estimated to take"
+      f" {seconds / 3600:.2f} hours, {slot_hours:.2f} slot-hours"
+      f" ({slot_hours * 3600 / seconds if seconds else 0:.0f} slots on"
+      " average), and to process"
+      f" {rehearsal.estimate_bytes_processed() / 2**40:.3f} TiB. Per-table"
+      f" statistics are at '{REHEARSAL_REPORT_FILEPATH}'."
+  )
+
+
+if __name__ == "__main__":
+  main()
@@ -13,10 +13,16 @@
 # limitations under the License.
 
 import logging
-from typing import Dict, NamedTuple
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+from common.artifact_manifest import write_artifact
 from common.bigquery_type import BigQueryType
-from common.file_writer import write
+from common.copy_method import CopyMethod
+from common.partitioning import INGESTION_TIME_COLUMN
+from common.plan_cache import get_plan_cache
+from common.stream_object_filter import ColumnFilter
+from common.table_schema import TableSchema
 from sql_generators.copy_rows.ddl_parser import DDLParser
+from sql_generators.copy_rows.table_schema_parser import TableSchemaParser
 
 logger = logging.getLogger(__name__)
 
@@ -28,8 +34,65 @@ COPY_DATA_SQL = (
     ")\n"
     "SELECT\n"
     "  {source_columns}\n"
-    "FROM {source_table};"
+    "FROM {source_table}{partition_range_clause};"
 )
+# Used when the source columns, without the metadata columns, are in the same
+# order as the destination columns. Only the casted columns are listed, so the
+# statement stays short for wide tables.
+COMPACT_COPY_DATA_SQL = (
+    "INSERT INTO {destination_table}\n"
+    "SELECT *{except_clause}{replace_clause}\n"
+    "FROM {source_table}{partition_range_clause};"
+)
+COMPACT_COPY_DATA_EXCEPT_CLAUSE = " EXCEPT({metadata_columns})"
+COMPACT_COPY_DATA_REPLACE_CLAUSE = " REPLACE(\n  {casts}\n)"
+# Used by the append copy method, the results of the query are appended to the
+# destination table by a query job. The columns are selected in the
+# destination's order and named after the destination columns.
+APPEND_COPY_DATA_SQL = (
+    "SELECT\n  {columns}\nFROM {source_table}{partition_range_clause};"
+)
+# Copies a range of the source table's partitions, each range is copied by a
+# separate statement. The filter is on the partitioning column, so only the
+# range's partitions are scanned.
+PARTITION_RANGE_CLAUSE = (
+    "\nWHERE {column} BETWEEN @partition_start AND @partition_end"
+    " OR ({column} IS NULL AND @copy_nulls)"
+)
+# Copies a sample of the source table's storage blocks, when the migration is
+# rehearsed.
+TABLESAMPLE_CLAUSE = " TABLESAMPLE SYSTEM ({percent} PERCENT)"
+# Used by the merge copy method. Rows are matched on the destination's primary
+# key, so running the statement again after a partial failure doesn't
+# duplicate rows.
+MERGE_COPY_DATA_SQL = (
+    "MERGE {destination_table} AS destination\n"
+    "USING (\n"
+    "  SELECT\n"
+    "    {source_columns}\n"
+    "  FROM {source_table}{bucket_clause}\n"
+    ") AS source\n"
+    "ON {key_condition}\n"
+    "{update_clause}"
+    "WHEN NOT MATCHED THEN INSERT (\n"
+    "  {destination_columns}\n"
+    ")\n"
+    "VALUES (\n"
+    "  {insert_values}\n"
+    ");"
+)
+MERGE_UPDATE_CLAUSE = "WHEN MATCHED THEN UPDATE SET\n  {assignments}\n"
+# Splits the rows into `@bucket_count` buckets by the hash of their key, each
+# bucket is merged by a separate statement. MOD is applied before ABS, since ABS
+# overflows for the smallest INT64.
+MERGE_BUCKET_CLAUSE = (
+    "\n  WHERE ABS(MOD(FARM_FINGERPRINT(TO_JSON_STRING(STRUCT({keys}))),"
+    " @bucket_count)) = @bucket"
+)
+# Oracle tables without a primary key are keyed by ROWID in the destination,
+# which Dataflow kept in a metadata column.
+ORACLE_ROW_ID_COLUMN = "ROWID"
+DATAFLOW_ROW_ID_METADATA_COLUMN = "_metadata_row_id"
 
 
 class ColumnSchema(NamedTuple):
@@ -37,6 +100,13 @@ class ColumnSchema(NamedTuple):
   destination: BigQueryType
 
 
+# A destination column, the source column it is copied from and their types.
+class ColumnCast(NamedTuple):
+  destination_column: str
+  source_column: str
+  column_schema: ColumnSchema
+
+
 # This dictionary provides the appropriate casts between tables that were created
 # with Dataflow's "Datastream to BigQuery" template and tables that were created
 # with Datastream's native BigQuery solution.
@@ -84,57 +154,355 @@ class CopyDataSQLGenerator:
 
   def __init__(
       self,
-      source_bigquery_table_ddl: str,
-      destination_bigquery_table_ddl: str,
-      filepath: str,
+      source_bigquery_table_ddl: Optional[str],
+      destination_bigquery_table_ddl: Optional[str],
+      filepath: Optional[str],
+      source_table_schema_parser: Optional[
+          Union[DDLParser, TableSchemaParser]
+      ] = None,
+      destination_table_schema: Optional[TableSchema] = None,
+      copy_method: CopyMethod = CopyMethod.INSERT,
+      merge_bucket_count: int = 1,
+      column_filter: Optional[ColumnFilter] = None,
+      partition_column: Optional[str] = None,
+      sample_percent: Optional[float] = None,
   ):
-    self.source_ddl_parser = DDLParser(source_bigquery_table_ddl)
-    self.destination_ddl_parser = DDLParser(destination_bigquery_table_ddl)
+    # The source schema is either parsed from the table's DDL file, or given
+    # directly, for example from the tables.get API.
+    self.source_table_schema: TableSchema = (
+        source_table_schema_parser or DDLParser(source_bigquery_table_ddl)
+    ).get_table_schema()
+    # The destination schema is either parsed from the generated DDL file, or
+    # given directly when the DDL was generated in memory.
+    self.destination_table_schema: TableSchema = (
+        destination_table_schema
+        or DDLParser(destination_bigquery_table_ddl).get_table_schema()
+    )
     self.filepath = filepath
+    self.copy_method: CopyMethod = copy_method
+    self.merge_bucket_count: int = merge_bucket_count
+    # The source table's partitioning column, when the rows are copied by
+    # partition ranges.
+    self.partition_column: Optional[str] = partition_column
+    if partition_column and copy_method == CopyMethod.MERGE:
+      raise ValueError(
+          f"The '{CopyMethod.MERGE}' copy method splits the rows by merge"
+          " buckets, not by partition ranges."
+      )
+    # Rehearsals only copy a sample of the source table.
+    self.sample_percent: Optional[float] = sample_percent
+    # Columns that the stream doesn't replicate aren't copied.
+    self.excluded_columns: List[str] = [
+        column_name
+        for column_name in self.source_table_schema.get_schema()
+        if column_filter and not column_filter.includes(column_name)
+    ]
+
+  # Returns the SQL without writing it to a file.
+  def get_sql(self) -> str:
+    return self._generate_sql()
+
+  # Number of columns whose values are converted while copying.
+  def get_cast_count(self) -> int:
+    return sum(
+        1
+        for destination_column, source_column in self._get_planned_casts()
+        if source_column != destination_column
+    )
+
+  # The columns that are copied and their types, for copying the rows without
+  # a SQL statement. Names aren't quoted.
+  def get_column_casts(self) -> List[ColumnCast]:
+    column_casts = []
+    destination_schema = self.destination_table_schema.get_schema()
+    for column in self.source_table_schema.get_columns():
+      if column.name in self.excluded_columns:
+        continue
+      if column.name not in destination_schema:
+        raise ValueError(
+            "Column names must match in source and destination, but could not"
+            f" find column name {column.name} in destination table."
+            f" Destination schema is {destination_schema}"
+        )
+      column_casts.append(
+          ColumnCast(
+              destination_column=column.name,
+              source_column=column.name,
+              column_schema=ColumnSchema(
+                  column.column_type.bigquery_type,
+                  destination_schema[column.name],
+              ),
+          )
+      )
+    return column_casts
 
   def generate_sql(self):
-    source_columns = []
-    destination_columns = []
-    for (
-        column_name,
-        source_type,
-    ) in self.source_ddl_parser.get_schema().items():
-      destination_type = self.destination_ddl_parser.get_schema().get(
-          column_name
+    write_artifact(
+        filepath=self.filepath,
+        inputs=self._get_artifact_inputs(),
+        generate=self._generate_sql,
+    )
+
+  # The SQL only depends on the source and destination schemas, it isn't
+  # generated again while they are unchanged.
+  def _get_artifact_inputs(self) -> Dict[str, Any]:
+    return {
+        "source_table": (
+            self.source_table_schema.get_fully_qualified_table_name()
+        ),
+        "source_schema": self.source_table_schema.get_schema(),
+        "destination_table": (
+            self.destination_table_schema.get_fully_qualified_table_name()
+        ),
+        "destination_schema": self.destination_table_schema.get_schema(),
+        "source_metadata_columns": (
+            self.source_table_schema.get_metadata_columns()
+        ),
+        "destination_metadata_columns": (
+            self.destination_table_schema.get_metadata_columns()
+        ),
+        "copy_method": str(self.copy_method),
+        "merge_bucket_count": self.merge_bucket_count,
+        "excluded_columns": self.excluded_columns,
+        "partition_column": self.partition_column,
+        "sample_percent": self.sample_percent,
+    }
+
+  def _generate_sql(self) -> str:
+    cast_plan: List[Tuple[str, str]] = self._get_planned_casts()
+
+    if self.copy_method == CopyMethod.APPEND:
+      sql = self._generate_append_sql(cast_plan)
+    elif self.copy_method == CopyMethod.MERGE:
+      sql = self._generate_merge_sql(cast_plan)
+    elif self._columns_order_match():
+      sql = self._generate_compact_sql(cast_plan)
+    else:
+      sql = self._generate_explicit_sql(cast_plan)
+
+    logger.info(f"Generated copy rows SQL statement:\n'{sql}'")
+    return sql
+
+  # Selecting all the source columns inserts them by position, so they must be
+  # in the destination's order, and the destination must not have other
+  # columns.
+  def _columns_order_match(self) -> bool:
+    source_columns = [
+        column_name
+        for column_name in self.source_table_schema.get_schema()
+        if column_name not in self.excluded_columns
+    ]
+    return not self.destination_table_schema.get_metadata_columns() and (
+        source_columns == list(self.destination_table_schema.get_schema())
+    )
+
+  def _generate_compact_sql(self, cast_plan: List[Tuple[str, str]]) -> str:
+    except_columns = (
+        self.source_table_schema.get_metadata_columns() + self.excluded_columns
+    )
+    casts = [
+        self._alias(source_column, destination_column)
+        for destination_column, source_column in cast_plan
+        if source_column != destination_column
+    ]
+
+    return COMPACT_COPY_DATA_SQL.format(
+        destination_table=self.destination_table_schema.get_fully_qualified_table_name(),
+        except_clause=(
+            COMPACT_COPY_DATA_EXCEPT_CLAUSE.format(
+                metadata_columns=", ".join(f"`{c}`" for c in except_columns)
+            )
+            if except_columns
+            else ""
+        ),
+        replace_clause=(
+            COMPACT_COPY_DATA_REPLACE_CLAUSE.format(casts=",\n  ".join(casts))
+            if casts
+            else ""
+        ),
+        source_table=self._get_source_table(),
+        partition_range_clause=self._get_partition_range_clause(),
+    )
+
+  def _generate_append_sql(self, cast_plan: List[Tuple[str, str]]) -> str:
+    source_columns: Dict[str, str] = dict(cast_plan)
+    destination_columns = [
+        f"`{column_name}`"
+        for column_name in self.destination_table_schema.get_schema()
+    ]
+    return APPEND_COPY_DATA_SQL.format(
+        columns=",\n  ".join(
+            self._alias(source_columns[column], column)
+            for column in destination_columns
+            if column in source_columns
+        ),
+        source_table=self._get_source_table(),
+        partition_range_clause=self._get_partition_range_clause(),
+    )
+
+  def _generate_merge_sql(self, cast_plan: List[Tuple[str, str]]) -> str:
+    cast_plan = cast_plan + self._get_row_id_cast()
+    keys = [
+        f"`{column.name}`"
+        for column in self.destination_table_schema.get_primary_keys()
+    ]
+    if not keys:
+      raise ValueError(
+          "Merging rows requires a primary key, but destination table"
+          f" {self.destination_table_schema.get_fully_qualified_table_name()}"
+          " doesn't have one."
       )
+    source_columns: Dict[str, str] = dict(cast_plan)
+    missing_keys = [key for key in keys if key not in source_columns]
+    if missing_keys:
+      raise ValueError(
+          f"Could not find primary key columns {missing_keys} in source table"
+          f" {self.source_table_schema.get_fully_qualified_table_name()}."
+      )
+    destination_columns = [column for column, _ in cast_plan]
+    non_key_columns = [
+        column for column in destination_columns if column not in keys
+    ]
+
+    return MERGE_COPY_DATA_SQL.format(
+        destination_table=self.destination_table_schema.get_fully_qualified_table_name(),
+        source_columns=",\n    ".join(
+            self._alias(source_column, destination_column)
+            for destination_column, source_column in cast_plan
+        ),
+        source_table=self._get_source_table(),
+        bucket_clause=(
+            MERGE_BUCKET_CLAUSE.format(
+                keys=", ".join(source_columns[key] for key in keys)
+            )
+            if self.merge_bucket_count > 1
+            else ""
+        ),
+        key_condition=" AND ".join(
+            f"destination.{key} = source.{key}" for key in keys
+        ),
+        update_clause=(
+            MERGE_UPDATE_CLAUSE.format(
+                assignments=",\n  ".join(
+                    f"{column} = source.{column}" for column in non_key_columns
+                )
+            )
+            if non_key_columns
+            else ""
+        ),
+        destination_columns=",\n  ".join(destination_columns),
+        insert_values=",\n  ".join(
+            f"source.{column}" for column in destination_columns
+        ),
+    )
+
+  # The destination ROWID column of Oracle tables isn't one of the source
+  # columns, it is copied from Dataflow's row ID metadata column.
+  def _get_row_id_cast(self) -> List[Tuple[str, str]]:
+    if (
+        ORACLE_ROW_ID_COLUMN in self.destination_table_schema.get_schema()
+        and ORACLE_ROW_ID_COLUMN not in self.source_table_schema.get_schema()
+        and DATAFLOW_ROW_ID_METADATA_COLUMN
+        in self.source_table_schema.get_metadata_columns()
+    ):
+      return [
+          (
+              f"`{ORACLE_ROW_ID_COLUMN}`",
+              f"`{DATAFLOW_ROW_ID_METADATA_COLUMN}`",
+          )
+      ]
+    return []
+
+  # Some cast expressions are already aliased to the column name.
+  @staticmethod
+  def _alias(source_column: str, destination_column: str) -> str:
+    if source_column == destination_column:
+      return source_column
+    if source_column.lower().endswith(f" as {destination_column.lower()}"):
+      return source_column
+    return f"{source_column} AS {destination_column}"
+
+  def _generate_explicit_sql(self, cast_plan: List[Tuple[str, str]]) -> str:
+    return COPY_DATA_SQL.format(
+        destination_table=self.destination_table_schema.get_fully_qualified_table_name(),
+        source_columns=",\n  ".join(
+            source_column for _, source_column in cast_plan
+        ),
+        destination_columns=",\n  ".join(
+            destination_column for destination_column, _ in cast_plan
+        ),
+        source_table=self._get_source_table(),
+        partition_range_clause=self._get_partition_range_clause(),
+    )
+
+  def _get_source_table(self) -> str:
+    source_table = self.source_table_schema.get_fully_qualified_table_name()
+    if self.sample_percent is None:
+      return source_table
+    return source_table + TABLESAMPLE_CLAUSE.format(percent=self.sample_percent)
+
+  def _get_partition_range_clause(self) -> str:
+    if not self.partition_column:
+      return ""
+    # The pseudo column of ingestion time partitioned tables isn't quoted.
+    return PARTITION_RANGE_CLAUSE.format(
+        column=(
+            self.partition_column
+            if self.partition_column == INGESTION_TIME_COLUMN
+            else f"`{self.partition_column}`"
+        )
+    )
+
+  # The casts only depend on the source and destination schemas, tables of the
+  # same shape share them and only differ by their table names.
+  def _get_planned_casts(self) -> List[Tuple[str, str]]:
+    return get_plan_cache().get_or_compute(
+        "casts",
+        schemas=[
+            list(self.source_table_schema.get_schema().items()),
+            list(self.destination_table_schema.get_schema().items()),
+            self.excluded_columns,
+        ],
+        compute=self._get_casts,
+        to_json=lambda casts: casts,
+        from_json=lambda casts: [tuple(cast) for cast in casts],
+    )
+
+  # Returns the destination column and the source expression of each column.
+  def _get_casts(self) -> List[Tuple[str, str]]:
+    casts = []
+    destination_schema = self.destination_table_schema.get_schema()
+    for column in self.source_table_schema.get_columns():
+      column_name = column.name
+      if column_name in self.excluded_columns:
+        logger.debug(f"Skipping excluded column '{column_name}'")
+        continue
+      source_type = column.column_type.bigquery_type
+      destination_type = destination_schema.get(column_name)
 
       if not destination_type:
         raise ValueError(
             "Column names must match in source and destination, but could not"
             f" find column name {column_name} in destination table. Destination"
-            f" schema is {self.destination_ddl_parser.get_schema()}"
+            f" schema is {destination_schema}"
         )
       column_name = f"`{column_name}`"
 
-      destination_columns.append(column_name)
-
       if source_type == destination_type:
         logger.debug(f"Type match for column '{column_name}'")
-        source_columns.append(column_name)
+        casts.append((column_name, column_name))
       else:
         logger.debug(
             f"Type mismatch for column '{column_name}': {source_type} == >"
             f" {destination_type}"
         )
-        source_columns.append(
-            COLUMN_SCHEMAS_TO_CAST_EXPRESSION[
-                ColumnSchema(source_type, destination_type)
-            ].format(column_name=column_name)
+        casts.append(
+            (
+                column_name,
+                COLUMN_SCHEMAS_TO_CAST_EXPRESSION[
+                    ColumnSchema(source_type, destination_type)
+                ].format(column_name=column_name),
+            )
         )
 
-    sql = COPY_DATA_SQL.format(
-        destination_table=self.destination_ddl_parser.get_fully_qualified_table_name(),
-        source_columns=",\n  ".join(source_columns),
-        destination_columns=",\n  ".join(destination_columns),
-        source_table=self.source_ddl_parser.get_fully_qualified_table_name(),
-    )
-    logger.info(f"Generated copy rows SQL statement:\n'{sql}'")
-    self._write_to_file(sql)
-
-  def _write_to_file(self, sql):
-    write(filepath=self.filepath, data=sql)
+    return casts
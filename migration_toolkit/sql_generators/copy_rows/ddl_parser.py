@@ -15,31 +15,41 @@
 import logging
 import re
 from re import Match
-from typing import Dict, List
+from typing import Dict, List, Optional
 from common.bigquery_type import BigQueryType
 from common.file_reader import read
+from common.table_schema import TableSchema
 
 logger = logging.getLogger(__name__)
 
 
 class DDLParser:
 
-  def __init__(self, ddl_path):
-    ddl: List[str] = read(ddl_path).split("\n")
+  # The DDL is either read from a file, or given directly.
+  def __init__(self, ddl_path: Optional[str] = None, ddl: Optional[str] = None):
+    if ddl is None:
+      ddl = read(ddl_path)
+    ddl: List[str] = ddl.split("\n")
     # We only care about the `CREATE TABLE` DDL
     if ddl[0].startswith("CREATE SCHEMA"):
       ddl = ddl[1:]
 
-    self._schema: Dict[str, BigQueryType] = self._to_schema(ddl)
-    self._fully_qualified_table_name = self._to_fully_qualified_table_name(
-        ddl[0]
+    columns: List[str] = self._to_columns(ddl)
+    self._table_schema: TableSchema = TableSchema.from_schema(
+        fully_qualified_table_name=self._to_fully_qualified_table_name(ddl[0]),
+        schema=self._to_dict(columns),
+        metadata_columns=self._to_metadata_columns(columns),
+        primary_keys=self._to_primary_keys(ddl),
     )
 
+  def get_table_schema(self) -> TableSchema:
+    return self._table_schema
+
   def get_schema(self) -> Dict[str, BigQueryType]:
-    return self._schema
+    return self._table_schema.get_schema()
 
   def get_fully_qualified_table_name(self):
-    return self._fully_qualified_table_name
+    return self._table_schema.get_fully_qualified_table_name()
 
   @staticmethod
   def _to_fully_qualified_table_name(ddl: str) -> str:
@@ -48,7 +58,7 @@ class DDLParser:
       return match.group(1)
 
   @staticmethod
-  def _to_schema(ddl: List[str]) -> Dict[str, BigQueryType]:
+  def _to_columns(ddl: List[str]) -> List[str]:
     ddl = [line.strip() for line in ddl]
     columns_start_index = ddl.index("(")
 
@@ -66,9 +76,7 @@ class DDLParser:
     if "PRIMARY KEY" in ddl[columns_end_index - 1]:
       columns_end_index -= 1
 
-    schema = ddl[columns_start_index + 1 : columns_end_index]
-
-    return DDLParser._to_dict(schema)
+    return ddl[columns_start_index + 1 : columns_end_index]
 
   @staticmethod
   def _to_dict(schema):
@@ -77,7 +85,7 @@ class DDLParser:
       column = DDLParser._strip_trailing_comma(column.strip())
       name: str = DDLParser._column_name(column)
 
-      if DDLParser._is_metadata_column(name):
+      if DDLParser.is_metadata_column(name):
         logger.debug(f"Skipping metadata column {column}")
         continue
 
@@ -92,25 +100,51 @@ class DDLParser:
 
     return d
 
+  @staticmethod
+  def _to_metadata_columns(schema: List[str]) -> List[str]:
+    names = [
+        DDLParser._column_name(DDLParser._strip_trailing_comma(column.strip()))
+        for column in schema
+    ]
+    return [name for name in names if DDLParser.is_metadata_column(name)]
+
+  @staticmethod
+  def _to_primary_keys(ddl: List[str]) -> List[str]:
+    for line in ddl:
+      match: Match = re.match("PRIMARY KEY\\s*\\((.*)\\)", line.strip())
+      if match:
+        return [key.strip().strip("`") for key in match.group(1).split(",")]
+    return []
+
   @staticmethod
   def _strip_trailing_comma(s: str):
     return s[:-1] if s[-1] == "," else s
 
   @staticmethod
-  def _is_metadata_column(column: str):
+  def is_metadata_column(column: str):
     return column.startswith("_metadata_") or column == "datastream_metadata"
 
   @staticmethod
   def _column_schema(column: str) -> BigQueryType:
     column_schema = column.split()[1:]
-    if column_schema[0].startswith("NUMERIC"):
+    return DDLParser.to_bigquery_type(column_schema[0])
+
+  # Parameterized types, such as `NUMERIC(10, 2)`, and typed arrays and structs,
+  # such as `ARRAY<STRING>`, map to their base type.
+  @staticmethod
+  def to_bigquery_type(column_type: str) -> BigQueryType:
+    if column_type.startswith("ARRAY<"):
+      return BigQueryType.ARRAY
+    elif column_type.startswith("STRUCT<"):
+      return BigQueryType.STRUCT
+    elif column_type.startswith("NUMERIC"):
       return BigQueryType.NUMERIC
-    elif column_schema[0].startswith("BIGNUMERIC"):
+    elif column_type.startswith("BIGNUMERIC"):
       return BigQueryType.BIGNUMERIC
-    elif column_schema[0].startswith("STRING"):
+    elif column_type.startswith("STRING"):
       return BigQueryType.STRING
     else:
-      return BigQueryType(column_schema[0])
+      return BigQueryType(column_type)
 
   @staticmethod
   def _column_name(column: str):
@@ -0,0 +1,85 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from typing import Dict, List
+from common.bigquery_type import BigQueryType
+from common.table_schema import TableSchema
+from google.cloud.bigquery import SchemaField
+from sql_generators.copy_rows.ddl_parser import DDLParser
+
+logger = logging.getLogger(__name__)
+
+
+# The tables.get API reports some types by their legacy SQL names.
+LEGACY_TYPE_TO_BIGQUERY_TYPE: Dict[str, BigQueryType] = {
+    "INTEGER": BigQueryType.INT64,
+    "FLOAT": BigQueryType.FLOAT64,
+    "BOOLEAN": BigQueryType.BOOL,
+    "RECORD": BigQueryType.STRUCT,
+}
+
+
+# Builds the same schema as `DDLParser`, from the typed schema returned by the
+# tables.get API instead of the table's DDL.
+class TableSchemaParser:
+
+  def __init__(
+      self, fully_qualified_table_name: str, schema: List[SchemaField]
+  ):
+    self._table_schema: TableSchema = TableSchema.from_schema(
+        fully_qualified_table_name=fully_qualified_table_name,
+        schema=self._to_schema(schema),
+        metadata_columns=[
+            field.name
+            for field in schema
+            if DDLParser.is_metadata_column(field.name)
+        ],
+    )
+
+  def get_table_schema(self) -> TableSchema:
+    return self._table_schema
+
+  def get_schema(self) -> Dict[str, BigQueryType]:
+    return self._table_schema.get_schema()
+
+  def get_fully_qualified_table_name(self):
+    return self._table_schema.get_fully_qualified_table_name()
+
+  @staticmethod
+  def _to_schema(schema: List[SchemaField]) -> Dict[str, BigQueryType]:
+    d = {}
+    for field in schema:
+      if DDLParser.is_metadata_column(field.name):
+        logger.debug(f"Skipping metadata column {field.name}")
+        continue
+
+      d[field.name] = TableSchemaParser._column_schema(field)
+
+    return d
+
+  @staticmethod
+  def _column_schema(field: SchemaField) -> BigQueryType:
+    if field.mode == "REPEATED":
+      return BigQueryType.ARRAY
+
+    field_type = field.field_type.upper()
+    try:
+      return LEGACY_TYPE_TO_BIGQUERY_TYPE.get(field_type) or BigQueryType(
+          field_type
+      )
+    except ValueError:
+      raise ValueError(
+          f"Unsupported type '{field.field_type}' of column '{field.name}'"
+      )
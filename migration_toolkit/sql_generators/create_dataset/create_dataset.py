@@ -0,0 +1,83 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from typing import Any, Dict, Optional
+from common.artifact_manifest import write_artifact
+
+logger = logging.getLogger(__name__)
+
+
+# Generates the DDL of a dataset created by a dynamic datasets stream, with the
+# location and KMS key of the stream's dataset template.
+class CreateDatasetDDLGenerator:
+  CREATE_DATASET_DDL_TEMPLATE = (
+      "CREATE SCHEMA IF NOT EXISTS `{dataset_name}`"
+      " OPTIONS(location='{location}')"
+  )
+  CREATE_DATASET_DDL_WITH_KMS_TEMPLATE = (
+      "CREATE SCHEMA IF NOT EXISTS `{dataset_name}`"
+      " OPTIONS(location='{location}', default_kms_key_name='{kms_key_name}')"
+  )
+
+  def __init__(
+      self,
+      project_id: str,
+      dataset_name: str,
+      bigquery_region: str,
+      bigquery_kms_key_name: Optional[str],
+      filepath: Optional[str] = None,
+  ):
+    self.project_id = project_id
+    self.dataset_name = dataset_name
+    self.bigquery_region = bigquery_region
+    self.bigquery_kms_key_name = bigquery_kms_key_name
+    self.filepath = filepath
+
+  # Returns the DDL without writing it to a file.
+  def get_ddl(self) -> str:
+    return self._generate_ddl()
+
+  def generate_ddl(self):
+    write_artifact(
+        filepath=self.filepath,
+        inputs=self._get_artifact_inputs(),
+        generate=lambda: self._generate_ddl() + ";",
+    )
+
+  def _get_artifact_inputs(self) -> Dict[str, Any]:
+    return {
+        "project_id": self.project_id,
+        "dataset_name": self.dataset_name,
+        "region": self.bigquery_region,
+        "kms_key_name": self.bigquery_kms_key_name,
+    }
+
+  def _generate_ddl(self) -> str:
+    fully_qualified_dataset_name = self.project_id + "." + self.dataset_name
+
+    if self.bigquery_kms_key_name:
+      create_dataset_ddl = self.CREATE_DATASET_DDL_WITH_KMS_TEMPLATE.format(
+          dataset_name=fully_qualified_dataset_name,
+          location=self.bigquery_region,
+          kms_key_name=self.bigquery_kms_key_name,
+      )
+    else:
+      create_dataset_ddl = self.CREATE_DATASET_DDL_TEMPLATE.format(
+          dataset_name=fully_qualified_dataset_name,
+          location=self.bigquery_region,
+      )
+
+    logger.info(f"Generated create dataset DDL: {create_dataset_ddl}")
+    return create_dataset_ddl
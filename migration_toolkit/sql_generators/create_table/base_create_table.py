@@ -12,12 +12,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from abc import ABC
+from abc import ABC, abstractmethod
 import logging
-import re
-from typing import Dict, List, Union
-from common.file_writer import write
+from typing import Any, Dict, List, Optional, Union
+from common.artifact_manifest import write_artifact
+from common.bigquery_type import BigQueryType
+from common.partitioning import Partitioning
+from common.plan_cache import get_plan_cache
 from common.source_type import SourceType
+from common.stream_object_filter import ColumnFilter
+from common.table_schema import Column, ColumnType, SourceColumn, TableSchema
 from sql_generators.create_table.column_converters.base_bigquery_column_converter import BaseBigQueryColumnConverter
 from sql_generators.create_table.column_converters.mysql_to_bigquery_column_converter import MySqlBigQueryColumnConverter
 from sql_generators.create_table.column_converters.oracle_to_bigquery_column_converter import OracleBigQueryColumnConverter
@@ -33,6 +37,7 @@ class BaseCreateTable(ABC):
       "  {columns},\n"
       "  PRIMARY KEY({primary_keys}) NOT ENFORCED\n"
       ")\n"
+      "{partition_clause}"
       "CLUSTER BY {clustering_keys}\n"
       "OPTIONS(\n"
       "  max_staleness=MAKE_INTERVAL(0, 0, 0, 0, 0, {max_staleness})\n"
@@ -43,25 +48,32 @@ class BaseCreateTable(ABC):
       "(\n"
       "  {columns}\n"
       ")\n"
+      "{partition_clause}"
       " OPTIONS(\n"
       "  max_staleness=MAKE_INTERVAL(0, 0, 0, 0, 0, {max_staleness})\n"
       ");"
   )
+  PARTITION_CLAUSE_TEMPLATE = "PARTITION BY {expression}\n"
 
   def __init__(
       self,
       source_type: SourceType,
-      discover_result_path: str,
-      create_target_table_ddl_filepath: str,
+      discover_result_path: Optional[str],
+      create_target_table_ddl_filepath: Optional[str],
       source_schema_name: str,
       source_table_name: str,
       project_id: str,
       bigquery_max_staleness_seconds: int,
       fully_qualified_bigquery_table_name: str,
+      discover_result: Optional[Dict[str, Any]] = None,
+      column_filter: Optional[ColumnFilter] = None,
+      partitioning: Optional[Partitioning] = None,
   ):
     self.source_type: SourceType = source_type
     self.discover_result_parser: DiscoverResultParser = DiscoverResultParser(
-        discover_result_path=discover_result_path, source_type=source_type
+        discover_result_path=discover_result_path,
+        source_type=source_type,
+        discover_result=discover_result,
     )
     self.create_target_table_ddl_filepath = create_target_table_ddl_filepath
     self.source_schema_name: str = source_schema_name
@@ -71,26 +83,104 @@ class BaseCreateTable(ABC):
     self.fully_qualified_bigquery_table_name: str = (
         fully_qualified_bigquery_table_name
     )
+    self.column_filter: Optional[ColumnFilter] = column_filter
+    self.partitioning: Optional[Partitioning] = partitioning
+    self._table_schema: Optional[TableSchema] = None
 
   def get_fully_qualified_bigquery_table_name(self):
     return self.fully_qualified_bigquery_table_name
 
-  def _generate_create_table_ddl(
-      self,
-  ):
-    source_table: List[Dict[str, Union[str, int]]] = (
-        self.discover_result_parser.get_table(
-            schema_name=self.source_schema_name,
-            table_name=self.source_table_name,
-        )
+  # Returns the DDL without writing it to a file.
+  def get_ddl(self) -> str:
+    return self._generate_ddl()
+
+  # Returns the schema of the generated table, without parsing it back from the
+  # DDL.
+  def get_table_schema(self) -> TableSchema:
+    if self._table_schema is None:
+      self._table_schema = TableSchema(
+          fully_qualified_table_name=self.fully_qualified_bigquery_table_name,
+          columns=self._get_planned_bigquery_columns(),
+      )
+    return self._table_schema
+
+  # Returns the source columns whose type the new table's column doesn't map.
+  def get_unmapped_source_columns(self) -> List[SourceColumn]:
+    converter = self._get_column_converter()
+    return [
+        column
+        for column in self._get_source_columns()
+        if not converter.is_mapped(column)
+    ]
+
+  def generate_ddl(self):
+    write_artifact(
+        filepath=self.create_target_table_ddl_filepath,
+        inputs=self._get_artifact_inputs(),
+        generate=self._generate_ddl,
     )
-    bigquery_columns: List[str] = self._get_bigquery_columns(
-        source_table=source_table
+
+  @abstractmethod
+  def _generate_ddl(self) -> str:
+    pass
+
+  # The DDL only depends on the table's discover result and the stream's
+  # options, it isn't generated again while they are unchanged.
+  def _get_artifact_inputs(self) -> Dict[str, Any]:
+    return {
+        "generator": type(self).__name__,
+        "source_type": str(self.source_type),
+        "source_table": self._get_source_table(),
+        "table_name": self.fully_qualified_bigquery_table_name,
+        "max_staleness_seconds": self.bigquery_max_staleness_seconds,
+        "partitioning": (
+            self.partitioning.to_json() if self.partitioning else None
+        ),
+    }
+
+  # Columns that the stream doesn't replicate aren't part of the table.
+  def _get_source_table(self) -> List[Dict[str, Union[str, int]]]:
+    source_table = self.discover_result_parser.get_table(
+        schema_name=self.source_schema_name,
+        table_name=self.source_table_name,
     )
+    if not self.column_filter:
+      return source_table
 
-    bigquery_primary_keys: List[str] = self._get_primary_keys(
-        source_table, bigquery_columns
+    return [
+        column
+        for column in source_table
+        if self.column_filter.includes(column["column"])
+    ]
+
+  # The converted columns only depend on the source columns, tables of the same
+  # shape share them.
+  def _get_planned_bigquery_columns(self) -> List[Column]:
+    return get_plan_cache().get_or_compute(
+        "bigquery_columns",
+        schemas=[str(self.source_type), self._get_source_table()],
+        compute=lambda: self._get_bigquery_columns(self._get_source_columns()),
+        to_json=lambda columns: [column.to_json() for column in columns],
+        from_json=lambda columns: [Column.from_json(c) for c in columns],
     )
+
+  def _get_source_columns(self) -> List[SourceColumn]:
+    return [
+        SourceColumn.from_discover(column)
+        for column in self._get_source_table()
+    ]
+
+  def _generate_create_table_ddl(
+      self,
+  ):
+    table_schema: TableSchema = self.get_table_schema()
+    bigquery_columns: List[str] = [
+        f"`{column.name}` {column.column_type}"
+        for column in table_schema.get_columns()
+    ]
+    bigquery_primary_keys: List[str] = [
+        f"`{column.name}`" for column in table_schema.get_primary_keys()
+    ]
     logger.debug(f"BigQuery table columns are {bigquery_columns}")
     logger.debug(
         f"BigQuery table primary key columns are {bigquery_primary_keys}"
@@ -106,6 +196,15 @@ class BaseCreateTable(ABC):
         f" {self.bigquery_max_staleness_seconds} seconds"
     )
 
+    partition_clause = (
+        BaseCreateTable.PARTITION_CLAUSE_TEMPLATE.format(
+            expression=self.partitioning.get_expression(table_schema)
+        )
+        if self.partitioning
+        else ""
+    )
+    logger.debug(f"BigQuery table partitioning is {self.partitioning}")
+
     bigquery_columns = ",\n  ".join(bigquery_columns)
 
     if bigquery_primary_keys:
@@ -114,6 +213,7 @@ class BaseCreateTable(ABC):
               table_name=self.fully_qualified_bigquery_table_name,
               columns=bigquery_columns,
               primary_keys=", ".join(bigquery_primary_keys),
+              partition_clause=partition_clause,
               clustering_keys=", ".join(bigquery_clustering_keys),
               max_staleness=self.bigquery_max_staleness_seconds,
           )
@@ -123,6 +223,7 @@ class BaseCreateTable(ABC):
           BaseCreateTable.CREATE_TABLE_WITHOUT_PRIMARY_KEYS_DDL_TEMPLATE.format(
               table_name=self.fully_qualified_bigquery_table_name,
               columns=bigquery_columns,
+              partition_clause=partition_clause,
               max_staleness=self.bigquery_max_staleness_seconds,
           )
       )
@@ -131,56 +232,41 @@ class BaseCreateTable(ABC):
 
     return create_table_ddl
 
-  def _write_to_file(self, ddl: str):
-    write(filepath=self.create_target_table_ddl_filepath, data=ddl)
-
-  def _get_primary_keys(
-      self,
-      source_table: List[Dict[str, Union[str, int]]],
-      bigquery_columns: List[str],
-  ) -> List[str]:
-    primary_keys = [
-        f"`{self._clean_column_name(column['column'])}`"
-        for column in source_table
-        if column.get("primaryKey") is True
-    ]
-
-    # For Oracle source, we use ROWID as primary key if no primary key is provided.
-    if len(primary_keys) == 0 and self.source_type == SourceType.ORACLE:
-      primary_keys = ["`ROWID`"]
-      bigquery_columns.append("`ROWID` STRING")
-
-    return primary_keys
-
   @staticmethod
   def _get_clustering_keys(primary_keys: List[str]) -> List[str]:
     return primary_keys if len(primary_keys) <= 4 else primary_keys[:4]
 
-  def _get_bigquery_columns(
-      self, source_table: List[Dict[str, Union[str, int]]]
-  ) -> List[str]:
-    bigquery_columns: List[str] = []
-
-    converter: BaseBigQueryColumnConverter
+  def _get_column_converter(self) -> BaseBigQueryColumnConverter:
     if self.source_type == SourceType.MYSQL:
-      converter = MySqlBigQueryColumnConverter()
-    else:
-      if self.source_type != SourceType.ORACLE:
-        raise AssertionError(f"Unexpected source type: {self.source_type}")
-      converter = OracleBigQueryColumnConverter()
-
-    for column in source_table:
-      column_name = self._clean_column_name(column["column"])
-      column_type = converter.convert(column)
+      return MySqlBigQueryColumnConverter()
+    if self.source_type != SourceType.ORACLE:
+      raise AssertionError(f"Unexpected source type: {self.source_type}")
+    return OracleBigQueryColumnConverter()
 
-      bigquery_columns.append(f"`{column_name}` {column_type}")
+  def _get_bigquery_columns(
+      self, source_columns: List[SourceColumn]
+  ) -> List[Column]:
+    converter = self._get_column_converter()
 
-    return bigquery_columns
+    bigquery_columns: List[Column] = [
+        Column(
+            name=column.cleaned_name,
+            column_type=converter.convert(column),
+            primary_key=column.primary_key,
+        )
+        for column in source_columns
+    ]
 
-  @staticmethod
-  def _clean_column_name(column_name):
-    cleaned_name = str(re.sub("[^\\w]", "_", column_name, flags=re.ASCII))
-    if cleaned_name[0].isdigit():
-      return f"_{cleaned_name}"
+    # For Oracle source, we use ROWID as primary key if no primary key is provided.
+    if self.source_type == SourceType.ORACLE and not any(
+        column.primary_key for column in bigquery_columns
+    ):
+      bigquery_columns.append(
+          Column(
+              name="ROWID",
+              column_type=ColumnType(BigQueryType.STRING),
+              primary_key=True,
+          )
+      )
 
-    return cleaned_name
+    return bigquery_columns
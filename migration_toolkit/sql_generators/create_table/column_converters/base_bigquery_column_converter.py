@@ -13,8 +13,8 @@
 # limitations under the License.
 
 from abc import ABC, abstractmethod
-from typing import Dict, Union
 from common.bigquery_type import BigQueryType
+from common.table_schema import ColumnType, SourceColumn
 
 # Taken from https://cloud.google.com/bigquery/docs/reference/standard-sql/data-types#decimal_types
 BIGQUERY_NUMERIC_MAX_SCALE = 9
@@ -30,22 +30,24 @@ BIGQUERY_INT64_MAX_PRECISION = 18
 class BaseBigQueryColumnConverter(ABC):
 
   @abstractmethod
-  def convert(self, mysql_column: Dict[str, Union[str, int]]) -> str:
+  def convert(self, column: SourceColumn) -> ColumnType:
     raise NotImplementedError
 
+  # Columns of types without a mapping are converted to STRING.
+  def is_mapped(self, column: SourceColumn) -> bool:
+    return True
+
   @staticmethod
-  def _to_bigquery_decimal(
-      precision: int, scale: int
-  ) -> Union[BigQueryType, str]:
+  def _to_bigquery_decimal(precision: int, scale: int) -> ColumnType:
     if (
         scale <= BIGQUERY_NUMERIC_MAX_SCALE
         and (precision - scale) <= BIGQUERY_NUMERIC_PRECISION_TO_SCALE_MAX_DIFF
     ):
-      return BigQueryType.NUMERIC.with_precision_and_scale(precision, scale)
+      return ColumnType(BigQueryType.NUMERIC, precision, scale)
     if (
         scale <= BIGQUERY_BIGNUMERIC_MAX_SCALE
         and (precision - scale)
         <= BIGQUERY_BIGNUMERIC_PRECISION_TO_SCALE_MAX_DIFF
     ):
-      return BigQueryType.BIGNUMERIC.with_precision_and_scale(precision, scale)
-    return BigQueryType.STRING
+      return ColumnType(BigQueryType.BIGNUMERIC, precision, scale)
+    return ColumnType(BigQueryType.STRING)
@@ -12,10 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from collections import defaultdict
 import logging
-from typing import Dict, Union
+from typing import Dict
 from common.bigquery_type import BigQueryType
+from common.table_schema import ColumnType, SourceColumn
 from sql_generators.create_table.column_converters.base_bigquery_column_converter import BaseBigQueryColumnConverter
 
 logger = logging.getLogger(__name__)
@@ -23,68 +23,69 @@ logger = logging.getLogger(__name__)
 
 class MySqlBigQueryColumnConverter(BaseBigQueryColumnConverter):
   # Taken from https://cloud.google.com/datastream/docs/destination-bigquery#map_data_types
-  MYSQL_TYPE_TO_BIGQUERY_TYPE: defaultdict[str, BigQueryType] = defaultdict(
-      lambda: _log_and_fallback(),
-      {
-          "BIGINT": BigQueryType.INT64,
-          "BINARY": BigQueryType.STRING,
-          "BIT": BigQueryType.INT64,
-          "BLOB": BigQueryType.STRING,
-          "BOOL": BigQueryType.INT64,
-          "CHAR": BigQueryType.STRING,
-          "DATE": BigQueryType.DATE,
-          "DATETIME": BigQueryType.DATETIME,
-          "DOUBLE": BigQueryType.FLOAT64,
-          "ENUM": BigQueryType.STRING,
-          "FLOAT": BigQueryType.FLOAT64,
-          "INTEGER": BigQueryType.INT64,
-          "INT": BigQueryType.INT64,
-          "JSON": BigQueryType.JSON,
-          "LONGBLOB": BigQueryType.STRING,
-          "LONGTEXT": BigQueryType.STRING,
-          "MEDIUMBLOB": BigQueryType.STRING,
-          "MEDIUMINT": BigQueryType.INT64,
-          "MEDIUMTEXT": BigQueryType.STRING,
-          "SET": BigQueryType.STRING,
-          "SMALLINT": BigQueryType.INT64,
-          "TEXT": BigQueryType.STRING,
-          "TIME": BigQueryType.INTERVAL,
-          "TIMESTAMP": BigQueryType.TIMESTAMP,
-          "TINYBLOB": BigQueryType.STRING,
-          "TINYINT": BigQueryType.INT64,
-          "TINYTEXT": BigQueryType.STRING,
-          "VARBINARY": BigQueryType.STRING,
-          "VARCHAR": BigQueryType.STRING,
-          "YEAR": BigQueryType.INT64,
-      },
-  )
+  # Other types fall back to STRING.
+  MYSQL_TYPE_TO_BIGQUERY_TYPE: Dict[str, BigQueryType] = {
+      "BIGINT": BigQueryType.INT64,
+      "BINARY": BigQueryType.STRING,
+      "BIT": BigQueryType.INT64,
+      "BLOB": BigQueryType.STRING,
+      "BOOL": BigQueryType.INT64,
+      "CHAR": BigQueryType.STRING,
+      "DATE": BigQueryType.DATE,
+      "DATETIME": BigQueryType.DATETIME,
+      "DOUBLE": BigQueryType.FLOAT64,
+      "ENUM": BigQueryType.STRING,
+      "FLOAT": BigQueryType.FLOAT64,
+      "INTEGER": BigQueryType.INT64,
+      "INT": BigQueryType.INT64,
+      "JSON": BigQueryType.JSON,
+      "LONGBLOB": BigQueryType.STRING,
+      "LONGTEXT": BigQueryType.STRING,
+      "MEDIUMBLOB": BigQueryType.STRING,
+      "MEDIUMINT": BigQueryType.INT64,
+      "MEDIUMTEXT": BigQueryType.STRING,
+      "SET": BigQueryType.STRING,
+      "SMALLINT": BigQueryType.INT64,
+      "TEXT": BigQueryType.STRING,
+      "TIME": BigQueryType.INTERVAL,
+      "TIMESTAMP": BigQueryType.TIMESTAMP,
+      "TINYBLOB": BigQueryType.STRING,
+      "TINYINT": BigQueryType.INT64,
+      "TINYTEXT": BigQueryType.STRING,
+      "VARBINARY": BigQueryType.STRING,
+      "VARCHAR": BigQueryType.STRING,
+      "YEAR": BigQueryType.INT64,
+  }
 
-  def convert(
-      self, column: Dict[str, Union[str, int]]
-  ) -> Union[str, BigQueryType]:
-    mysql_type = column["dataType"].upper()
+  def convert(self, column: SourceColumn) -> ColumnType:
+    mysql_type = column.data_type
 
     if mysql_type == "DECIMAL":
       bigquery_type = self._convert_mysql_decimal(column)
+    elif self.is_mapped(column):
+      bigquery_type = ColumnType(
+          MySqlBigQueryColumnConverter.MYSQL_TYPE_TO_BIGQUERY_TYPE[mysql_type]
+      )
     else:
-      bigquery_type = MySqlBigQueryColumnConverter.MYSQL_TYPE_TO_BIGQUERY_TYPE[
-          mysql_type
-      ]
+      bigquery_type = ColumnType(_log_and_fallback())
 
     logger.debug(
         f"Converted column to BigQuery type: {column} ==> {bigquery_type}"
     )
     return bigquery_type
 
-  def _convert_mysql_decimal(
-      self, mysql_column: Dict[str, Union[str, int]]
-  ) -> Union[str, BigQueryType]:
-    precision = mysql_column.get("precision", None)
-    if precision is None:
-      return BigQueryType.BIGNUMERIC
+  def is_mapped(self, column: SourceColumn) -> bool:
+    return (
+        column.data_type == "DECIMAL"
+        or column.data_type
+        in MySqlBigQueryColumnConverter.MYSQL_TYPE_TO_BIGQUERY_TYPE
+    )
+
+  def _convert_mysql_decimal(self, mysql_column: SourceColumn) -> ColumnType:
+    if mysql_column.precision is None:
+      return ColumnType(BigQueryType.BIGNUMERIC)
 
-    scale = mysql_column["scale"]
-    return self._to_bigquery_decimal(precision, scale)
+    return self._to_bigquery_decimal(mysql_column.precision, mysql_column.scale)
 
 
 def _log_and_fallback():
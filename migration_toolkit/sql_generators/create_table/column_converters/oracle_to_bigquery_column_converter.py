@@ -14,8 +14,8 @@
 
 from collections import defaultdict
 import logging
-from typing import Dict, Union
 from common.bigquery_type import BigQueryType
+from common.table_schema import ColumnType, SourceColumn
 from sql_generators.create_table.column_converters.base_bigquery_column_converter import BIGQUERY_BIGNUMERIC_MAX_PRECISION, BIGQUERY_INT64_MAX_PRECISION, BaseBigQueryColumnConverter
 
 logger = logging.getLogger(__name__)
@@ -48,10 +48,8 @@ class OracleBigQueryColumnConverter(BaseBigQueryColumnConverter):
       },
   )
 
-  def convert(
-      self, column: Dict[str, Union[str, int]]
-  ) -> Union[str, BigQueryType]:
-    oracle_type = column["dataType"].upper()
+  def convert(self, column: SourceColumn) -> ColumnType:
+    oracle_type = column.data_type
 
     if oracle_type == "NUMBER":
       bigquery_type = self._convert_oracle_number(column)
@@ -59,7 +57,7 @@ class OracleBigQueryColumnConverter(BaseBigQueryColumnConverter):
       # TIMESTAMP(*) and TIMESTAMP(*) WITH TIME ZONE are converted to BigQuery TIMESTAMP
       if oracle_type.startswith("TIMESTAMP"):
         oracle_type = "TIMESTAMP"
-      bigquery_type = (
+      bigquery_type = ColumnType(
           OracleBigQueryColumnConverter.ORACLE_TYPE_TO_BIGQUERY_TYPE[
               oracle_type
           ]
@@ -70,24 +68,22 @@ class OracleBigQueryColumnConverter(BaseBigQueryColumnConverter):
     )
     return bigquery_type
 
-  def _convert_oracle_number(
-      self, oracle_column: Dict[str, Union[str, int]]
-  ) -> Union[str, BigQueryType]:
-    if not oracle_column.get("precision"):
-      return BigQueryType.STRING
+  def _convert_oracle_number(self, oracle_column: SourceColumn) -> ColumnType:
+    if not oracle_column.precision:
+      return ColumnType(BigQueryType.STRING)
 
-    precision = oracle_column["precision"]
-    scale = oracle_column.get("scale", 0)
+    precision = oracle_column.precision
+    scale = oracle_column.scale or 0
 
     if scale <= 0:
       if precision <= BIGQUERY_INT64_MAX_PRECISION:
-        return BigQueryType.INT64
+        return ColumnType(BigQueryType.INT64)
       elif precision <= BIGQUERY_BIGNUMERIC_MAX_PRECISION:
         return self._to_bigquery_decimal(precision, scale)
       else:
-        return BigQueryType.STRING
+        return ColumnType(BigQueryType.STRING)
     else:
       if precision <= BIGQUERY_BIGNUMERIC_MAX_PRECISION:
         return self._to_bigquery_decimal(precision, scale)
       else:
-        return BigQueryType.STRING
+        return ColumnType(BigQueryType.STRING)
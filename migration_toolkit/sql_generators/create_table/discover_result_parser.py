@@ -14,12 +14,17 @@
 
 import json
 import logging
-from typing import Dict, List, Union
+from typing import Any, Dict, List, Optional, Union
 from common.source_type import SourceType
 
 logger = logging.getLogger(__name__)
 
 
+# The source database or table isn't in the discover result.
+class SourceTableNotFoundError(KeyError):
+  pass
+
+
 class DiscoverResultParser:
   SOURCE_TYPE_TO_RDBMS: Dict[SourceType, str] = {
       SourceType.MYSQL: "mysqlRdbms",
@@ -42,20 +47,30 @@ class DiscoverResultParser:
       SourceType.ORACLE: "oracleColumns",
   }
 
+  # The discover result is either loaded from a file, or given directly.
   def __init__(
       self,
-      discover_result_path: str,
+      discover_result_path: Optional[str],
       source_type: SourceType,
+      discover_result: Optional[Dict[str, Any]] = None,
   ):
-    self.discover_result_path: str = discover_result_path
+    self.discover_result_path: Optional[str] = discover_result_path
     self.source_type: SourceType = source_type
-    self.discover_result = self._load_discover_result()
+    self.discover_result = self._load_discover_result(discover_result)
+
+  def _load_discover_result(self, discover_result: Optional[Dict[str, Any]]):
+    if discover_result is None:
+      discover_result = self._read_discover_result()
 
-  def _load_discover_result(self):
+    return discover_result[self.SOURCE_TYPE_TO_RDBMS[self.source_type]][
+        self.SOURCE_TYPE_TO_SCHEMAS[self.source_type]
+    ]
+
+  def _read_discover_result(self) -> Dict[str, Any]:
     logger.debug(f"Loading '{self.discover_result_path}'..")
     with open(self.discover_result_path, "r") as f:
       try:
-        discover_result = json.load(f)
+        return json.load(f)
       except Exception as ex:
         raise TypeError(
             ex,
@@ -64,10 +79,6 @@ class DiscoverResultParser:
             " `discover.py` and try again.",
         )
 
-    return discover_result[self.SOURCE_TYPE_TO_RDBMS[self.source_type]][
-        self.SOURCE_TYPE_TO_SCHEMAS[self.source_type]
-    ]
-
   def list_schemas(self) -> List[str]:
     return [
         d[self.SOURCE_TYPE_TO_SCHEMA[self.source_type]]
@@ -107,7 +118,7 @@ class DiscoverResultParser:
 
     if not schema:
       available_schemas = self.list_schemas()
-      raise KeyError(
+      raise SourceTableNotFoundError(
           f"Source database `{schema_name}` does not appear in the discover"
           " result, or the database has no tables. Make sure the database is"
           " present in the connection profile. Available databases are:"
@@ -128,7 +139,7 @@ class DiscoverResultParser:
 
     if not table:
       available_tables = self._list_tables(schema=schema)
-      raise KeyError(
+      raise SourceTableNotFoundError(
           f"Source table `{table_name}` does not appear in the"
           f" database `{schema_name}`. Available tables are:"
           f" {available_tables}"
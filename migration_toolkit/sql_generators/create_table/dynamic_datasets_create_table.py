@@ -13,28 +13,26 @@
 # limitations under the License.
 
 import logging
+from typing import Any, Dict, Optional
 from common.name_mapper import dynamic_datasets_table_name
+from common.partitioning import Partitioning
 from common.source_type import SourceType
+from common.stream_object_filter import ColumnFilter
+from sql_generators.create_dataset.create_dataset import CreateDatasetDDLGenerator
 from sql_generators.create_table.base_create_table import BaseCreateTable
 
 logger = logging.getLogger(__name__)
 
 
+# The dataset is created by the table's DDL, unless `create_dataset` is False,
+# for example when the datasets of a batch are created up front.
 class DynamicDatasetsCreateTable(BaseCreateTable):
-  CREATE_DATASET_DDL_TEMPLATE = (
-      "CREATE SCHEMA IF NOT EXISTS `{dataset_name}`"
-      " OPTIONS(location='{location}')"
-  )
-  CREATE_DATASET_DDL_WITH_KMS_TEMPLATE = (
-      "CREATE SCHEMA IF NOT EXISTS `{dataset_name}`"
-      " OPTIONS(location='{location}', default_kms_key_name='{kms_key_name}')"
-  )
 
   def __init__(
       self,
       source_type: SourceType,
-      discover_result_path: str,
-      create_target_table_ddl_filepath: str,
+      discover_result_path: Optional[str],
+      create_target_table_ddl_filepath: Optional[str],
       source_schema_name: str,
       source_table_name: str,
       project_id: str,
@@ -42,10 +40,15 @@ class DynamicDatasetsCreateTable(BaseCreateTable):
       bigquery_region: str,
       bigquery_kms_key_name: str,
       bigquery_dataset_name: str,
+      discover_result: Optional[Dict[str, Any]] = None,
+      column_filter: Optional[ColumnFilter] = None,
+      partitioning: Optional[Partitioning] = None,
+      create_dataset: bool = True,
   ):
     self.bigquery_region = bigquery_region
     self.bigquery_kms_key_name = bigquery_kms_key_name
     self.dataset_name = bigquery_dataset_name
+    self.create_dataset = create_dataset
     table_name = dynamic_datasets_table_name(
         source_table_name=source_table_name
     )
@@ -57,6 +60,9 @@ class DynamicDatasetsCreateTable(BaseCreateTable):
         source_table_name=source_table_name,
         project_id=project_id,
         bigquery_max_staleness_seconds=bigquery_max_staleness_seconds,
+        discover_result=discover_result,
+        column_filter=column_filter,
+        partitioning=partitioning,
         fully_qualified_bigquery_table_name=project_id
         + "."
         + self.dataset_name
@@ -64,28 +70,23 @@ class DynamicDatasetsCreateTable(BaseCreateTable):
         + table_name,
     )
 
-  def generate_ddl(
-      self,
-  ):
-    create_dataset_ddl = self._generate_create_dataset_ddl()
+  def _generate_ddl(self) -> str:
     create_table_ddl = self._generate_create_table_ddl()
+    if not self.create_dataset:
+      return create_table_ddl
 
-    self._write_to_file("\n".join([create_dataset_ddl + ";", create_table_ddl]))
-
-  def _generate_create_dataset_ddl(self):
-    fully_qualified_dataset_name = self.project_id + "." + self.dataset_name
+    create_dataset_ddl = CreateDatasetDDLGenerator(
+        project_id=self.project_id,
+        dataset_name=self.dataset_name,
+        bigquery_region=self.bigquery_region,
+        bigquery_kms_key_name=self.bigquery_kms_key_name,
+    ).get_ddl()
 
-    if self.bigquery_kms_key_name:
-      create_dataset_ddl = self.CREATE_DATASET_DDL_WITH_KMS_TEMPLATE.format(
-          dataset_name=fully_qualified_dataset_name,
-          location=self.bigquery_region,
-          kms_key_name=self.bigquery_kms_key_name,
-      )
-    else:
-      create_dataset_ddl = self.CREATE_DATASET_DDL_TEMPLATE.format(
-          dataset_name=fully_qualified_dataset_name,
-          location=self.bigquery_region,
-      )
+    return "\n".join([create_dataset_ddl + ";", create_table_ddl])
 
-    logger.info(f"Generated create dataset DDL: {create_dataset_ddl}")
-    return create_dataset_ddl
+  def _get_artifact_inputs(self) -> Dict[str, Any]:
+    return super()._get_artifact_inputs() | {
+        "region": self.bigquery_region,
+        "kms_key_name": self.bigquery_kms_key_name,
+        "create_dataset": self.create_dataset,
+    }
@@ -13,8 +13,11 @@
 # limitations under the License.
 
 import logging
+from typing import Any, Dict, Optional
 from common.name_mapper import single_dataset_table_name
+from common.partitioning import Partitioning
 from common.source_type import SourceType
+from common.stream_object_filter import ColumnFilter
 from sql_generators.create_table.base_create_table import BaseCreateTable
 
 logger = logging.getLogger(__name__)
@@ -25,13 +28,16 @@ class SingleDatasetCreateTable(BaseCreateTable):
   def __init__(
       self,
       source_type: SourceType,
-      discover_result_path: str,
-      create_target_table_ddl_filepath: str,
+      discover_result_path: Optional[str],
+      create_target_table_ddl_filepath: Optional[str],
       source_schema_name: str,
       source_table_name: str,
       project_id: str,
       bigquery_max_staleness_seconds: int,
       bigquery_dataset_name: str,
+      discover_result: Optional[Dict[str, Any]] = None,
+      column_filter: Optional[ColumnFilter] = None,
+      partitioning: Optional[Partitioning] = None,
   ):
     bigquery_table_name = single_dataset_table_name(
         source_schema_name=source_schema_name,
@@ -49,11 +55,11 @@ class SingleDatasetCreateTable(BaseCreateTable):
         source_table_name=source_table_name,
         project_id=project_id,
         bigquery_max_staleness_seconds=bigquery_max_staleness_seconds,
+        discover_result=discover_result,
+        column_filter=column_filter,
+        partitioning=partitioning,
         fully_qualified_bigquery_table_name=fully_qualified_bigquery_table_name,
     )
 
-  def generate_ddl(
-      self,
-  ):
-    create_table_ddl = self._generate_create_table_ddl()
-    self._write_to_file(create_table_ddl)
+  def _generate_ddl(self) -> str:
+    return self._generate_create_table_ddl()
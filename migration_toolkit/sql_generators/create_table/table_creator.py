@@ -0,0 +1,73 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any, Dict, Optional
+from common.partitioning import Partitioning
+from common.source_type import SourceType
+from common.stream_object_filter import ColumnFilter
+from sql_generators.create_table.base_create_table import BaseCreateTable
+from sql_generators.create_table.dynamic_datasets_create_table import DynamicDatasetsCreateTable
+from sql_generators.create_table.single_dataset_create_table import SingleDatasetCreateTable
+
+
+def get_table_creator(
+    single_target_stream: bool,
+    source_type: SourceType,
+    discover_result_path: Optional[str],
+    create_target_table_ddl_filepath: Optional[str],
+    source_schema_name: str,
+    source_table_name: str,
+    project_id: str,
+    bigquery_max_staleness_seconds: int,
+    bigquery_dataset_name: str,
+    bigquery_region: str,
+    bigquery_kms_key_name: str,
+    discover_result: Optional[Dict[str, Any]] = None,
+    create_dataset: bool = True,
+    column_filter: Optional[ColumnFilter] = None,
+    partitioning: Optional[Partitioning] = None,
+) -> BaseCreateTable:
+  if single_target_stream:
+    # Generate CREATE TABLE DDL for single dataset stream
+    return SingleDatasetCreateTable(
+        source_type=source_type,
+        discover_result_path=discover_result_path,
+        create_target_table_ddl_filepath=create_target_table_ddl_filepath,
+        source_table_name=source_table_name,
+        source_schema_name=source_schema_name,
+        bigquery_dataset_name=bigquery_dataset_name,
+        bigquery_max_staleness_seconds=bigquery_max_staleness_seconds,
+        project_id=project_id,
+        discover_result=discover_result,
+        column_filter=column_filter,
+        partitioning=partitioning,
+    )
+
+  # Generate CREATE TABLE DDL for dynamic dataset stream
+  return DynamicDatasetsCreateTable(
+      source_type=source_type,
+      discover_result_path=discover_result_path,
+      create_target_table_ddl_filepath=create_target_table_ddl_filepath,
+      source_table_name=source_table_name,
+      source_schema_name=source_schema_name,
+      bigquery_max_staleness_seconds=bigquery_max_staleness_seconds,
+      project_id=project_id,
+      bigquery_region=bigquery_region,
+      bigquery_kms_key_name=bigquery_kms_key_name,
+      bigquery_dataset_name=bigquery_dataset_name,
+      discover_result=discover_result,
+      create_dataset=create_dataset,
+      column_filter=column_filter,
+      partitioning=partitioning,
+  )
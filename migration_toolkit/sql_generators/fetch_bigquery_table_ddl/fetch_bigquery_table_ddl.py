@@ -13,7 +13,7 @@
 # limitations under the License.
 
 import logging
-from common.file_writer import write
+from common.artifact_manifest import write_artifact
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +22,12 @@ FETCH_BIGQUERY_TABLE_DDL_SQL_TEMPLATE = (
     "SELECT ddl FROM `{project_id}.{dataset}`.INFORMATION_SCHEMA.TABLES WHERE"
     " table_name='{table}';"
 )
+BATCH_FETCH_BIGQUERY_TABLE_DDL_SQL_TEMPLATE = (
+    "SELECT table_name, ddl FROM"
+    " `{project_id}.{dataset}`.INFORMATION_SCHEMA.TABLES WHERE table_name IN"
+    " UNNEST(@{table_names_parameter});"
+)
+TABLE_NAMES_PARAMETER = "table_names"
 
 
 class BigQueryTableDDLFetcher:
@@ -32,12 +38,46 @@ class BigQueryTableDDLFetcher:
     self.table: str = table
     self.filepath = filepath
 
+  # Returns the SQL without writing it to a file.
+  def get_sql(self) -> str:
+    return self._generate_sql()
+
   def fetch_table_schema(self):
+    write_artifact(
+        filepath=self.filepath,
+        inputs={"table": f"{self.project_id}.{self.dataset}.{self.table}"},
+        generate=self._generate_sql,
+    )
+
+  def _generate_sql(self) -> str:
     sql = FETCH_BIGQUERY_TABLE_DDL_SQL_TEMPLATE.format(
         project_id=self.project_id, dataset=self.dataset, table=self.table
     )
     logger.info(f"Generated table schema SQL: {sql}")
-    self._write_to_file(sql)
+    return sql
 
-  def _write_to_file(self, sql: str):
-    write(filepath=self.filepath, data=sql)
+
+# Fetches the DDL of all the tables of a dataset with a single query. The table
+# names are passed as the `table_names` query parameter when running the query.
+class BatchBigQueryTableDDLFetcher:
+
+  def __init__(self, project_id: str, dataset: str, filepath: str):
+    self.project_id: str = project_id
+    self.dataset: str = dataset
+    self.filepath = filepath
+
+  def fetch_table_schemas(self):
+    write_artifact(
+        filepath=self.filepath,
+        inputs={"dataset": f"{self.project_id}.{self.dataset}"},
+        generate=self._generate_sql,
+    )
+
+  def _generate_sql(self) -> str:
+    sql = BATCH_FETCH_BIGQUERY_TABLE_DDL_SQL_TEMPLATE.format(
+        project_id=self.project_id,
+        dataset=self.dataset,
+        table_names_parameter=TABLE_NAMES_PARAMETER,
+    )
+    logger.info(f"Generated tables schema SQL: {sql}")
+    return sql
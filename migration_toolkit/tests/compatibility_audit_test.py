@@ -0,0 +1,113 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import os
+import tempfile
+import unittest
+from unittest import mock
+from batch import compatibility_audit
+from batch.compatibility_audit import ColumnStatus
+from common import plan_cache
+from common.plan_cache import PlanCache
+from common.source_type import SourceType
+from executors.list_columns import ColumnInfo
+
+DISCOVER_RESULT = {
+    "mysqlRdbms": {
+        "mysqlDatabases": [
+            {
+                "database": "shop",
+                "mysqlTables": [
+                    {
+                        "table": "stores",
+                        "mysqlColumns": [
+                            {
+                                "column": "id",
+                                "dataType": "INT",
+                                "primaryKey": True,
+                            },
+                            {"column": "location", "dataType": "GEOMETRY"},
+                        ],
+                    }
+                ],
+            }
+        ],
+    },
+}
+
+
+def _get_table_config(source_table_name: str) -> argparse.Namespace:
+  return argparse.Namespace(
+      project_id="project",
+      bigquery_source_dataset_name="datastream",
+      bigquery_source_table_name=f"shop_{source_table_name}",
+      bigquery_target_dataset_name="shop",
+      bigquery_target_table_name=source_table_name,
+      single_target_stream=False,
+      source_type=SourceType.MYSQL,
+      source_schema_name="shop",
+      source_table_name=source_table_name,
+      bigquery_max_staleness_seconds=900,
+      bigquery_region="us",
+      bigquery_kms_key_name=None,
+      column_filter=None,
+  )
+
+
+class AuditTableConfigTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    directory = tempfile.TemporaryDirectory()
+    self.addCleanup(directory.cleanup)
+    patcher = mock.patch.object(
+        plan_cache,
+        "_plan_cache",
+        PlanCache(os.path.join(directory.name, "plan_cache.sqlite")),
+    )
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def test_reports_unmapped_source_type(self):
+    audits = compatibility_audit._audit_table_config(
+        _get_table_config("stores"),
+        discover_result=DISCOVER_RESULT,
+        source_columns=[
+            ColumnInfo(name="id", data_type="INT64"),
+            ColumnInfo(name="location", data_type="STRING"),
+        ],
+    )
+
+    statuses = {audit.column: audit.status for audit in audits}
+    self.assertEqual(
+        statuses,
+        {"id": ColumnStatus.MATCH, "location": ColumnStatus.UNSUPPORTED_TYPE},
+    )
+    self.assertIn("GEOMETRY", audits[1].detail)
+
+  def test_reports_table_missing_from_discover_result(self):
+    audits = compatibility_audit._audit_table_config(
+        _get_table_config("orders"),
+        discover_result=DISCOVER_RESULT,
+        source_columns=[ColumnInfo(name="id", data_type="INT64")],
+    )
+
+    self.assertEqual(len(audits), 1)
+    self.assertEqual(audits[0].status, ColumnStatus.MISSING_TABLE)
+    self.assertIn("orders", audits[0].detail)
+
+
+if __name__ == "__main__":
+  unittest.main()
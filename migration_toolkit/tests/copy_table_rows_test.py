@@ -0,0 +1,177 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from unittest import mock
+from common.bigquery_type import BigQueryType
+from common.copy_method import CopyMethod
+from common.partitioning import PartitionGranularity, PartitionRange, SourcePartitioning
+from executors import copy_table_rows
+from executors.copy_table_rows import execute_copy_table_rows, get_copy_partition_ranges
+
+SOURCE_TABLE_ID = "project.dataset.source"
+DESTINATION_TABLE_ID = "project.dataset.destination"
+SQL = "SELECT 1"
+SOURCE_PARTITIONING = SourcePartitioning(
+    column="created",
+    column_type=BigQueryType.DATE,
+    granularity=PartitionGranularity.DAY,
+)
+PARTITION_RANGES = [
+    PartitionRange(start="2023-01-01", end="2023-01-02", copy_nulls=True),
+    PartitionRange(start="2023-01-02", end=None, copy_nulls=False),
+]
+
+
+def _copy(copy_method: CopyMethod, cast_count: int = 0, **kwargs):
+  copy_data_sql_generator = mock.Mock()
+  copy_data_sql_generator.get_cast_count.return_value = cast_count
+  execute_copy_table_rows(
+      copy_method=copy_method,
+      project_id="project",
+      source_table_id=SOURCE_TABLE_ID,
+      destination_table_id=DESTINATION_TABLE_ID,
+      copy_data_sql_generator=copy_data_sql_generator,
+      copy_rows_sql=SQL,
+      bigquery_client=mock.sentinel.bigquery_client,
+      **kwargs,
+  )
+
+
+@mock.patch.multiple(
+    copy_table_rows,
+    execute_storage_copy_rows=mock.DEFAULT,
+    execute_extract_load_rows=mock.DEFAULT,
+    execute_partitioned_copy_rows_sql=mock.DEFAULT,
+    execute_append_rows_sql=mock.DEFAULT,
+    execute_merge_rows_sql=mock.DEFAULT,
+    execute_copy_rows_sql=mock.DEFAULT,
+)
+class ExecuteCopyTableRowsTest(unittest.TestCase):
+
+  def test_storage_api_uses_stream_counts(self, **executors):
+    _copy(
+        CopyMethod.STORAGE_API,
+        storage_read_stream_count=16,
+        storage_write_stream_count=2,
+    )
+
+    kwargs = executors["execute_storage_copy_rows"].call_args.kwargs
+    self.assertEqual(kwargs["read_stream_count"], 16)
+    self.assertEqual(kwargs["write_stream_count"], 2)
+
+  def test_extract_load_uses_load_job_count(self, **executors):
+    _copy(
+        CopyMethod.EXTRACT_LOAD,
+        staging_storage=mock.sentinel.staging_storage,
+        load_job_count=8,
+    )
+
+    kwargs = executors["execute_extract_load_rows"].call_args.kwargs
+    self.assertEqual(kwargs["load_job_count"], 8)
+    self.assertIs(kwargs["staging_storage"], mock.sentinel.staging_storage)
+
+  def test_extract_load_with_casts_copies_with_query(self, **executors):
+    _copy(CopyMethod.EXTRACT_LOAD, cast_count=1)
+
+    executors["execute_extract_load_rows"].assert_not_called()
+    executors["execute_copy_rows_sql"].assert_called_once()
+
+  def test_extract_load_requires_staging_storage(self, **executors):
+    with self.assertRaises(ValueError):
+      _copy(CopyMethod.EXTRACT_LOAD)
+
+  def test_append_copies_partition_ranges(self, **executors):
+    _copy(
+        CopyMethod.APPEND,
+        source_partitioning=SOURCE_PARTITIONING,
+        partition_ranges=PARTITION_RANGES,
+    )
+
+    kwargs = executors["execute_partitioned_copy_rows_sql"].call_args.kwargs
+    self.assertEqual(kwargs["partition_ranges"], PARTITION_RANGES)
+    self.assertEqual(kwargs["partition_column_type"], BigQueryType.DATE)
+    self.assertEqual(kwargs["append_to_table_id"], DESTINATION_TABLE_ID)
+    executors["execute_append_rows_sql"].assert_not_called()
+
+  def test_insert_copies_partition_ranges_with_statement(self, **executors):
+    _copy(
+        CopyMethod.INSERT,
+        source_partitioning=SOURCE_PARTITIONING,
+        partition_ranges=PARTITION_RANGES,
+    )
+
+    kwargs = executors["execute_partitioned_copy_rows_sql"].call_args.kwargs
+    self.assertIsNone(kwargs["append_to_table_id"])
+
+  def test_merge_uses_bucket_count(self, **executors):
+    _copy(CopyMethod.MERGE, merge_bucket_count=4)
+
+    kwargs = executors["execute_merge_rows_sql"].call_args.kwargs
+    self.assertEqual(kwargs["bucket_count"], 4)
+
+  def test_backfill_is_not_copied(self, **executors):
+    with self.assertRaises(ValueError):
+      _copy(CopyMethod.BACKFILL)
+
+
+@mock.patch.object(copy_table_rows, "execute_list_partitions")
+class GetCopyPartitionRangesTest(unittest.TestCase):
+
+  def _get_ranges(self, copy_method: CopyMethod, **kwargs):
+    return get_copy_partition_ranges(
+        copy_method=copy_method,
+        source_table_id=SOURCE_TABLE_ID,
+        source_partitioning=kwargs.pop(
+            "source_partitioning", SOURCE_PARTITIONING
+        ),
+        partition_range_count=kwargs.pop("partition_range_count", 2),
+        bigquery_client=mock.sentinel.bigquery_client,
+    )
+
+  def test_splits_partitions(self, list_partitions):
+    list_partitions.return_value = {"20230101": 10, "20230102": 10}
+
+    partition_ranges = self._get_ranges(CopyMethod.INSERT)
+
+    self.assertEqual(len(partition_ranges), 2)
+
+  def test_single_range_is_copied_by_one_statement(self, list_partitions):
+    list_partitions.return_value = {"20230101": 10}
+
+    self.assertIsNone(self._get_ranges(CopyMethod.INSERT))
+
+  def test_ranges_are_not_used_by_other_copy_methods(self, list_partitions):
+    for copy_method in (
+        CopyMethod.MERGE,
+        CopyMethod.STORAGE_API,
+        CopyMethod.EXTRACT_LOAD,
+    ):
+      self.assertIsNone(self._get_ranges(copy_method))
+    list_partitions.assert_not_called()
+
+  def test_unpartitioned_table_is_copied_by_one_statement(
+      self, list_partitions
+  ):
+    self.assertIsNone(
+        self._get_ranges(CopyMethod.APPEND, source_partitioning=None)
+    )
+    self.assertIsNone(
+        self._get_ranges(CopyMethod.APPEND, partition_range_count=1)
+    )
+    list_partitions.assert_not_called()
+
+
+if __name__ == "__main__":
+  unittest.main()
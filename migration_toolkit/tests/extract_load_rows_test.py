@@ -0,0 +1,253 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import threading
+from typing import List, Optional
+import unittest
+from common.extract_format import ExtractFormat
+from executors import extract_load_rows
+from executors.extract_load_rows import execute_extract_load_rows
+from executors.staging_storage import LocalStagingStorage
+from google.api_core.exceptions import BadRequest, InternalServerError
+from google.cloud.bigquery.job import WriteDisposition
+
+ROWS_PER_FILE = 10
+
+
+# A job that already finished, and failed if `error` is set.
+class FakeJob:
+
+  def __init__(
+      self,
+      job_id: str,
+      output_rows: int = 0,
+      error: Optional[Exception] = None,
+  ):
+    self.job_id: str = job_id
+    self.output_rows: int = output_rows
+    self.error: Optional[Exception] = error
+    self.state: str = "DONE"
+    self.error_result: Optional[dict] = (
+        {"message": str(error)} if error else None
+    )
+
+  def result(self) -> "FakeJob":
+    if self.error:
+      raise self.error
+    return self
+
+
+# Writes `file_count` files to the staging directory for each extract job, and
+# loads `ROWS_PER_FILE` rows from each file. `load_errors` are raised by the
+# first load jobs, one per job.
+class FakeBigQueryClient:
+
+  def __init__(self, file_count: int, load_errors: List[Exception] = ()):
+    self.location: Optional[str] = None
+    self.file_count: int = file_count
+    self.load_errors: List[Exception] = list(load_errors)
+    self.extract_job_configs = []
+    self.loaded_uris: List[List[str]] = []
+    self.load_job_configs = []
+    self._lock = threading.Lock()
+
+  def extract_table(
+      self, source, destination_uris, job_id, job_config, retry, timeout
+  ) -> FakeJob:
+    self.extract_job_configs.append(job_config)
+    for file in range(self.file_count):
+      uri = destination_uris.replace("*", f"{file:012d}")
+      os.makedirs(os.path.dirname(uri), exist_ok=True)
+      with open(uri, "w") as f:
+        f.write("rows")
+    return FakeJob(job_id)
+
+  def load_table_from_uri(
+      self, source_uris, destination, job_id, job_config, retry, timeout
+  ) -> FakeJob:
+    with self._lock:
+      for uri in source_uris:
+        if not os.path.isfile(uri):
+          raise ValueError(f"{uri} wasn't staged.")
+      self.load_job_configs.append(job_config)
+      if self.load_errors:
+        return FakeJob(job_id, error=self.load_errors.pop(0))
+      self.loaded_uris.append(list(source_uris))
+      return FakeJob(job_id, output_rows=ROWS_PER_FILE * len(source_uris))
+
+
+class ExecuteExtractLoadRowsTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.directory = tempfile.TemporaryDirectory()
+    self.addCleanup(self.directory.cleanup)
+    self.staging_storage = LocalStagingStorage(self.directory.name)
+
+  def test_loads_all_extracted_files(self):
+    bigquery_client = FakeBigQueryClient(file_count=7)
+
+    row_count = execute_extract_load_rows(
+        source_table_id="project.dataset.source",
+        destination_table_id="project.dataset.destination",
+        staging_storage=self.staging_storage,
+        bigquery_client=bigquery_client,
+        load_job_count=3,
+    )
+
+    self.assertEqual(row_count, 7 * ROWS_PER_FILE)
+    self.assertEqual(
+        sorted(len(uris) for uris in bigquery_client.loaded_uris), [1, 3, 3]
+    )
+    self.assertEqual(
+        len({uri for uris in bigquery_client.loaded_uris for uri in uris}), 7
+    )
+    extract_job_config = bigquery_client.extract_job_configs[0]
+    self.assertEqual(extract_job_config.destination_format, "AVRO")
+    self.assertTrue(extract_job_config.use_avro_logical_types)
+    for load_job_config in bigquery_client.load_job_configs:
+      self.assertEqual(
+          load_job_config.write_disposition, WriteDisposition.WRITE_APPEND
+      )
+      self.assertTrue(load_job_config.ignore_unknown_values)
+    self.assertEqual(os.listdir(self.directory.name), [])
+
+  def test_loads_files_with_single_job_by_default(self):
+    bigquery_client = FakeBigQueryClient(file_count=7)
+
+    row_count = execute_extract_load_rows(
+        source_table_id="project.dataset.source",
+        destination_table_id="project.dataset.destination",
+        staging_storage=self.staging_storage,
+        bigquery_client=bigquery_client,
+    )
+
+    self.assertEqual(row_count, 7 * ROWS_PER_FILE)
+    self.assertEqual([len(uris) for uris in bigquery_client.loaded_uris], [7])
+
+  def test_extracts_parquet(self):
+    bigquery_client = FakeBigQueryClient(file_count=2)
+
+    execute_extract_load_rows(
+        source_table_id="project.dataset.source",
+        destination_table_id="project.dataset.destination",
+        staging_storage=self.staging_storage,
+        bigquery_client=bigquery_client,
+        extract_format=ExtractFormat.PARQUET,
+    )
+
+    self.assertEqual(
+        bigquery_client.extract_job_configs[0].destination_format, "PARQUET"
+    )
+    self.assertEqual(
+        bigquery_client.load_job_configs[0].source_format, "PARQUET"
+    )
+    self.assertTrue(
+        all(
+            uri.endswith(".parquet")
+            for uris in bigquery_client.loaded_uris
+            for uri in uris
+        )
+    )
+
+  def test_resubmits_load_job_failed_with_transient_error(self):
+    bigquery_client = FakeBigQueryClient(
+        file_count=2, load_errors=[InternalServerError("Backend error.")]
+    )
+
+    row_count = execute_extract_load_rows(
+        source_table_id="project.dataset.source",
+        destination_table_id="project.dataset.destination",
+        staging_storage=self.staging_storage,
+        bigquery_client=bigquery_client,
+        load_job_count=1,
+    )
+
+    self.assertEqual(row_count, 2 * ROWS_PER_FILE)
+    self.assertEqual(len(bigquery_client.load_job_configs), 2)
+
+  def test_deletes_staged_files_when_load_fails(self):
+    bigquery_client = FakeBigQueryClient(
+        file_count=3, load_errors=[BadRequest("Invalid schema.")]
+    )
+
+    with self.assertRaises(BadRequest):
+      execute_extract_load_rows(
+          source_table_id="project.dataset.source",
+          destination_table_id="project.dataset.destination",
+          staging_storage=self.staging_storage,
+          bigquery_client=bigquery_client,
+          load_job_count=1,
+      )
+
+    self.assertEqual(os.listdir(self.directory.name), [])
+
+  def test_logs_partial_load_when_some_load_jobs_fail(self):
+    bigquery_client = FakeBigQueryClient(
+        file_count=3, load_errors=[BadRequest("Invalid schema.")]
+    )
+
+    with self.assertLogs(extract_load_rows.logger, "ERROR") as logs:
+      with self.assertRaises(BadRequest):
+        execute_extract_load_rows(
+            source_table_id="project.dataset.source",
+            destination_table_id="project.dataset.destination",
+            staging_storage=self.staging_storage,
+            bigquery_client=bigquery_client,
+            load_job_count=3,
+        )
+
+    self.assertEqual(len(bigquery_client.loaded_uris), 2)
+    self.assertIn("1 out of 3 load jobs failed", logs.output[0])
+    self.assertIn("Drop the table", logs.output[0])
+    self.assertEqual(os.listdir(self.directory.name), [])
+
+
+class SplitUrisTest(unittest.TestCase):
+
+  def test_no_uris(self):
+    self.assertEqual(extract_load_rows._split_uris([], 4), [])
+
+  def test_fewer_uris_than_load_jobs(self):
+    self.assertEqual(
+        extract_load_rows._split_uris(["a", "b"], 4), [["a"], ["b"]]
+    )
+
+  def test_contiguous_shards(self):
+    uris = [str(uri) for uri in range(10)]
+
+    shards = extract_load_rows._split_uris(uris, 4)
+
+    self.assertEqual([len(shard) for shard in shards], [3, 3, 3, 1])
+    self.assertEqual([uri for shard in shards for uri in shard], uris)
+
+  def test_shards_respect_load_job_uri_limit(self):
+    uris = [str(uri) for uri in range(25000)]
+
+    shards = extract_load_rows._split_uris(uris, 2)
+
+    self.assertEqual(len(shards), 3)
+    self.assertTrue(
+        all(
+            len(shard) <= extract_load_rows.MAX_URIS_PER_LOAD_JOB
+            for shard in shards
+        )
+    )
+    self.assertEqual([uri for shard in shards for uri in shard], uris)
+
+
+if __name__ == "__main__":
+  unittest.main()
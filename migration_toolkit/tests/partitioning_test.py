@@ -0,0 +1,133 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import unittest
+from common.bigquery_type import BigQueryType
+from common.partitioning import PartitionGranularity, PartitionRange, SourcePartitioning, get_partition_ranges
+
+DAY_PARTITIONING = SourcePartitioning(
+    column="created",
+    column_type=BigQueryType.DATE,
+    granularity=PartitionGranularity.DAY,
+)
+INTEGER_RANGE_PARTITIONING = SourcePartitioning(
+    column="id",
+    column_type=BigQueryType.INT64,
+    integer_range=(0, 100, 10),
+)
+
+
+class GetPartitionRangesTest(unittest.TestCase):
+
+  def test_splits_rows_evenly(self):
+    partition_ranges = get_partition_ranges(
+        DAY_PARTITIONING,
+        partition_rows={
+            "20230101": 10,
+            "20230102": 10,
+            "20230103": 10,
+            "20230104": 10,
+        },
+        range_count=2,
+    )
+
+    self.assertEqual(
+        partition_ranges,
+        [
+            PartitionRange(
+                start=datetime.date.min,
+                end=datetime.date(2023, 1, 2),
+                copy_nulls=True,
+            ),
+            PartitionRange(
+                start=datetime.date(2023, 1, 3),
+                end=datetime.date.max,
+                copy_nulls=False,
+            ),
+        ],
+    )
+
+  def test_large_partition_gets_own_range(self):
+    partition_ranges = get_partition_ranges(
+        INTEGER_RANGE_PARTITIONING,
+        partition_rows={"0": 1, "10": 100, "20": 1, "30": 1},
+        range_count=3,
+    )
+
+    self.assertEqual(
+        [(r.start, r.end) for r in partition_ranges],
+        [(-(2**63), 9), (10, 19), (20, 2**63 - 1)],
+    )
+
+  def test_ignores_null_and_unpartitioned_partitions(self):
+    partition_ranges = get_partition_ranges(
+        DAY_PARTITIONING,
+        partition_rows={
+            "__NULL__": 1000,
+            "__UNPARTITIONED__": 1000,
+            "20230101": 10,
+            "20230102": 10,
+        },
+        range_count=2,
+    )
+
+    self.assertEqual(
+        [r.start for r in partition_ranges],
+        [datetime.date.min, datetime.date(2023, 1, 2)],
+    )
+
+  def test_ranges_cover_all_values(self):
+    partition_ranges = get_partition_ranges(
+        INTEGER_RANGE_PARTITIONING,
+        partition_rows={str(start): 5 for start in range(0, 100, 10)},
+        range_count=4,
+    )
+
+    self.assertEqual(len(partition_ranges), 4)
+    self.assertEqual(partition_ranges[0].start, -(2**63))
+    self.assertEqual(partition_ranges[-1].end, 2**63 - 1)
+    for previous, current in zip(partition_ranges, partition_ranges[1:]):
+      self.assertEqual(current.start, previous.end + 1)
+    self.assertEqual([r.copy_nulls for r in partition_ranges].count(True), 1)
+
+  def test_single_partition_is_single_range(self):
+    partition_ranges = get_partition_ranges(
+        DAY_PARTITIONING, partition_rows={"20230101": 10}, range_count=4
+    )
+
+    self.assertEqual(len(partition_ranges), 1)
+
+  def test_hourly_timestamp_partitions(self):
+    partitioning = SourcePartitioning(
+        column="t",
+        column_type=BigQueryType.TIMESTAMP,
+        granularity=PartitionGranularity.HOUR,
+    )
+
+    partition_ranges = get_partition_ranges(
+        partitioning,
+        partition_rows={"2023010100": 10, "2023010101": 10},
+        range_count=2,
+    )
+
+    start = datetime.datetime(2023, 1, 1, 1, tzinfo=datetime.timezone.utc)
+    self.assertEqual(partition_ranges[1].start, start)
+    self.assertEqual(
+        partition_ranges[0].end, start - datetime.timedelta(microseconds=1)
+    )
+
+
+if __name__ == "__main__":
+  unittest.main()
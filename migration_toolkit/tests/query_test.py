@@ -0,0 +1,187 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import List, Optional
+import unittest
+from unittest import mock
+from executors import query
+from executors.query import JOB_ID_PREFIX, MAX_JOB_ATTEMPTS, execute_job
+from google.api_core.exceptions import BadRequest, Conflict, InternalServerError, ServiceUnavailable
+
+
+# A job whose `result()` raises the given errors, one per call, before
+# returning its result. `failed` marks the errors as failures of the job
+# itself, rather than of the requests waiting for it.
+class FakeJob:
+
+  def __init__(
+      self,
+      job_id: str,
+      result_errors: List[Exception] = (),
+      failed: bool = False,
+  ):
+    self.job_id: str = job_id
+    self.result_errors: List[Exception] = list(result_errors)
+    self.failed: bool = failed
+    self.state: str = "RUNNING"
+    self.error_result: Optional[dict] = None
+    self.result_calls: int = 0
+
+  def result(self) -> str:
+    self.result_calls += 1
+    if self.result_errors:
+      error = self.result_errors.pop(0)
+      if self.failed:
+        self.state = "DONE"
+        self.error_result = {"message": str(error)}
+      raise error
+    self.state = "DONE"
+    return f"result of {self.job_id}"
+
+
+class FakeBigQueryClient:
+
+  def __init__(self, location: Optional[str] = None):
+    self.location: Optional[str] = location
+    self.jobs = {}
+    self.get_job_calls = []
+
+  def get_job(self, job_id: str, location: Optional[str], timeout: float):
+    self.get_job_calls.append((job_id, location))
+    return self.jobs[job_id]
+
+
+# Inserts the given jobs in order, each under the job ID of its submission.
+class FakeInsert:
+
+  def __init__(self, bigquery_client: FakeBigQueryClient, jobs: List[FakeJob]):
+    self.bigquery_client: FakeBigQueryClient = bigquery_client
+    self.jobs: List[FakeJob] = list(jobs)
+    self.job_ids: List[str] = []
+
+  def __call__(self, job_id: str, timeout: float) -> FakeJob:
+    self.job_ids.append(job_id)
+    job = self.jobs.pop(0)
+    job.job_id = job_id
+    self.bigquery_client.jobs[job_id] = job
+    return job
+
+
+@mock.patch("common.retry_policy.time.sleep")
+class ExecuteJobTest(unittest.TestCase):
+
+  def test_returns_result(self, sleep):
+    bigquery_client = FakeBigQueryClient()
+    insert = FakeInsert(bigquery_client, [FakeJob("")])
+
+    result = execute_job(insert, bigquery_client=bigquery_client)
+
+    self.assertEqual(result, f"result of {insert.job_ids[0]}")
+    self.assertTrue(insert.job_ids[0].startswith(JOB_ID_PREFIX))
+
+  def test_fetches_result_again_when_succeeded_job_fails_to_return_it(
+      self, sleep
+  ):
+    bigquery_client = FakeBigQueryClient()
+    job = FakeJob("", result_errors=[ServiceUnavailable("Try again.")])
+    insert = FakeInsert(bigquery_client, [job])
+
+    result = execute_job(insert, bigquery_client=bigquery_client)
+
+    self.assertEqual(len(insert.job_ids), 1)
+    self.assertEqual(job.result_calls, 2)
+    self.assertEqual(result, f"result of {insert.job_ids[0]}")
+
+  def test_resubmits_job_failed_with_transient_error(self, sleep):
+    bigquery_client = FakeBigQueryClient()
+    failed_job = FakeJob(
+        "", result_errors=[InternalServerError("Backend error.")], failed=True
+    )
+    insert = FakeInsert(bigquery_client, [failed_job, FakeJob("")])
+
+    result = execute_job(insert, bigquery_client=bigquery_client)
+
+    self.assertEqual(len(insert.job_ids), 2)
+    self.assertNotEqual(insert.job_ids[0], insert.job_ids[1])
+    self.assertEqual(failed_job.result_calls, 1)
+    self.assertEqual(result, f"result of {insert.job_ids[1]}")
+
+  def test_raises_job_error_that_is_not_transient(self, sleep):
+    bigquery_client = FakeBigQueryClient()
+    insert = FakeInsert(
+        bigquery_client,
+        [FakeJob("", result_errors=[BadRequest("Bad query.")], failed=True)],
+    )
+
+    with self.assertRaises(BadRequest):
+      execute_job(insert, bigquery_client=bigquery_client)
+
+    self.assertEqual(len(insert.job_ids), 1)
+
+  def test_gives_up_after_max_attempts(self, sleep):
+    bigquery_client = FakeBigQueryClient()
+    insert = FakeInsert(
+        bigquery_client,
+        [
+            FakeJob(
+                "",
+                result_errors=[InternalServerError("Backend error.")],
+                failed=True,
+            )
+            for _ in range(MAX_JOB_ATTEMPTS)
+        ],
+    )
+
+    with self.assertRaises(InternalServerError):
+      execute_job(insert, bigquery_client=bigquery_client)
+
+    self.assertEqual(len(insert.job_ids), MAX_JOB_ATTEMPTS)
+
+  def test_uses_existing_job_when_insert_conflicts(self, sleep):
+    bigquery_client = FakeBigQueryClient(location="europe-west3")
+    job = FakeJob("")
+    inserted_job_ids = []
+
+    # The first request created the job, but failed ambiguously.
+    def insert(job_id: str, timeout: float) -> FakeJob:
+      inserted_job_ids.append(job_id)
+      if len(inserted_job_ids) == 1:
+        job.job_id = job_id
+        bigquery_client.jobs[job_id] = job
+        raise ServiceUnavailable("Connection reset.")
+      raise Conflict(f"Already exists: Job {job_id}")
+
+    result = execute_job(insert, bigquery_client=bigquery_client)
+
+    self.assertEqual(inserted_job_ids[0], inserted_job_ids[1])
+    self.assertEqual(
+        bigquery_client.get_job_calls, [(inserted_job_ids[0], "europe-west3")]
+    )
+    self.assertEqual(result, f"result of {inserted_job_ids[0]}")
+
+  def test_notifies_job_listener(self, sleep):
+    bigquery_client = FakeBigQueryClient()
+    insert = FakeInsert(bigquery_client, [FakeJob("")])
+    listener = mock.Mock()
+    query.set_job_listener(listener)
+    self.addCleanup(query.set_job_listener, None)
+
+    execute_job(insert, bigquery_client=bigquery_client)
+
+    listener.assert_called_once()
+    self.assertEqual(listener.call_args.args[0].job_id, insert.job_ids[0])
+
+
+if __name__ == "__main__":
+  unittest.main()
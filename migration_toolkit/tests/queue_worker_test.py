@@ -0,0 +1,97 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import threading
+import unittest
+from batch.queue_worker import QueueWorker
+from batch.sqlite_work_queue import SqliteWorkQueue
+from batch.work_queue import Lease, WorkItem, WorkItemState
+
+
+class QueueWorkerTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    directory = tempfile.TemporaryDirectory()
+    self.addCleanup(directory.cleanup)
+    self.work_queue = SqliteWorkQueue(
+        os.path.join(directory.name, "work_queue.sqlite")
+    )
+    self.work_queue.enqueue(
+        [
+            WorkItem(name=name, num_bytes=num_bytes, num_rows=1)
+            for name, num_bytes in (("a", 10), ("b", 20), ("c", 30))
+        ]
+    )
+
+  def _get_worker(self) -> QueueWorker:
+    return QueueWorker(
+        work_queue=self.work_queue,
+        worker_id="worker",
+        max_concurrent_tables=2,
+        max_concurrent_large_tables=None,
+        large_table_threshold_bytes=100,
+        poll_interval_seconds=0.01,
+    )
+
+  def test_migrates_each_table_once(self):
+    leases = []
+    leases_lock = threading.Lock()
+
+    def migrate(payload: str, lease: Lease, lease_lost: threading.Event):
+      with leases_lock:
+        leases.append((payload, lease))
+
+    results = self._get_worker().run(
+        payloads={"a": "A", "b": "B", "c": "C"}, fn=migrate
+    )
+
+    self.assertEqual(sorted(payload for payload, _ in leases), ["A", "B", "C"])
+    self.assertTrue(all(lease.attempt == 1 for _, lease in leases))
+    self.assertEqual(sorted(r.name for r in results), ["a", "b", "c"])
+    self.assertTrue(all(r.error is None for r in results))
+    self.assertTrue(self.work_queue.is_drained())
+
+  def test_records_failed_tables(self):
+    def migrate(payload: str, lease: Lease, lease_lost: threading.Event):
+      if payload == "B":
+        raise ValueError("Failed.")
+
+    results = self._get_worker().run(
+        payloads={"a": "A", "b": "B", "c": "C"}, fn=migrate
+    )
+
+    errors = {r.name: r.error for r in results}
+    self.assertIsInstance(errors["b"], ValueError)
+    self.assertIsNone(errors["a"])
+    self.assertIsNone(errors["c"])
+
+  def test_table_missing_from_payloads_fails(self):
+    results = self._get_worker().run(
+        payloads={"a": "A", "b": "B"}, fn=lambda payload, lease, lost: None
+    )
+
+    errors = {r.name: r.error for r in results}
+    self.assertIsInstance(errors["c"], KeyError)
+    with self.work_queue._transaction() as connection:
+      (state,) = connection.execute(
+          "SELECT state FROM work_items WHERE name = 'c'"
+      ).fetchone()
+    self.assertEqual(state, str(WorkItemState.FAILED))
+
+
+if __name__ == "__main__":
+  unittest.main()
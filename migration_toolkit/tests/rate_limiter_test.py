@@ -0,0 +1,108 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+from common import rate_limiter
+from common.api_method import ApiMethod
+from common.rate_limiter import RateLimiter, SqliteTokenBucket, TokenBucket
+
+
+class FakeClock:
+
+  def __init__(self):
+    self.now: float = 1000.0
+
+  def __call__(self) -> float:
+    return self.now
+
+
+class TokenBucketTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.clock = FakeClock()
+    for patcher in (
+        mock.patch.object(rate_limiter.time, "monotonic", self.clock),
+        mock.patch.object(rate_limiter.time, "time", self.clock),
+        mock.patch.object(rate_limiter.time, "sleep"),
+    ):
+      patcher.start()
+      self.addCleanup(patcher.stop)
+    directory = tempfile.TemporaryDirectory()
+    self.addCleanup(directory.cleanup)
+    self.filepath = os.path.join(directory.name, "rate_limits.sqlite")
+
+  def _get_buckets(self, requests_per_minute: float):
+    return [
+        TokenBucket(requests_per_minute),
+        SqliteTokenBucket(
+            requests_per_minute, filepath=self.filepath, name="bucket"
+        ),
+    ]
+
+  def test_burst_up_to_capacity_does_not_wait(self):
+    for bucket in self._get_buckets(requests_per_minute=180):
+      with self.subTest(bucket=type(bucket).__name__):
+        self.assertEqual([bucket.acquire() for _ in range(3)], [0.0, 0.0, 0.0])
+
+  def test_callers_beyond_capacity_wait_in_order(self):
+    for bucket in self._get_buckets(requests_per_minute=60):
+      with self.subTest(bucket=type(bucket).__name__):
+        self.assertEqual([bucket.acquire() for _ in range(3)], [0.0, 1.0, 2.0])
+
+  def test_bucket_refills_over_time(self):
+    for bucket in self._get_buckets(requests_per_minute=60):
+      with self.subTest(bucket=type(bucket).__name__):
+        bucket.acquire()
+        self.clock.now += 1
+
+        self.assertEqual(bucket.acquire(), 0.0)
+
+  def test_shared_bucket_is_shared_by_instances(self):
+    first, second = (
+        SqliteTokenBucket(60, filepath=self.filepath, name="bucket")
+        for _ in range(2)
+    )
+
+    self.assertEqual(first.acquire(), 0.0)
+    self.assertEqual(second.acquire(), 1.0)
+
+  def test_rejects_non_positive_rate(self):
+    with self.assertRaises(ValueError):
+      TokenBucket(0)
+
+
+class RateLimiterTest(unittest.TestCase):
+
+  def test_records_waits_of_limited_methods(self):
+    bucket = mock.Mock()
+    bucket.acquire.side_effect = [0.0, 2.0]
+    limiter = RateLimiter(buckets={ApiMethod.GET_TABLE: bucket})
+
+    limiter.acquire(ApiMethod.GET_TABLE)
+    limiter.acquire(ApiMethod.GET_TABLE)
+    limiter.acquire(ApiMethod.INSERT_JOB)
+
+    stats = limiter.get_stats()
+    self.assertEqual(stats[ApiMethod.GET_TABLE].acquired, 2)
+    self.assertEqual(stats[ApiMethod.GET_TABLE].total_wait_seconds, 2.0)
+    self.assertEqual(stats[ApiMethod.GET_TABLE].max_wait_seconds, 2.0)
+    self.assertEqual(stats[ApiMethod.INSERT_JOB].total_wait_seconds, 0.0)
+
+
+if __name__ == "__main__":
+  unittest.main()
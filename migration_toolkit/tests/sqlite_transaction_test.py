@@ -0,0 +1,92 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+from common import sqlite_transaction
+from common.sqlite_transaction import SqliteTransaction
+
+
+@mock.patch.object(sqlite_transaction, "SQLITE_BUSY_TIMEOUT_SECONDS", 0.1)
+class SqliteTransactionTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    directory = tempfile.TemporaryDirectory()
+    self.addCleanup(directory.cleanup)
+    self.filepath = os.path.join(directory.name, "state.sqlite")
+
+  def _create_table(self, wal: bool = True):
+    with SqliteTransaction(self.filepath, wal=wal) as connection:
+      connection.execute("CREATE TABLE items (name TEXT)")
+      connection.execute("INSERT INTO items VALUES ('a')")
+
+  # Stands for another process, writing to the file.
+  def _begin_other_write(self) -> sqlite3.Connection:
+    other = sqlite3.connect(self.filepath, timeout=0, isolation_level=None)
+    self.addCleanup(other.close)
+    other.execute("BEGIN IMMEDIATE")
+    other.execute("INSERT INTO items VALUES ('b')")
+    return other
+
+  def test_reuses_connection_of_process(self):
+    self._create_table()
+
+    with SqliteTransaction(self.filepath, read_only=True) as first:
+      pass
+    with SqliteTransaction(self.filepath) as second:
+      pass
+
+    self.assertIs(first, second)
+
+  def test_read_does_not_wait_for_other_write(self):
+    self._create_table()
+    other = self._begin_other_write()
+
+    with SqliteTransaction(self.filepath, read_only=True) as connection:
+      rows = connection.execute("SELECT name FROM items").fetchall()
+
+    self.assertEqual(rows, [("a",)])
+    other.execute("ROLLBACK")
+
+  def test_write_waits_for_other_write(self):
+    self._create_table()
+    other = self._begin_other_write()
+
+    with self.assertRaises(sqlite3.OperationalError):
+      with SqliteTransaction(self.filepath):
+        pass
+
+    other.execute("ROLLBACK")
+    with SqliteTransaction(self.filepath):
+      pass
+
+  def test_rolls_back_on_error(self):
+    self._create_table(wal=False)
+
+    with self.assertRaises(ValueError):
+      with SqliteTransaction(self.filepath, wal=False) as connection:
+        connection.execute("INSERT INTO items VALUES ('b')")
+        raise ValueError("Failed.")
+
+    with SqliteTransaction(self.filepath, read_only=True) as connection:
+      rows = connection.execute("SELECT name FROM items").fetchall()
+    self.assertEqual(rows, [("a",)])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,139 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+from batch import sqlite_work_queue
+from batch.sqlite_work_queue import SqliteWorkQueue
+from batch.work_queue import WorkItem
+
+LEASE_SECONDS = 60
+
+
+class SqliteWorkQueueTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    directory = tempfile.TemporaryDirectory()
+    self.addCleanup(directory.cleanup)
+    self.filepath = os.path.join(directory.name, "work_queue.sqlite")
+    self.now = 1000.0
+    patcher = mock.patch.object(
+        sqlite_work_queue.time, "time", lambda: self.now
+    )
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def _get_work_queue(self, max_attempts: int = 3) -> SqliteWorkQueue:
+    work_queue = SqliteWorkQueue(self.filepath, max_attempts=max_attempts)
+    work_queue.enqueue(
+        [
+            WorkItem(name="small", num_bytes=10, num_rows=1),
+            WorkItem(name="large", num_bytes=1000, num_rows=100),
+        ]
+    )
+    return work_queue
+
+  def test_claims_largest_pending_item_first(self):
+    work_queue = self._get_work_queue()
+
+    first = work_queue.claim("worker", LEASE_SECONDS)
+    second = work_queue.claim("worker", LEASE_SECONDS)
+
+    self.assertEqual(first.name, "large")
+    self.assertEqual(first.attempt, 1)
+    self.assertEqual(first.first_claimed_at, self.now)
+    self.assertEqual(second.name, "small")
+    self.assertIsNone(work_queue.claim("worker", LEASE_SECONDS))
+
+  def test_enqueue_ignores_items_already_in_queue(self):
+    work_queue = self._get_work_queue()
+    work_queue.complete(work_queue.claim("worker", LEASE_SECONDS))
+
+    work_queue.enqueue([WorkItem(name="large", num_bytes=1000, num_rows=100)])
+
+    self.assertEqual(sorted(work_queue.list_names()), ["large", "small"])
+    self.assertEqual(work_queue.claim("worker", LEASE_SECONDS).name, "small")
+
+  def test_limits_leased_large_items(self):
+    work_queue = self._get_work_queue()
+    work_queue.enqueue([WorkItem(name="larger", num_bytes=2000, num_rows=1)])
+
+    first = work_queue.claim(
+        "worker",
+        LEASE_SECONDS,
+        max_leased_large_items=1,
+        large_item_threshold_bytes=100,
+    )
+    second = work_queue.claim(
+        "worker",
+        LEASE_SECONDS,
+        max_leased_large_items=1,
+        large_item_threshold_bytes=100,
+    )
+
+    self.assertEqual(first.name, "larger")
+    self.assertEqual(second.name, "small")
+
+  def test_is_drained_once_all_items_finished(self):
+    work_queue = self._get_work_queue()
+    large = work_queue.claim("worker", LEASE_SECONDS)
+    small = work_queue.claim("worker", LEASE_SECONDS)
+
+    self.assertTrue(work_queue.complete(large))
+    self.assertFalse(work_queue.is_drained())
+    self.assertTrue(work_queue.fail(small, "error"))
+    self.assertTrue(work_queue.is_drained())
+
+  def test_renewed_lease_does_not_expire(self):
+    work_queue = self._get_work_queue()
+    lease = work_queue.claim("worker", LEASE_SECONDS)
+
+    self.now += LEASE_SECONDS / 2
+    self.assertTrue(work_queue.renew(lease, LEASE_SECONDS))
+    self.now += LEASE_SECONDS / 2 + 1
+
+    self.assertEqual(work_queue.claim("other", LEASE_SECONDS).name, "small")
+    self.assertTrue(work_queue.complete(lease))
+
+  def test_reclaims_expired_lease(self):
+    work_queue = self._get_work_queue()
+    expired = work_queue.claim("worker", LEASE_SECONDS)
+    first_claimed_at = self.now
+
+    self.now += LEASE_SECONDS + 1
+    reclaimed = work_queue.claim("other", LEASE_SECONDS)
+
+    self.assertEqual(reclaimed.name, expired.name)
+    self.assertEqual(reclaimed.attempt, 2)
+    self.assertEqual(reclaimed.first_claimed_at, first_claimed_at)
+    self.assertFalse(work_queue.renew(expired, LEASE_SECONDS))
+    self.assertFalse(work_queue.complete(expired))
+    self.assertTrue(work_queue.complete(reclaimed))
+
+  def test_fails_item_whose_lease_expired_too_many_times(self):
+    work_queue = self._get_work_queue(max_attempts=2)
+
+    for _ in range(2):
+      self.assertEqual(work_queue.claim("worker", LEASE_SECONDS).name, "large")
+      self.now += LEASE_SECONDS + 1
+
+    self.assertEqual(work_queue.claim("worker", LEASE_SECONDS).name, "small")
+    self.assertIsNone(work_queue.claim("worker", LEASE_SECONDS))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,321 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from concurrent.futures import Future
+import threading
+from typing import Iterator, List
+import unittest
+from unittest import mock
+from common.bigquery_type import BigQueryType
+from executors.storage_copy import arrow_casts, storage_copy_rows
+from executors.storage_copy.arrow_casts import RecordBatchConverter
+from executors.storage_copy.row_sink import RowSink, RowSinkStream
+from executors.storage_copy.row_source import RowSource
+from executors.storage_copy.storage_copy_rows import StorageCopy
+from sql_generators.copy_rows.copy_rows import ColumnCast, ColumnSchema
+
+pyarrow = arrow_casts.pyarrow
+
+BATCHES_PER_STREAM = 3
+ROWS_PER_BATCH = 10
+MICROSECONDS_PER_MINUTE = 60000000
+
+
+def _get_schema() -> "pyarrow.Schema":
+  return pyarrow.schema([("id", pyarrow.int64()), ("t", pyarrow.string())])
+
+
+def _get_batch(first_id: int, row_count: int) -> "pyarrow.RecordBatch":
+  return pyarrow.RecordBatch.from_pylist(
+      [
+          {"id": row_id, "t": str(row_id * MICROSECONDS_PER_MINUTE)}
+          for row_id in range(first_id, first_id + row_count)
+      ],
+      schema=_get_schema(),
+  )
+
+
+# Reads `BATCHES_PER_STREAM` batches of distinct rows from each stream.
+class InMemorySource(RowSource):
+
+  def __init__(self, stream_count: int = 3):
+    self.stream_count: int = stream_count
+
+  def get_schema(self) -> "pyarrow.Schema":
+    return _get_schema()
+
+  def get_streams(self) -> List[str]:
+    return [str(stream) for stream in range(self.stream_count)]
+
+  def read_batches(self, stream: str) -> Iterator["pyarrow.RecordBatch"]:
+    for batch in range(BATCHES_PER_STREAM):
+      yield _get_batch(
+          first_id=(int(stream) * BATCHES_PER_STREAM + batch) * ROWS_PER_BATCH,
+          row_count=ROWS_PER_BATCH,
+      )
+
+
+class FailingSource(InMemorySource):
+
+  def read_batches(self, stream: str) -> Iterator["pyarrow.RecordBatch"]:
+    yield _get_batch(first_id=0, row_count=ROWS_PER_BATCH)
+    raise IOError(f"Reading stream {stream} failed.")
+
+
+# Reads batches until the copy is stopped, so that readers wait for room on
+# the full queue when the sink fails.
+class EndlessSource(InMemorySource):
+
+  def read_batches(self, stream: str) -> Iterator["pyarrow.RecordBatch"]:
+    while True:
+      yield _get_batch(first_id=0, row_count=ROWS_PER_BATCH)
+
+
+class InMemoryStream(RowSinkStream):
+
+  def __init__(self, schema: "pyarrow.Schema"):
+    self.schema: "pyarrow.Schema" = schema
+    self.batches: List["pyarrow.RecordBatch"] = []
+
+  def append(self, batch: "pyarrow.RecordBatch") -> Future:
+    if not batch.schema.equals(self.schema):
+      raise ValueError(f"Unexpected schema {batch.schema}")
+    self.batches.append(batch)
+    future = Future()
+    future.set_result(None)
+    return future
+
+  def finish(self) -> int:
+    return sum(batch.num_rows for batch in self.batches)
+
+
+class FailingStream(InMemoryStream):
+
+  def append(self, batch: "pyarrow.RecordBatch") -> Future:
+    future = Future()
+    future.set_exception(RuntimeError("Appending rows failed."))
+    return future
+
+
+class InMemorySink(RowSink):
+
+  def __init__(self, stream_class=InMemoryStream):
+    self.stream_class = stream_class
+    self.streams: List[InMemoryStream] = []
+    self.committed_streams: List[RowSinkStream] = []
+    self._lock = threading.Lock()
+
+  def open_stream(self, schema: "pyarrow.Schema") -> RowSinkStream:
+    stream = self.stream_class(schema)
+    with self._lock:
+      self.streams.append(stream)
+    return stream
+
+  def commit(self, streams: List[RowSinkStream]):
+    self.committed_streams = streams
+
+  def get_rows(self) -> List[dict]:
+    return pyarrow.Table.from_batches(
+        [batch for stream in self.streams for batch in stream.batches],
+        schema=self.streams[0].schema,
+    ).to_pylist()
+
+
+def _get_converter() -> RecordBatchConverter:
+  return RecordBatchConverter(
+      [
+          ColumnCast(
+              destination_column="id",
+              source_column="id",
+              column_schema=ColumnSchema(
+                  BigQueryType.INT64, BigQueryType.INT64
+              ),
+          ),
+          ColumnCast(
+              destination_column="duration",
+              source_column="t",
+              column_schema=ColumnSchema(
+                  BigQueryType.STRING, BigQueryType.INTERVAL
+              ),
+          ),
+      ]
+  )
+
+
+@unittest.skipIf(pyarrow is None, "pyarrow isn't installed.")
+@mock.patch.object(storage_copy_rows, "_QUEUE_POLL_SECONDS", 0.01)
+class StorageCopyTest(unittest.TestCase):
+
+  def test_run_copies_and_commits_all_rows(self):
+    sink = InMemorySink()
+
+    row_count = StorageCopy(
+        source=InMemorySource(),
+        sink=sink,
+        converter=_get_converter(),
+        write_stream_count=2,
+    ).run()
+
+    expected_row_count = 3 * BATCHES_PER_STREAM * ROWS_PER_BATCH
+    self.assertEqual(row_count, expected_row_count)
+    self.assertEqual(len(sink.streams), 2)
+    self.assertEqual(sink.committed_streams, sink.streams)
+    rows = sink.get_rows()
+    self.assertEqual(
+        sorted(row["id"] for row in rows), list(range(expected_row_count))
+    )
+    self.assertEqual(sink.streams[0].schema.names, ["id", "duration"])
+    for row in rows:
+      self.assertEqual(row["duration"].nanoseconds, row["id"] * 60 * 10**9)
+
+  def test_run_splits_large_batches(self):
+    sink = InMemorySink()
+
+    with mock.patch.object(storage_copy_rows, "MAX_APPEND_BYTES", 100):
+      row_count = StorageCopy(
+          source=InMemorySource(stream_count=1),
+          sink=sink,
+          converter=_get_converter(),
+          write_stream_count=1,
+      ).run()
+
+    self.assertEqual(row_count, BATCHES_PER_STREAM * ROWS_PER_BATCH)
+    self.assertGreater(len(sink.streams[0].batches), BATCHES_PER_STREAM)
+
+  def test_run_raises_source_error_without_committing(self):
+    sink = InMemorySink()
+
+    with self.assertRaisesRegex(IOError, "Reading stream"):
+      StorageCopy(
+          source=FailingSource(),
+          sink=sink,
+          converter=_get_converter(),
+          write_stream_count=2,
+      ).run()
+
+    self.assertEqual(sink.committed_streams, [])
+
+  def test_run_raises_sink_error_without_committing(self):
+    sink = InMemorySink(stream_class=FailingStream)
+
+    with self.assertRaisesRegex(RuntimeError, "Appending rows failed"):
+      StorageCopy(
+          source=InMemorySource(),
+          sink=sink,
+          converter=_get_converter(),
+          write_stream_count=2,
+      ).run()
+
+    self.assertEqual(sink.committed_streams, [])
+
+  def test_run_stops_blocked_readers_when_sink_fails(self):
+    sink = InMemorySink(stream_class=FailingStream)
+    errors = []
+
+    def run():
+      try:
+        StorageCopy(
+            source=EndlessSource(),
+            sink=sink,
+            converter=_get_converter(),
+            write_stream_count=1,
+        ).run()
+      except RuntimeError as ex:
+        errors.append(ex)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+
+    self.assertFalse(thread.is_alive(), "The copy didn't stop.")
+    self.assertEqual(len(errors), 1)
+    self.assertEqual(sink.committed_streams, [])
+
+
+@unittest.skipIf(pyarrow is None, "pyarrow isn't installed.")
+class SplitTest(unittest.TestCase):
+
+  def test_small_batch_is_not_split(self):
+    batch = _get_batch(first_id=0, row_count=ROWS_PER_BATCH)
+
+    self.assertEqual(list(storage_copy_rows._split(batch)), [batch])
+
+  def test_large_batch_is_split_in_order(self):
+    batch = _get_batch(first_id=0, row_count=100)
+
+    with mock.patch.object(
+        storage_copy_rows, "MAX_APPEND_BYTES", batch.nbytes // 4
+    ):
+      slices = list(storage_copy_rows._split(batch))
+
+    self.assertGreaterEqual(len(slices), 4)
+    for batch_slice in slices:
+      self.assertLessEqual(batch_slice.nbytes, batch.nbytes // 4)
+    self.assertEqual(
+        pyarrow.Table.from_batches(slices).to_pylist(), batch.to_pylist()
+    )
+
+
+@unittest.skipIf(pyarrow is None, "pyarrow isn't installed.")
+class StringToIntervalTest(unittest.TestCase):
+
+  def test_converts_microseconds_to_interval(self):
+    array = pyarrow.array(
+        [
+            "7261500000",  # 2:01:01.5
+            "-7261500000",
+            None,
+            "0",
+            "-999999",
+        ],
+        type=pyarrow.string(),
+    )
+
+    intervals = arrow_casts._string_to_interval(array)
+
+    self.assertEqual(intervals.type, pyarrow.month_day_nano_interval())
+    intervals.validate(full=True)
+    self.assertEqual(intervals.null_count, 1)
+    self.assertEqual(
+        [
+            (value.months, value.days, value.nanoseconds)
+            if value is not None
+            else None
+            for value in intervals.to_pylist()
+        ],
+        [
+            (0, 0, 7261 * 10**9),
+            (0, 0, -7261 * 10**9),
+            None,
+            (0, 0, 0),
+            (0, 0, 0),
+        ],
+    )
+
+  def test_converts_sliced_array(self):
+    array = pyarrow.array(["60000000", None, "120000000"])[1:]
+
+    intervals = arrow_casts._string_to_interval(array)
+
+    self.assertEqual(
+        [
+            value.nanoseconds if value is not None else None
+            for value in intervals.to_pylist()
+        ],
+        [None, 120 * 10**9],
+    )
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,71 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import logging
+from batch.source_tables import get_source_tables, prefetch_source_table_ddls
+from common import metadata_cache, rate_limiter
+from common.monitoring_consts import USER_AGENT
+from executors.discover import execute_discover
+from google.api_core.gapic_v1.client_info import ClientInfo
+from google.cloud import bigquery
+from migration_config import get_warm_cache_config
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+  config: argparse.Namespace = get_warm_cache_config()
+  logger.debug(f"Using config {vars(config)}")
+
+  logger.info(
+      f"Warming the metadata cache at '{config.metadata_cache_path}' for"
+      f" {len(config.tables)} tables.."
+  )
+
+  with ThreadPoolExecutor(max_workers=config.max_concurrent_tables) as executor:
+    list(executor.map(_discover, config.tables))
+
+  bigquery_client = bigquery.Client(
+      client_info=ClientInfo(user_agent=USER_AGENT)
+  )
+  source_tables = get_source_tables(
+      config.tables,
+      bigquery_client=bigquery_client,
+      max_workers=config.max_concurrent_tables,
+  )
+  prefetch_source_table_ddls(
+      config.tables,
+      source_tables=source_tables,
+      bigquery_client=bigquery_client,
+  )
+
+  rate_limiter.log_stats()
+  metadata_cache.log_stats()
+
+
+def _discover(table_config: argparse.Namespace):
+  execute_discover(
+      connection_profile_name=table_config.connection_profile_name,
+      source_type=table_config.source_type,
+      source_table_name=table_config.source_table_name,
+      source_schema_name=table_config.source_schema_name,
+      datastream_api_endpoint_override=table_config.datastream_api_endpoint_override,
+      filepath=table_config.discover_result_filepath,
+  )
+
+
+if __name__ == "__main__":
+  main()